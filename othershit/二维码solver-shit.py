@@ -13,10 +13,17 @@ import webbrowser
 import threading
 import cv2
 import qrcode
-from pyzxing import BarCodeReader
 import time
-import queue
 import traceback
+import sys
+
+# 常驻ZXing解码进程放在 pre-releaseversion 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pre-releaseversion"))
+from zxing_worker import ZXingWorker
+from ui_dispatch import UIDispatcher
+
+# 汉信码/自动模式下每次往返交给ZXing解码的图片数
+ZXING_BATCH_SIZE = 16
 
 class QRScannerApp(TkinterDnD.Tk):
     def __init__(self):
@@ -148,24 +155,18 @@ class QRScannerApp(TkinterDnD.Tk):
         # 扫描控制变量
         self.scanning = False
         self.stop_requested = False
-        self.thread_queue = queue.Queue()
+        # 后台线程的界面更新：有任务时用事件唤醒主线程，不再定时轮询
+        self.ui = UIDispatcher(self)
         
-        # 初始化汉信码识别器
-        self.hanxin_reader = BarCodeReader()
-        
-        # 定期检查线程状态
-        self.after(100, self.process_thread_queue)
+        # 初始化汉信码识别器（常驻ZXing进程，首次使用时启动）
+        self.hanxin_reader = ZXingWorker()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
     
-    def process_thread_queue(self):
-        """定期检查线程队列中的任务状态"""
-        try:
-            while True:
-                # 从队列中获取任务，不阻塞
-                task = self.thread_queue.get_nowait()
-                task()  # 执行任务
-        except queue.Empty:
-            pass
-        self.after(100, self.process_thread_queue)
+    def on_close(self):
+        """关闭窗口时结束ZXing解码进程"""
+        self.stop_requested = True
+        self.hanxin_reader.close()
+        self.destroy()
     
     def create_context_menu(self):
         """创建右键菜单"""
@@ -315,7 +316,7 @@ class QRScannerApp(TkinterDnD.Tk):
             if mode == "local":
                 file_path = self.file_entry.get()
                 if not file_path:
-                    self.thread_queue.put(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
+                    self.ui.post(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
                     return
                 
                 self.process_image(file_path)
@@ -323,7 +324,7 @@ class QRScannerApp(TkinterDnD.Tk):
             elif mode == "web":
                 url = self.url_entry.get()
                 if not url:
-                    self.thread_queue.put(lambda: messagebox.showwarning("警告", "请输入图片URL"))
+                    self.ui.post(lambda: messagebox.showwarning("警告", "请输入图片URL"))
                     return
                 
                 # 在单独的线程中处理网络图片下载
@@ -333,74 +334,77 @@ class QRScannerApp(TkinterDnD.Tk):
             elif mode == "batch":
                 file_paths = self.file_entry.get().split(";")
                 if not any(file_paths):
-                    self.thread_queue.put(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
+                    self.ui.post(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
                     return
                 
                 total = len(file_paths)
-                self.thread_queue.put(lambda: self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 5)))
-                self.thread_queue.put(lambda: self.progress_var.set(0))
+                batch_size = self.get_batch_size()
+                self.ui.post(lambda: self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 5)))
+                self.ui.post(lambda: self.progress_var.set(0))
                 
-                for i, file_path in enumerate(file_paths):
+                for start in range(0, total, batch_size):
                     if self.stop_requested:
                         break
-                        
-                    if not file_path.strip():
-                        continue
                     
-                    text = f"\n\n--- 文件 {i+1}/{total}: {os.path.basename(file_path)} ---\n"
-                    self.thread_queue.put(lambda t=text: self.result_text.insert(tk.END, t))
-                    self.process_image(file_path.strip())
+                    chunk = [(i, path.strip()) for i, path in enumerate(file_paths[start:start + batch_size], start)
+                             if path.strip()]
+                    headers = [f"\n\n--- 文件 {i+1}/{total}: {os.path.basename(path)} ---\n" for i, path in chunk]
+                    self.process_images([path for _, path in chunk], headers)
                     
                     # 更新进度
+                    i = min(start + batch_size, total) - 1
                     progress = (i + 1) / total * 100
-                    self.thread_queue.put(lambda p=progress: self.progress_var.set(p))
+                    self.ui.post(lambda p=progress: self.progress_var.set(p))
                     status = f"处理中: {i+1}/{total} ({progress:.1f}%)"
-                    self.thread_queue.put(lambda s=status: self.status_var.set(s))
+                    self.ui.post(lambda s=status: self.status_var.set(s))
                 
-                self.thread_queue.put(lambda: self.progress_bar.pack_forget())
+                self.ui.post(lambda: self.progress_bar.pack_forget())
             
             elif mode == "folder":
                 folder_path = self.file_entry.get()
                 if not folder_path or not os.path.isdir(folder_path):
-                    self.thread_queue.put(lambda: messagebox.showwarning("警告", "请选择要扫描的文件夹"))
+                    self.ui.post(lambda: messagebox.showwarning("警告", "请选择要扫描的文件夹"))
                     return
                 
                 # 获取所有图片文件
                 image_files = self.get_image_files(folder_path)
                 if not image_files:
-                    self.thread_queue.put(lambda: messagebox.showinfo("提示", "该文件夹下未找到图片文件"))
+                    self.ui.post(lambda: messagebox.showinfo("提示", "该文件夹下未找到图片文件"))
                     return
                 
                 total = len(image_files)
-                self.thread_queue.put(lambda: self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 5)))
-                self.thread_queue.put(lambda: self.progress_var.set(0))
+                batch_size = self.get_batch_size()
+                self.ui.post(lambda: self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 5)))
+                self.ui.post(lambda: self.progress_var.set(0))
                 
-                for i, file_path in enumerate(image_files):
+                for start in range(0, total, batch_size):
                     if self.stop_requested:
                         break
-                        
-                    text = f"\n\n--- 文件 {i+1}/{total}: {os.path.relpath(file_path, folder_path)} ---\n"
-                    self.thread_queue.put(lambda t=text: self.result_text.insert(tk.END, t))
-                    self.process_image(file_path)
+                    
+                    chunk = image_files[start:start + batch_size]
+                    headers = [f"\n\n--- 文件 {i+1}/{total}: {os.path.relpath(path, folder_path)} ---\n"
+                               for i, path in enumerate(chunk, start)]
+                    self.process_images(chunk, headers)
                     
                     # 更新进度
+                    i = start + len(chunk) - 1
                     progress = (i + 1) / total * 100
-                    self.thread_queue.put(lambda p=progress: self.progress_var.set(p))
+                    self.ui.post(lambda p=progress: self.progress_var.set(p))
                     status = f"处理中: {i+1}/{total} ({progress:.1f}%)"
-                    self.thread_queue.put(lambda s=status: self.status_var.set(s))
+                    self.ui.post(lambda s=status: self.status_var.set(s))
                 
-                self.thread_queue.put(lambda: self.progress_bar.pack_forget())
+                self.ui.post(lambda: self.progress_bar.pack_forget())
         
         except Exception as e:
             error_msg = f"扫描过程中发生错误:\n{str(e)}\n{traceback.format_exc()}"
-            self.thread_queue.put(lambda: self.status_var.set(f"错误: {str(e)}"))
-            self.thread_queue.put(lambda: messagebox.showerror("错误", error_msg))
+            self.ui.post(lambda: self.status_var.set(f"错误: {str(e)}"))
+            self.ui.post(lambda: messagebox.showerror("错误", error_msg))
         finally:
             self.scanning = False
             self.stop_requested = False
-            self.thread_queue.put(lambda: self.scan_button.config(state=tk.NORMAL))
-            self.thread_queue.put(lambda: self.stop_button.config(state=tk.DISABLED))
-            self.thread_queue.put(lambda: self.status_var.set("扫描完成"))
+            self.ui.post(lambda: self.scan_button.config(state=tk.NORMAL))
+            self.ui.post(lambda: self.stop_button.config(state=tk.DISABLED))
+            self.ui.post(lambda: self.status_var.set("扫描完成"))
     
     def stop_scan(self):
         """停止扫描"""
@@ -419,30 +423,53 @@ class QRScannerApp(TkinterDnD.Tk):
         
         return image_files
     
+    def get_batch_size(self):
+        """需要ZXing的模式按组扫描，其余模式逐张扫描"""
+        return ZXING_BATCH_SIZE if self.code_type_var.get() in ("auto", "hanxin") else 1
+    
     def process_image(self, file_path):
         """处理本地图片文件"""
+        self.process_images([file_path])
+    
+    def process_images(self, file_paths, headers=None):
+        """处理一组本地图片文件，需要ZXing检测的图片一次往返解码"""
+        headers = headers or [""] * len(file_paths)
+        loaded = []
+        errors = {}
+        for index, file_path in enumerate(file_paths):
+            try:
+                # 打开并显示图片
+                img = Image.open(file_path)
+                self.ui.post(lambda i=img: self.show_preview(i))
+                loaded.append((index, self.preprocess_image(img)))
+            except Exception as e:
+                errors[index] = e
+        
+        # 处理并扫描二维码
+        scanned = {}
         try:
-            # 打开并显示图片
-            img = Image.open(file_path)
-            self.thread_queue.put(lambda i=img: self.show_preview(i))
-            
-            # 处理并扫描二维码
-            processed_img = self.preprocess_image(img)
-            results = self.scan_image(processed_img, file_path)
-            
-            # 显示结果
-            self.thread_queue.put(lambda r=results, s=os.path.basename(file_path): self.display_results(r, s))
-            self.thread_queue.put(lambda: self.status_var.set(f"扫描完成: {os.path.basename(file_path)}"))
-        
+            batch_results = self.scan_images([(img, file_paths[index]) for index, img in loaded])
+            scanned = {index: results for (index, _), results in zip(loaded, batch_results)}
         except Exception as e:
-            error_msg = f"错误: {str(e)}\n"
-            self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
-            self.thread_queue.put(lambda: self.status_var.set(f"扫描失败: {os.path.basename(file_path)}"))
+            errors.update((index, e) for index, _ in loaded)
+        
+        # 按顺序显示结果
+        for index, (file_path, header) in enumerate(zip(file_paths, headers)):
+            if header:
+                self.ui.post(lambda t=header: self.result_text.insert(tk.END, t))
+            name = os.path.basename(file_path)
+            if index in errors:
+                error_msg = f"错误: {str(errors[index])}\n"
+                self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+                self.ui.post(lambda s=name: self.status_var.set(f"扫描失败: {s}"))
+            else:
+                self.ui.post(lambda r=scanned[index], s=name: self.display_results(r, s))
+                self.ui.post(lambda s=name: self.status_var.set(f"扫描完成: {s}"))
     
     def process_web_image(self, url):
         """处理网络图片 - 在单独的线程中执行"""
         try:
-            self.thread_queue.put(lambda: self.status_var.set(f"正在下载图片: {url}"))
+            self.ui.post(lambda: self.status_var.set(f"正在下载图片: {url}"))
             
             # 获取超时设置
             try:
@@ -456,34 +483,34 @@ class QRScannerApp(TkinterDnD.Tk):
             
             # 打开并显示图片
             img = Image.open(BytesIO(response.content))
-            self.thread_queue.put(lambda i=img: self.show_preview(i))
+            self.ui.post(lambda i=img: self.show_preview(i))
             
             # 处理并扫描二维码
             processed_img = self.preprocess_image(img)
             results = self.scan_image(processed_img, url)
             
             # 显示结果
-            self.thread_queue.put(lambda r=results: self.display_results(r, url))
-            self.thread_queue.put(lambda: self.status_var.set(f"扫描完成: {url}"))
+            self.ui.post(lambda r=results: self.display_results(r, url))
+            self.ui.post(lambda: self.status_var.set(f"扫描完成: {url}"))
         
         except requests.exceptions.Timeout:
             error_msg = f"下载超时: {url}\n"
-            self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
-            self.thread_queue.put(lambda: self.status_var.set(f"下载超时: {url}"))
+            self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            self.ui.post(lambda: self.status_var.set(f"下载超时: {url}"))
         except requests.exceptions.RequestException as e:
             error_msg = f"网络错误: {str(e)}\n"
-            self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
-            self.thread_queue.put(lambda: self.status_var.set(f"网络错误: {url}"))
+            self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            self.ui.post(lambda: self.status_var.set(f"网络错误: {url}"))
         except Exception as e:
             error_msg = f"错误: {str(e)}\n"
-            self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
-            self.thread_queue.put(lambda: self.status_var.set(f"扫描失败: {url}"))
+            self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            self.ui.post(lambda: self.status_var.set(f"扫描失败: {url}"))
         finally:
             # 确保最终恢复按钮状态
             self.scanning = False
             self.stop_requested = False
-            self.thread_queue.put(lambda: self.scan_button.config(state=tk.NORMAL))
-            self.thread_queue.put(lambda: self.stop_button.config(state=tk.DISABLED))
+            self.ui.post(lambda: self.scan_button.config(state=tk.NORMAL))
+            self.ui.post(lambda: self.stop_button.config(state=tk.DISABLED))
     
     def preprocess_image(self, img):
         """图像预处理以提高识别率"""
@@ -506,42 +533,45 @@ class QRScannerApp(TkinterDnD.Tk):
     
     def scan_image(self, img, source):
         """扫描图像中的二维码，支持多种格式"""
+        return self.scan_images([(img, source)])[0]
+    
+    def scan_images(self, items):
+        """扫描一组图像 [(图像, 来源)]，返回每张图像的结果列表；需要ZXing的图像合并为一次往返"""
         code_type = self.code_type_var.get()
-        results = []
-        
-        # 将PIL图像转换为OpenCV格式
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        results = [[] for _ in items]
         
         # 自动检测模式
         if code_type == "auto":
             # 尝试使用pyzbar检测所有支持的格式
-            img_array = np.array(img)
-            decoded_objs = pyzbar.decode(img_array)
-            results.extend(decoded_objs)
+            for index, (img, source) in enumerate(items):
+                results[index].extend(pyzbar.decode(np.array(img)))
             
-            # 如果没有检测到结果，尝试汉信码
-            if not results:
-                self.thread_queue.put(lambda: self.status_var.set(f"尝试汉信码检测: {source}"))
-                hanxin_results = self.detect_hanxin(img_cv)
-                results.extend(hanxin_results)
+            # 没有检测到结果的图像一起尝试汉信码
+            pending = [index for index, found in enumerate(results) if not found]
+            if pending:
+                self.ui.post(lambda n=len(pending): self.status_var.set(f"尝试汉信码检测: {n} 张图片"))
+                hanxin_results = self.detect_hanxin([items[index][0] for index in pending])
+                for index, found in zip(pending, hanxin_results):
+                    results[index].extend(found)
             
             # 如果还是没有结果，尝试其他方法
-            if not results:
-                self.thread_queue.put(lambda: self.status_var.set(f"尝试增强检测: {source}"))
+            for index in pending:
+                if results[index]:
+                    continue
+                img, source = items[index]
+                self.ui.post(lambda s=source: self.status_var.set(f"尝试增强检测: {s}"))
                 # 应用自适应阈值
                 img_enhanced = img.point(lambda p: p > 128 and 255)
-                img_array = np.array(img_enhanced)
-                decoded_objs = pyzbar.decode(img_array)
-                results.extend(decoded_objs)
+                results[index].extend(pyzbar.decode(np.array(img_enhanced)))
         
         # 特定类型检测
+        elif code_type == "hanxin":
+            self.ui.post(lambda n=len(items): self.status_var.set(f"检测汉信码: {n} 张图片"))
+            for index, found in enumerate(self.detect_hanxin([img for img, _ in items])):
+                results[index].extend(found)
         else:
-            if code_type == "hanxin":
-                self.thread_queue.put(lambda: self.status_var.set(f"检测汉信码: {source}"))
-                results.extend(self.detect_hanxin(img_cv))
-            else:
+            for index, (img, source) in enumerate(items):
                 # 设置pyzbar只检测特定类型
-                img_array = np.array(img)
                 try:
                     # 映射类型名称到pyzbar常量
                     type_mapping = {
@@ -552,66 +582,37 @@ class QRScannerApp(TkinterDnD.Tk):
                     }
                     symbol = type_mapping.get(code_type, ZBarSymbol.QRCODE)
                     
-                    decoded_objs = pyzbar.decode(img_array, symbols=[symbol])
-                    results.extend(decoded_objs)
+                    decoded_objs = pyzbar.decode(np.array(img), symbols=[symbol])
+                    results[index].extend(decoded_objs)
                     
                     # 如果没有结果，尝试增强图像
-                    if not results:
-                        self.thread_queue.put(lambda: self.status_var.set(f"尝试增强检测: {source}"))
+                    if not results[index]:
+                        self.ui.post(lambda s=source: self.status_var.set(f"尝试增强检测: {s}"))
                         img_enhanced = img.point(lambda p: p > 128 and 255)
-                        img_array = np.array(img_enhanced)
-                        decoded_objs = pyzbar.decode(img_array, symbols=[symbol])
-                        results.extend(decoded_objs)
+                        decoded_objs = pyzbar.decode(np.array(img_enhanced), symbols=[symbol])
+                        results[index].extend(decoded_objs)
                 except Exception as e:
                     error_msg = f"检测错误: {str(e)}\n"
-                    self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+                    self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
         
         return results
     
-    def detect_hanxin(self, img_cv):
-        """使用专用库检测汉信码"""
-        results = []
+    def detect_hanxin(self, images):
+        """使用常驻ZXing进程检测汉信码，一组图像一次往返，返回每张图像的结果列表"""
         try:
-            # 保存临时图像文件
-            temp_file = "temp_hanxin.jpg"
-            cv2.imwrite(temp_file, img_cv)
-            
-            # 使用pyzxing检测汉信码
-            decoded = self.hanxin_reader.decode(temp_file)
-            
-            # 处理结果
-            if decoded and 'raw' in decoded:
-                # 创建类似pyzbar的结果对象
-                from collections import namedtuple
-                QRCode = namedtuple('QRCode', ['type', 'data', 'rect', 'polygon'])
-                
-                # 尝试提取位置信息
-                points = decoded.get('points', [])
-                if points:
-                    rect = (min(p[0] for p in points), 
-                            min(p[1] for p in points),
-                            max(p[0] for p in points) - min(p[0] for p in points),
-                            max(p[1] for p in points) - min(p[1] for p in points))
-                    polygon = [(p[0], p[1]) for p in points]
-                else:
-                    rect = (0, 0, img_cv.shape[1], img_cv.shape[0])
-                    polygon = []
-                
-                result = QRCode(
-                    type="HANXIN",
-                    data=decoded['raw'].encode('utf-8'),
-                    rect=rect,
-                    polygon=polygon
-                )
-                results.append(result)
-            
-            # 清理临时文件
-            os.remove(temp_file)
-            
+            decoded = self.hanxin_reader.decode_batch(images)
         except Exception as e:
             error_msg = f"汉信码检测错误: {str(e)}\n"
-            self.thread_queue.put(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            return [[] for _ in images]
         
+        results = []
+        for found, error in decoded:
+            if error:
+                error_msg = f"汉信码检测错误: {error}\n"
+                self.ui.post(lambda msg=error_msg: self.result_text.insert(tk.END, msg))
+            # 与原先pyzxing的处理一致，这一路识别出的结果都标记为汉信码
+            results.append([result._replace(type="HANXIN") for result in found])
         return results
     
     def display_results(self, results, source):
@@ -0,0 +1,147 @@
+import com.google.zxing.BarcodeFormat;
+import com.google.zxing.BinaryBitmap;
+import com.google.zxing.DecodeHintType;
+import com.google.zxing.MultiFormatReader;
+import com.google.zxing.NotFoundException;
+import com.google.zxing.Result;
+import com.google.zxing.ResultMetadataType;
+import com.google.zxing.ResultPoint;
+import com.google.zxing.client.j2se.BufferedImageLuminanceSource;
+import com.google.zxing.common.HybridBinarizer;
+import com.google.zxing.multi.GenericMultipleBarcodeReader;
+
+import javax.imageio.ImageIO;
+import java.awt.image.BufferedImage;
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.DataInputStream;
+import java.io.EOFException;
+import java.io.IOException;
+import java.io.PrintStream;
+import java.util.ArrayList;
+import java.util.EnumMap;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * 常驻的ZXing解码进程，由 zxing_worker.py 启动，整个扫描期间只启动一次JVM
+ * 协议（大端）：stdin 每轮写入 int32 图片数量，再依次写入 int32 长度 + 图片文件字节；
+ * stdout 对每张图片输出一行JSON：{"results":[...]} 或 {"error":"..."}
+ * 可选参数 args[0] 为逗号分隔的 BarcodeFormat 名称，限制识别的码制
+ */
+public class ZXingPipeWorker {
+    public static void main(String[] args) throws IOException {
+        Map<DecodeHintType, Object> hints = new EnumMap<>(DecodeHintType.class);
+        hints.put(DecodeHintType.TRY_HARDER, Boolean.TRUE);
+        if (args.length > 0 && !args[0].isEmpty()) {
+            List<BarcodeFormat> formats = new ArrayList<>();
+            for (String name : args[0].split(",")) {
+                formats.add(BarcodeFormat.valueOf(name.trim()));
+            }
+            hints.put(DecodeHintType.POSSIBLE_FORMATS, formats);
+        }
+        
+        // 图片只在内存中解码，不使用ImageIO的临时文件缓存
+        ImageIO.setUseCache(false);
+        MultiFormatReader reader = new MultiFormatReader();
+        reader.setHints(hints);
+        GenericMultipleBarcodeReader multiReader = new GenericMultipleBarcodeReader(reader);
+        
+        DataInputStream in = new DataInputStream(new BufferedInputStream(System.in, 1 << 16));
+        PrintStream out = new PrintStream(new BufferedOutputStream(System.out, 1 << 16), false, "UTF-8");
+        while (true) {
+            int count;
+            try {
+                count = in.readInt();
+            } catch (EOFException e) {
+                break;
+            }
+            for (int i = 0; i < count; i++) {
+                byte[] data = new byte[in.readInt()];
+                in.readFully(data);
+                out.println(decode(multiReader, hints, data));
+            }
+            // 一轮处理完再统一输出
+            out.flush();
+        }
+    }
+    
+    private static String decode(GenericMultipleBarcodeReader reader, Map<DecodeHintType, Object> hints, byte[] data) {
+        try {
+            BufferedImage image = ImageIO.read(new ByteArrayInputStream(data));
+            if (image == null) {
+                return "{\"error\":\"无法识别的图片格式\"}";
+            }
+            BinaryBitmap bitmap = new BinaryBitmap(new HybridBinarizer(new BufferedImageLuminanceSource(image)));
+            Result[] results;
+            try {
+                results = reader.decodeMultiple(bitmap, hints);
+            } catch (NotFoundException e) {
+                results = new Result[0];
+            }
+            
+            StringBuilder json = new StringBuilder("{\"results\":[");
+            for (int i = 0; i < results.length; i++) {
+                if (i > 0) {
+                    json.append(',');
+                }
+                appendResult(json, results[i]);
+            }
+            return json.append("]}").toString();
+        } catch (Exception e) {
+            StringBuilder json = new StringBuilder("{\"error\":");
+            appendString(json, e.toString());
+            return json.append('}').toString();
+        }
+    }
+    
+    private static void appendResult(StringBuilder json, Result result) {
+        json.append("{\"format\":");
+        appendString(json, result.getBarcodeFormat().name());
+        json.append(",\"text\":");
+        appendString(json, result.getText());
+        json.append(",\"points\":[");
+        ResultPoint[] points = result.getResultPoints();
+        if (points != null) {
+            boolean first = true;
+            for (ResultPoint point : points) {
+                if (point == null) {
+                    continue;
+                }
+                if (!first) {
+                    json.append(',');
+                }
+                first = false;
+                json.append('[').append(Math.round(point.getX())).append(',').append(Math.round(point.getY())).append(']');
+            }
+        }
+        json.append(']');
+        Map<ResultMetadataType, Object> metadata = result.getResultMetadata();
+        if (metadata != null && metadata.get(ResultMetadataType.ORIENTATION) instanceof Integer) {
+            json.append(",\"orientation\":").append(metadata.get(ResultMetadataType.ORIENTATION));
+        }
+        json.append('}');
+    }
+    
+    private static void appendString(StringBuilder json, String text) {
+        json.append('"');
+        for (int i = 0; i < text.length(); i++) {
+            char c = text.charAt(i);
+            switch (c) {
+                case '"': json.append("\\\""); break;
+                case '\\': json.append("\\\\"); break;
+                case '\n': json.append("\\n"); break;
+                case '\r': json.append("\\r"); break;
+                case '\t': json.append("\\t"); break;
+                default:
+                    if (c < 0x20) {
+                        json.append(String.format("\\u%04x", (int) c));
+                    } else {
+                        json.append(c);
+                    }
+            }
+        }
+        json.append('"');
+    }
+}
@@ -0,0 +1,118 @@
+"""
+彩色分层二维码扫描
+CTF中常把不同的二维码分别藏在R、G、B（或印刷的C、M、Y）通道里，转灰度后互相干扰无法识别。
+这里把图像拆成通道、颜色空间投影和k-means颜色簇等多个灰度图层，并行识别后按内容去重，
+并记录每个结果出现在哪些图层
+"""
+import concurrent.futures
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import scan_engine
+
+# 单色图像没有可拆分的颜色信息
+GRAYSCALE_MODES = ("1", "L", "LA", "I", "F", "I;16")
+
+
+def channel_layers(img):
+    """RGB三个通道；印刷的C、M、Y层分别对应R、G、B通道中的深色部分"""
+    rgb = np.asarray(img.convert("RGB"))
+    yield "R/C", rgb[..., 0]
+    yield "G/M", rgb[..., 1]
+    yield "B/Y", rgb[..., 2]
+
+
+def colorspace_layers(img):
+    """颜色空间投影：色相、饱和度和两个色差分量"""
+    hsv = np.asarray(img.convert("RGB").convert("HSV"))
+    ycbcr = np.asarray(img.convert("RGB").convert("YCbCr"))
+    yield "H", hsv[..., 0]
+    yield "S", hsv[..., 1]
+    yield "Cb", ycbcr[..., 1]
+    yield "Cr", ycbcr[..., 2]
+
+
+def kmeans_colors(pixels, k, iterations=12, sample_size=20000, seed=0):
+    """在随机抽样的像素上做k-means，返回 k 个颜色中心（kmeans++ 初始化）"""
+    rng = np.random.default_rng(seed)
+    if len(pixels) > sample_size:
+        pixels = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+    pixels = pixels.astype(np.float32)
+    
+    centers = [pixels[rng.integers(len(pixels))]]
+    for _ in range(1, k):
+        distance = np.min(((pixels[:, None, :] - np.array(centers)[None]) ** 2).sum(-1), axis=1)
+        if distance.sum() == 0:
+            break
+        centers.append(pixels[rng.choice(len(pixels), p=distance / distance.sum())])
+    centers = np.array(centers)
+    
+    for _ in range(iterations):
+        labels = ((pixels[:, None, :] - centers[None]) ** 2).sum(-1).argmin(1)
+        moved = np.array([pixels[labels == j].mean(0) if np.any(labels == j) else centers[j]
+                          for j in range(len(centers))])
+        if np.allclose(moved, centers, atol=0.5):
+            break
+        centers = moved
+    return centers
+
+
+def cluster_layers(img, k=6, min_fraction=0.02, max_fraction=0.9, chunk=1 << 20):
+    """
+    按k-means颜色簇生成图层：属于该颜色的像素为黑色，其余为白色
+    占比过小（噪点）或过大（背景）的簇跳过
+    """
+    rgb = np.asarray(img.convert("RGB"))
+    pixels = rgb.reshape(-1, 3)
+    centers = kmeans_colors(pixels, k)
+    
+    # 分块计算全图像素的归属，避免一次生成 像素数×k 的距离矩阵
+    labels = np.empty(len(pixels), dtype=np.uint8)
+    for start in range(0, len(pixels), chunk):
+        block = pixels[start:start + chunk].astype(np.float32)
+        labels[start:start + chunk] = ((block[:, None, :] - centers[None]) ** 2).sum(-1).argmin(1)
+    
+    for j, center in enumerate(centers):
+        mask = labels == j
+        fraction = mask.mean()
+        if fraction < min_fraction or fraction > max_fraction:
+            continue
+        color = "#%02x%02x%02x" % tuple(int(round(c)) for c in center)
+        yield f"簇{color}", np.where(mask, 0, 255).astype(np.uint8).reshape(rgb.shape[:2])
+
+
+def iter_layers(img, clusters=6):
+    """所有图层：灰度原图、通道、颜色空间投影、颜色簇"""
+    yield "L", np.asarray(img.convert("L"))
+    yield from channel_layers(img)
+    yield from colorspace_layers(img)
+    if clusters:
+        yield from cluster_layers(img, clusters)
+
+
+def _scan_layer(layer, decoder):
+    """单个图层：拉伸对比度后走常规的预处理和识别流程"""
+    img = ImageOps.autocontrast(Image.fromarray(layer))
+    return scan_engine.to_records(scan_engine.scan_image(scan_engine.preprocess_image(img), decoder))
+
+
+def scan_color_layers(img, decoder=None, clusters=6, max_workers=None):
+    """
+    并行识别各图层，按 (类型, 内容) 去重
+    返回 [(记录, [图层标签, ...]), ...]，顺序为结果首次出现的图层顺序
+    """
+    layers = list(iter_layers(img, clusters)) if img.mode not in GRAYSCALE_MODES else \
+        [("L", np.asarray(img.convert("L")))]
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_scan_layer, layer, decoder) for _, layer in layers]
+        merged = {}
+        for (tag, _), future in zip(layers, futures):
+            for record in future.result():
+                key = record.dedupe_key()
+                if key in merged:
+                    merged[key][1].append(tag)
+                else:
+                    merged[key] = (record, [tag])
+    return list(merged.values())
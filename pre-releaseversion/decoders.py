@@ -0,0 +1,451 @@
+"""
+可插拔的解码后端
+pyzbar、OpenCV（QRCodeDetector / WeChatQRCode）、ZXing常驻进程统一为同一接口，
+DecoderChain 按策略组合多个后端（最便宜优先 / 并行竞速 / 多数一致），
+并按图像类别分别记录每个后端的耗时和命中率，最便宜优先策略据此调整尝试顺序
+"""
+import os
+import math
+import time
+import shutil
+import threading
+import concurrent.futures
+from collections import namedtuple
+
+import numpy as np
+from pyzbar import pyzbar
+
+# 与pyzbar的Decoded字段一致，可直接交给 ScanRecord.from_decoded
+DecodedResult = namedtuple("DecodedResult", ["type", "data", "rect", "polygon", "quality", "orientation"])
+
+STRATEGIES = ("cheapest", "race", "consensus")
+DEFAULT_SYMBOLS = ("QRCODE",)
+
+# 界面中可选的码制（pyzbar命名）及显示名称，DataMatrix/Aztec 只有ZXing能识别
+SYMBOLOGIES = {
+    "QRCODE": "QR码",
+    "DATAMATRIX": "Data Matrix",
+    "PDF417": "PDF417",
+    "AZTEC": "Aztec",
+    "CODE128": "Code 128",
+    "EAN13": "EAN-13",
+}
+
+BACKENDS = {}
+
+
+def register_backend(cls):
+    """登记解码后端类，新的后端（包括原生扩展）用此装饰器接入"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def available_backends():
+    """返回当前环境中可用的后端名称"""
+    return [name for name, cls in BACKENDS.items() if cls.available()]
+
+
+def _polygon_result(symbol, data, points, quality=1):
+    """由顶点坐标构造结果"""
+    points = [(int(round(x)), int(round(y))) for x, y in points]
+    if points:
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        rect = (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+    else:
+        rect = (0, 0, 0, 0)
+    return DecodedResult(symbol, data, rect, points, quality, None)
+
+
+def image_class(image):
+    """图像类别：(颜色通道数, 像素数量级)，耗时和命中率按类别分别统计"""
+    shape = np.shape(image) if isinstance(image, np.ndarray) else (image.height, image.width, len(image.getbands()))
+    channels = shape[2] if len(shape) > 2 else 1
+    pixels = max(shape[0] * shape[1], 1)
+    # 每个量级相差4倍：<64K、<256K、<1M、<4M ……
+    return channels, max(int(math.log(pixels, 4)) - 7, 0)
+
+
+class DecoderBackend:
+    """解码后端基类：decode 接收PIL图像或numpy数组及要找的码制，返回结果列表"""
+    name = None
+    # 未积累统计数据前估计的单次耗时（毫秒）
+    cost = 5.0
+    # 支持的符号类型（pyzbar命名），None 表示不限
+    symbols = None
+    
+    def __init__(self, symbols=None):
+        requested = set(symbols or DEFAULT_SYMBOLS)
+        self.active_symbols = requested if self.symbols is None else requested & set(self.symbols)
+    
+    @classmethod
+    def available(cls):
+        return True
+    
+    def decode(self, image, symbols):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+@register_backend
+class PyzbarBackend(DecoderBackend):
+    name = "pyzbar"
+    cost = 5.0
+    symbols = tuple(name for name in pyzbar.ZBarSymbol.__members__ if name not in ("NONE", "PARTIAL"))
+    
+    def decode(self, image, symbols):
+        # 限定码制后zbar只运行对应的解码器，速度更快
+        zbar_symbols = [pyzbar.ZBarSymbol[name] for name in symbols if name in self.active_symbols]
+        if not zbar_symbols:
+            return []
+        return pyzbar.decode(np.asarray(image), symbols=zbar_symbols)
+
+
+@register_backend
+class OpenCVBackend(DecoderBackend):
+    name = "opencv"
+    cost = 15.0
+    symbols = ("QRCODE",)
+    
+    def __init__(self, symbols=None):
+        super().__init__(symbols)
+        # QRCodeDetector 不是线程安全的，每个线程各用一个
+        self.local = threading.local()
+    
+    @classmethod
+    def available(cls):
+        try:
+            import cv2
+        except ImportError:
+            return False
+        return hasattr(cv2, "QRCodeDetector")
+    
+    def decode(self, image, symbols):
+        import cv2
+        detector = getattr(self.local, "detector", None)
+        if detector is None:
+            detector = self.local.detector = cv2.QRCodeDetector()
+        ok, texts, points, _ = detector.detectAndDecodeMulti(np.ascontiguousarray(np.asarray(image)))
+        if not ok:
+            return []
+        return [_polygon_result("QRCODE", text.encode("utf-8"), quad)
+                for text, quad in zip(texts, points) if text]
+
+
+@register_backend
+class WeChatBackend(DecoderBackend):
+    """OpenCV contrib 的 WeChatQRCode；提供 model_dir 时使用其中的CNN检测和超分辨率模型"""
+    name = "wechat"
+    cost = 20.0
+    symbols = ("QRCODE",)
+    MODEL_FILES = ("detect.prototxt", "detect.caffemodel", "sr.prototxt", "sr.caffemodel")
+    
+    def __init__(self, symbols=None, model_dir=None):
+        super().__init__(symbols)
+        self.model_dir = model_dir
+        self.local = threading.local()
+    
+    @classmethod
+    def available(cls):
+        try:
+            import cv2
+        except ImportError:
+            return False
+        return hasattr(cv2, "wechat_qrcode_WeChatQRCode")
+    
+    def decode(self, image, symbols):
+        import cv2
+        detector = getattr(self.local, "detector", None)
+        if detector is None:
+            if self.model_dir:
+                detector = cv2.wechat_qrcode_WeChatQRCode(
+                    *[os.path.join(self.model_dir, name) for name in self.MODEL_FILES])
+            else:
+                detector = cv2.wechat_qrcode_WeChatQRCode()
+            self.local.detector = detector
+        texts, points = detector.detectAndDecode(np.ascontiguousarray(np.asarray(image)))
+        return [_polygon_result("QRCODE", text.encode("utf-8"), quad)
+                for text, quad in zip(texts, points) if text]
+
+
+@register_backend
+class ZXingBackend(DecoderBackend):
+    """ZXing常驻进程，覆盖pyzbar不支持的码制"""
+    name = "zxing"
+    cost = 50.0
+    # pyzbar命名到ZXing BarcodeFormat的对应关系
+    FORMATS = {
+        "QRCODE": "QR_CODE", "DATAMATRIX": "DATA_MATRIX", "PDF417": "PDF_417", "AZTEC": "AZTEC",
+        "CODE128": "CODE_128", "CODE39": "CODE_39", "CODE93": "CODE_93", "CODABAR": "CODABAR",
+        "EAN13": "EAN_13", "EAN8": "EAN_8", "UPCA": "UPC_A", "UPCE": "UPC_E", "I25": "ITF",
+    }
+    symbols = tuple(FORMATS)
+    # ZXing结果类型（去掉下划线后）与pyzbar命名不同的部分
+    RESULT_TYPES = {"ITF": "I25"}
+    
+    def __init__(self, symbols=None, worker=None):
+        super().__init__(symbols)
+        from zxing_worker import ZXingWorker
+        self.worker = worker or ZXingWorker(formats=[self.FORMATS[name] for name in sorted(self.active_symbols)])
+    
+    @classmethod
+    def available(cls):
+        return shutil.which("java") is not None
+    
+    def decode(self, image, symbols):
+        # 进程启动时已限定码制，这里只按本轮要找的码制过滤
+        results = []
+        for obj in self.worker.decode(image):
+            obj = obj._replace(type=self.RESULT_TYPES.get(obj.type, obj.type))
+            if obj.type in symbols:
+                results.append(obj)
+        return results
+    
+    def close(self):
+        self.worker.close()
+
+
+class BackendStats:
+    """单个后端在一类图像上的调用次数、命中次数、出错次数和累计耗时"""
+    __slots__ = ("calls", "hits", "symbols", "errors", "total_time")
+    
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.symbols = 0
+        self.errors = 0
+        self.total_time = 0.0
+    
+    def add(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+    
+    @property
+    def recall(self):
+        return self.hits / self.calls if self.calls else 0.0
+    
+    @property
+    def mean_ms(self):
+        return self.total_time * 1000 / self.calls if self.calls else 0.0
+    
+    def to_dict(self):
+        return {"calls": self.calls, "hits": self.hits, "symbols": self.symbols, "errors": self.errors,
+                "recall": round(self.recall, 4), "mean_ms": round(self.mean_ms, 3)}
+
+
+def _copy_stats(stats):
+    copy = BackendStats()
+    copy.add(stats)
+    return copy
+
+
+class DecoderChain:
+    """
+    按策略组合多个解码后端
+    cheapest:  按预计开销（平均耗时 / 命中率）从低到高依次尝试，命中即停止
+    race:      空闲的后端并行解码，采用最先返回的非空结果（上一张图的任务还没结束的后端不参与）
+    consensus: 所有后端并行解码，只保留至少 quorum 个后端一致认可的结果
+    
+    symbols 为按优先级排列的码制；stop_symbols 中的码制各自单独解码一轮，
+    找到后不再尝试其余码制；stop_after_first=True 相当于所有码制都命中即停止
+    """
+    def __init__(self, backends, strategy="cheapest", quorum=2, min_samples=20,
+                 symbols=None, stop_symbols=(), stop_after_first=False):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的解码策略: {strategy}")
+        if not backends:
+            raise ValueError("至少需要一个解码后端")
+        self.backends = list(backends)
+        self.strategy = strategy
+        self.quorum = quorum
+        self.min_samples = min_samples
+        self.symbols = list(dict.fromkeys(symbols or DEFAULT_SYMBOLS))
+        self.stop_after_first = stop_after_first
+        self.stop_symbols = set(self.symbols) if stop_after_first else set(stop_symbols) & set(self.symbols)
+        # 命中即停止的码制按优先级各占一轮，其余码制合并为最后一轮
+        rest = tuple(name for name in self.symbols if name not in self.stop_symbols)
+        self.passes = [(name,) for name in self.symbols if name in self.stop_symbols] + ([rest] if rest else [])
+        # 所选后端都不支持的码制
+        supported = set().union(*(backend.active_symbols for backend in self.backends))
+        self.unsupported = [name for name in self.symbols if name not in supported]
+        self.lock = threading.Lock()
+        # {(后端名称, 图像类别): BackendStats}
+        self.stats = {}
+        self.executor = None
+        # race 策略下各后端最近提交的任务 {后端名称: Future}
+        self.in_flight = {}
+        if strategy != "cheapest" and len(self.backends) > 1:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self.backends), thread_name_prefix="decoder")
+    
+    @property
+    def names(self):
+        return [backend.name for backend in self.backends]
+    
+    def _run(self, backend, image, category, symbols):
+        """调用一个后端并记录统计，出错时按未识别处理"""
+        start = time.perf_counter()
+        error = False
+        try:
+            results = backend.decode(image, symbols) or []
+        except Exception:
+            results = []
+            error = True
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            stats = self.stats.get((backend.name, category))
+            if stats is None:
+                stats = self.stats[(backend.name, category)] = BackendStats()
+            stats.calls += 1
+            stats.hits += bool(results)
+            stats.symbols += len(results)
+            stats.errors += error
+            stats.total_time += elapsed
+        return results
+    
+    def expected_cost(self, backend, category):
+        """样本足够时用实测的平均耗时除以命中率估算开销，否则使用后端的默认估计"""
+        stats = self.stats.get((backend.name, category))
+        if stats is None or stats.calls < self.min_samples:
+            return backend.cost
+        return stats.mean_ms / max(stats.recall, 0.05)
+    
+    def decode(self, image):
+        """按码制轮次和当前策略解码一张图像"""
+        category = image_class(image)
+        results = []
+        for symbols in self.passes:
+            found = self._decode_pass(image, category, symbols)
+            results.extend(found)
+            if any(obj.type in self.stop_symbols for obj in found):
+                break
+        return results
+    
+    def _decode_pass(self, image, category, symbols):
+        """用支持这些码制的后端解码一轮"""
+        backends = [backend for backend in self.backends if backend.active_symbols.intersection(symbols)]
+        if not backends:
+            return []
+        if self.strategy == "cheapest" or self.executor is None or len(backends) == 1:
+            with self.lock:
+                ordered = sorted(backends, key=lambda backend: self.expected_cost(backend, category))
+            for backend in ordered:
+                results = self._run(backend, image, category, symbols)
+                if results:
+                    return results
+            return []
+        
+        if self.strategy == "race":
+            return self._race(image, category, symbols, backends)
+        
+        futures = {self.executor.submit(self._run, backend, image, category, symbols): backend
+                   for backend in backends}
+        
+        # consensus：按 (类型, 内容) 投票，结果顺序以后端列表中的顺序为准
+        answers = {backend.name: future.result() for future, backend in futures.items()}
+        quorum = min(self.quorum, len(backends))
+        votes = {}
+        first_seen = {}
+        for backend in backends:
+            for obj in answers[backend.name]:
+                key = (obj.type, bytes(obj.data))
+                if key not in first_seen:
+                    first_seen[key] = obj
+                    votes[key] = set()
+                votes[key].add(backend.name)
+        return [obj for key, obj in first_seen.items() if len(votes[key]) >= quorum]
+    
+    def _race(self, image, category, symbols, backends):
+        """
+        先返回的非空结果胜出，胜出后取消还没开始的任务；已在运行的落后任务继续在后台运行以积累统计，
+        但在它结束前不再给该后端提交新任务，慢后端不会堆积持有图像的待处理任务；所有后端都忙时先等其中一个结束
+        """
+        with self.lock:
+            running = [self.in_flight[backend.name] for backend in backends
+                       if backend.name in self.in_flight and not self.in_flight[backend.name].done()]
+        if len(running) == len(backends):
+            concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        
+        futures = []
+        with self.lock:
+            for backend in backends:
+                previous = self.in_flight.get(backend.name)
+                if previous is not None and not previous.done():
+                    continue
+                future = self.executor.submit(self._run, backend, image, category, symbols)
+                self.in_flight[backend.name] = future
+                futures.append(future)
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                results = future.result()
+                if results:
+                    return results
+            return []
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def backend_stats(self):
+        """汇总每个后端（不分图像类别）的统计"""
+        totals = {name: BackendStats() for name in self.names}
+        with self.lock:
+            for (name, _), stats in self.stats.items():
+                totals.setdefault(name, BackendStats()).add(stats)
+        return totals
+    
+    def snapshot_stats(self):
+        """当前统计的副本 {(后端名称, 图像类别): BackendStats}，可以发送到其他进程"""
+        with self.lock:
+            return {key: _copy_stats(stats) for key, stats in self.stats.items()}
+    
+    def merge_stats(self, stats):
+        """并入其他解码链（如工作进程中的）的统计，格式同 snapshot_stats"""
+        with self.lock:
+            for key, other in stats.items():
+                self.stats.setdefault(key, BackendStats()).add(other)
+    
+    def summary(self):
+        """一行文字的统计摘要，用于批量扫描结束时显示"""
+        parts = []
+        for name, stats in self.backend_stats().items():
+            if stats.calls:
+                parts.append(f"{name} {stats.calls}次 命中率{stats.recall:.0%} 平均{stats.mean_ms:.1f}ms")
+        return "，".join(parts)
+    
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+    
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        for backend in self.backends:
+            backend.close()
+
+
+def create_chain(names=("pyzbar",), strategy="cheapest", symbols=None, **options):
+    """
+    按名称创建解码链，跳过当前环境不可用或不支持所选符号类型的后端
+    所选后端都不支持的码制（如zbar没有的DataMatrix、Aztec）在ZXing可用时自动交给ZXing
+    options 中以后端名称为键的字典作为该后端的构造参数，例如 wechat={"model_dir": ...}
+    """
+    symbols = list(symbols or DEFAULT_SYMBOLS)
+    backends = []
+    for name in names:
+        cls = BACKENDS.get(name)
+        if cls is None or not cls.available():
+            continue
+        backend = cls(symbols, **options.get(name, {}))
+        if backend.active_symbols:
+            backends.append(backend)
+    
+    covered = set().union(*(backend.active_symbols for backend in backends))
+    uncovered = [name for name in symbols if name not in covered and name in ZXingBackend.FORMATS]
+    if uncovered and "zxing" not in names and ZXingBackend.available():
+        backends.append(ZXingBackend(uncovered, **options.get("zxing", {})))
+    if not backends:
+        backends.append(PyzbarBackend(symbols))
+    return DecoderChain(backends, strategy, symbols=symbols,
+                        **{k: v for k, v in options.items() if k not in BACKENDS})
@@ -0,0 +1,207 @@
+"""
+流式网格拼图
+合并几千帧图片时，一次打开全部图片（智能模式下还有缩放副本）再建一张整图会耗尽内存，未关闭的文件句柄也会超过上限。
+这里只读图片文件头计算布局，再按网格逐行载入、粘贴并立即关闭；每行拼好的条带直接写入PNG（zlib流式压缩的IDAT）
+或TIFF（每行一个deflate压缩的条带），同时缩小拼出一张预览图，峰值内存约为输出的一行
+"""
+import os
+import sys
+import math
+import struct
+import zlib
+from collections import namedtuple
+
+from PIL import Image
+
+# 超过该像素数的结果不在内存中拼整图，只能流式写入文件
+MAX_MEMORY_PIXELS = 40_000_000
+
+# 流式写入时同时生成的预览图最长边
+PREVIEW_SIZE = 2048
+
+STREAM_FORMATS = (".png", ".tif", ".tiff")
+
+# cell 为每格大小，sizes 为每张图片粘贴时的大小，size 为整图大小
+GridLayout = namedtuple("GridLayout", ["cols", "rows", "spacing", "cell", "sizes", "size"])
+
+
+def read_sizes(paths):
+    """只读文件头得到每张图片的尺寸，读完立即关闭文件"""
+    sizes = []
+    for path in paths:
+        with Image.open(path) as img:
+            sizes.append(img.size)
+    return sizes
+
+
+def grid_layout(sizes, cols, spacing=0, smart=False):
+    """
+    计算网格布局：每格取最大宽高，左上角对齐
+    smart=True 时所有图片保持宽高比缩放到不超过 min(最大尺寸, 平均尺寸)
+    """
+    if not sizes:
+        raise ValueError("没有可合并的图片")
+    cols = max(1, min(cols, len(sizes)))
+    rows = math.ceil(len(sizes) / cols)
+    if smart:
+        target_width = min(max(w for w, _ in sizes), sum(w for w, _ in sizes) // len(sizes))
+        target_height = min(max(h for _, h in sizes), sum(h for _, h in sizes) // len(sizes))
+        scaled = []
+        for w, h in sizes:
+            ratio = min(target_width / w, target_height / h)
+            scaled.append((max(1, int(w * ratio)), max(1, int(h * ratio))))
+        sizes = scaled
+    cell = (max(w for w, _ in sizes), max(h for _, h in sizes))
+    size = (cols * cell[0] + (cols - 1) * spacing, rows * cell[1] + (rows - 1) * spacing)
+    return GridLayout(cols, rows, spacing, cell, list(sizes), size)
+
+
+def _load(path, size):
+    """载入一张图片并缩放到 size；JPEG先用draft在解码时缩小，省掉整幅解码"""
+    with Image.open(path) as img:
+        if img.size != size:
+            img.draft("RGB", size)
+            return img.convert("RGB").resize(size, Image.LANCZOS)
+        return img.convert("RGB")
+
+
+def iter_strips(paths, layout, bg_color=(255, 255, 255)):
+    """
+    逐行生成整图的横条 (y, 条带图像)：一行网格图片加上它下面的间距
+    每张图片粘贴后立即释放，同一时刻只有一行条带在内存中
+    """
+    cell_width, cell_height = layout.cell
+    for row in range(layout.rows):
+        last = row == layout.rows - 1
+        strip = Image.new("RGB", (layout.size[0], cell_height + (0 if last else layout.spacing)), bg_color)
+        for col in range(layout.cols):
+            index = row * layout.cols + col
+            if index >= len(paths):
+                break
+            strip.paste(_load(paths[index], layout.sizes[index]), (col * (cell_width + layout.spacing), 0))
+        yield row * (cell_height + layout.spacing), strip
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(file, size, strips):
+    """把条带依次写成8位RGB的PNG，IDAT数据用同一个zlib流边压缩边写出"""
+    file.write(b"\x89PNG\r\n\x1a\n")
+    file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], 8, 2, 0, 0, 0)))
+    compressor = zlib.compressobj(6)
+    for strip in strips:
+        raw = strip.tobytes()
+        stride = strip.width * 3
+        # 每行前加滤波类型0（不滤波）
+        lines = b"".join(b"\x00" + raw[i:i + stride] for i in range(0, len(raw), stride))
+        data = compressor.compress(lines)
+        if data:
+            file.write(_png_chunk(b"IDAT", data))
+    file.write(_png_chunk(b"IDAT", compressor.flush()))
+    file.write(_png_chunk(b"IEND", b""))
+
+
+def write_tiff(file, size, strips):
+    """
+    把条带依次写成8位RGB的TIFF（小端），每个条带单独deflate压缩；
+    条带的偏移和长度在写完后才知道，所以IFD放在文件末尾，最后回填文件头里的IFD偏移
+    """
+    file.write(b"II*\x00\x00\x00\x00\x00")
+    offsets, counts = [], []
+    rows_per_strip = None
+    for strip in strips:
+        rows_per_strip = rows_per_strip or strip.height
+        data = zlib.compress(strip.tobytes(), 6)
+        offsets.append(file.tell())
+        counts.append(len(data))
+        file.write(data)
+    if file.tell() % 2:
+        file.write(b"\x00")
+    
+    # 不能直接放进IFD项的值（多于4字节）先写在IFD前面
+    extra = {}
+    def put(values, fmt):
+        if len(values) == 1 and struct.calcsize("<" + fmt) <= 4:
+            return None
+        extra_offset = file.tell()
+        file.write(struct.pack(f"<{len(values)}{fmt}", *values))
+        return extra_offset
+    
+    long_type = 4
+    entries = [
+        (256, long_type, [size[0]]),
+        (257, long_type, [size[1]]),
+        (258, 3, [8, 8, 8]),
+        (259, 3, [8]),
+        (262, 3, [2]),
+        (273, long_type, offsets),
+        (277, 3, [3]),
+        (278, long_type, [rows_per_strip or size[1]]),
+        (279, long_type, counts),
+        (284, 3, [1]),
+    ]
+    for tag, kind, values in entries:
+        extra[tag] = put(values, "H" if kind == 3 else "I")
+    if file.tell() % 2:
+        file.write(b"\x00")
+    
+    ifd_offset = file.tell()
+    file.write(struct.pack("<H", len(entries)))
+    for tag, kind, values in entries:
+        fmt = "H" if kind == 3 else "I"
+        if extra[tag] is None:
+            value = struct.pack(f"<{fmt}", values[0]).ljust(4, b"\x00")
+        else:
+            value = struct.pack("<I", extra[tag])
+        file.write(struct.pack("<HHI", tag, kind, len(values)) + value)
+    file.write(struct.pack("<I", 0))
+    file.seek(4)
+    file.write(struct.pack("<I", ifd_offset))
+
+
+def merge_to_file(paths, output, layout, bg_color=(255, 255, 255), preview_size=PREVIEW_SIZE, progress=None):
+    """
+    逐行拼图并写入 output（按扩展名选择PNG或TIFF），返回缩小的预览图
+    progress(已完成行数, 总行数) 每写完一行调用一次
+    """
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in STREAM_FORMATS:
+        raise ValueError(f"流式拼图只支持PNG和TIFF: {output}")
+    scale = max(layout.size) / preview_size
+    scale = scale if scale > 1 else 1.0
+    preview = Image.new("RGB", (max(1, round(layout.size[0] / scale)), max(1, round(layout.size[1] / scale))),
+                        bg_color)
+    
+    def strips():
+        for row, (y, strip) in enumerate(iter_strips(paths, layout, bg_color)):
+            top, bottom = round(y / scale), round((y + strip.height) / scale)
+            if bottom > top:
+                preview.paste(strip.resize((preview.width, bottom - top), Image.BILINEAR), (0, top))
+            yield strip
+            if progress:
+                progress(row + 1, layout.rows)
+    
+    with open(output, "wb") as file:
+        if extension == ".png":
+            write_png(file, layout.size, strips())
+        else:
+            write_tiff(file, layout.size, strips())
+    return preview
+
+
+def merge_in_memory(paths, layout, bg_color=(255, 255, 255)):
+    """结果不大时在内存中拼出整图（仍然逐行载入，任何时候只打开一张图片）"""
+    merged = Image.new("RGB", layout.size, bg_color)
+    for y, strip in iter_strips(paths, layout, bg_color):
+        merged.paste(strip, (0, y))
+    return merged
+
+
+if __name__ == "__main__":
+    # 用法: python image_merge.py 输出.png|.tif 每行数量 图片1 图片2 ...
+    output, cols, paths = sys.argv[1], int(sys.argv[2]), sys.argv[3:]
+    layout = grid_layout(read_sizes(paths), cols, spacing=10)
+    merge_to_file(paths, output, layout, progress=lambda done, total: print(f"\r{done}/{total}", end=""))
+    print(f"\n{layout.size[0]}×{layout.size[1]} -> {output}")
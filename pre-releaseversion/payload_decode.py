@@ -0,0 +1,297 @@
+"""
+载荷自动解码
+扫到的内容经常是 base64、base32、十六进制、URL编码或 gzip/zlib 压缩，还常常层层嵌套。
+这里按代价从低到高排列一组格式检测：先用字符集和长度等廉价条件判断，符合时才真正解码；
+解码结果递归再试，限制层数和每层输出大小（解压用限长的增量解压，防止压缩炸弹），
+同一段数据的解码结果按内容缓存，批量扫描中重复的载荷和嵌套中相同的中间层只解一次；
+缓存只收小的条目并限制总字节数，每批扫描结束时清空。
+只报告得到可打印文本或已知文件签名的解码链
+"""
+import re
+import bz2
+import zlib
+import lzma
+import base64
+import binascii
+import threading
+import urllib.parse
+from collections import OrderedDict, namedtuple
+
+# 最大嵌套层数和每层解码输出的上限（字节）
+MAX_DEPTH = 6
+MAX_OUTPUT = 1024 * 1024
+
+# 文本编码的最短输入，太短的串几乎都能凑巧通过字符集检测
+MIN_LENGTH = 8
+
+# 可打印字符（含空白）占比不低于该值视为文本
+PRINTABLE_RATIO = 0.95
+
+# 解码缓存的总字节数上限（按输入和全部解码输出计），以及单个条目的上限，更大的解码结果不缓存
+CACHE_BYTES = 32 * 1024 * 1024
+CACHE_ENTRY_BYTES = 64 * 1024
+
+# 导出结果中二进制内容最多保存的字节数
+EXPORT_LIMIT = 64 * 1024
+
+# chain 为依次使用的解码方式，kind 为 "文本" 或识别出的文件类型
+DecodedForm = namedtuple("DecodedForm", ["chain", "data", "kind"])
+
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG图片"),
+    (b"\xff\xd8\xff", "JPEG图片"),
+    (b"GIF8", "GIF图片"),
+    (b"BM", "BMP图片"),
+    (b"%PDF", "PDF文档"),
+    (b"PK\x03\x04", "ZIP压缩包"),
+    (b"Rar!\x1a\x07", "RAR压缩包"),
+    (b"7z\xbc\xaf\x27\x1c", "7z压缩包"),
+    (b"\x7fELF", "ELF可执行文件"),
+    (b"MZ", "Windows可执行文件"),
+    (b"RIFF", "RIFF(WAV/AVI/WebP)"),
+    (b"ID3", "MP3音频"),
+    (b"OggS", "Ogg音频"),
+    (b"SQLite format 3\x00", "SQLite数据库"),
+)
+
+_HEX = re.compile(rb"^(?:0x)?([0-9a-fA-F]{2}(?:[\s:,-]?[0-9a-fA-F]{2})+)$")
+_BASE32 = re.compile(rb"^[A-Z2-7]+=*$")
+_BASE64 = re.compile(rb"^[A-Za-z0-9+/]+={0,2}$")
+_BASE64_URL = re.compile(rb"^[A-Za-z0-9_-]+={0,2}$")
+_PERCENT = re.compile(rb"%[0-9a-fA-F]{2}")
+_ASCII85 = re.compile(rb"^<~[!-u\sz]+~>$")
+
+
+def _limited(decompressor, data):
+    """增量解压，输出超过上限或数据不完整时放弃"""
+    try:
+        output = decompressor.decompress(data, MAX_OUTPUT + 1)
+    except (OSError, EOFError, ValueError, zlib.error, lzma.LZMAError):
+        return None
+    if len(output) > MAX_OUTPUT or not output:
+        return None
+    return output
+
+
+def decode_url(data):
+    if b"%" not in data or not _PERCENT.search(data):
+        return None
+    return urllib.parse.unquote_to_bytes(data.replace(b"+", b" "))
+
+
+def decode_hex(data):
+    match = _HEX.match(data.strip())
+    if not match or len(data.strip()) < MIN_LENGTH:
+        return None
+    digits = re.sub(rb"[\s:,-]", b"", match.group(1))
+    return bytes.fromhex(digits.decode()) if len(digits) % 2 == 0 else None
+
+
+def decode_base32(data):
+    data = data.strip()
+    if len(data) < MIN_LENGTH or len(data) % 8 or not _BASE32.match(data):
+        return None
+    try:
+        return base64.b32decode(data)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def decode_base64(data):
+    data = re.sub(rb"\s", b"", data)
+    if len(data) < MIN_LENGTH:
+        return None
+    # 省略了末尾 = 的 base64 也很常见，补齐后再解
+    padded = data + b"=" * (-len(data) % 4)
+    try:
+        if _BASE64.match(data):
+            return base64.b64decode(padded, validate=True)
+        if _BASE64_URL.match(data):
+            return base64.urlsafe_b64decode(padded)
+    except (binascii.Error, ValueError):
+        return None
+    return None
+
+
+def decode_ascii85(data):
+    data = data.strip()
+    if not _ASCII85.match(data):
+        return None
+    try:
+        return base64.a85decode(data, adobe=True)
+    except ValueError:
+        return None
+
+
+def decode_gzip(data):
+    if not data.startswith(b"\x1f\x8b"):
+        return None
+    return _limited(zlib.decompressobj(31), data)
+
+
+def decode_zlib(data):
+    # zlib头：CMF为0x78，且 (CMF·256 + FLG) 是31的倍数
+    if len(data) < 2 or data[0] != 0x78 or (data[0] * 256 + data[1]) % 31:
+        return None
+    return _limited(zlib.decompressobj(), data)
+
+
+def decode_bz2(data):
+    if not data.startswith(b"BZh"):
+        return None
+    return _limited(bz2.BZ2Decompressor(), data)
+
+
+def decode_xz(data):
+    if not data.startswith((b"\xfd7zXZ\x00", b"\x5d\x00\x00")):
+        return None
+    return _limited(lzma.LZMADecompressor(), data)
+
+
+# 按检测代价从低到高排列：压缩格式只看文件头，文本编码要检查整个字符集
+DECODERS = (
+    ("gzip", decode_gzip),
+    ("zlib", decode_zlib),
+    ("bzip2", decode_bz2),
+    ("xz", decode_xz),
+    ("URL编码", decode_url),
+    ("ascii85", decode_ascii85),
+    ("hex", decode_hex),
+    ("base32", decode_base32),
+    ("base64", decode_base64),
+)
+
+
+def signature(data):
+    """已知文件签名对应的类型，没有时返回None"""
+    for magic, kind in SIGNATURES:
+        if data.startswith(magic):
+            return kind
+    return None
+
+
+def printable_text(data):
+    """数据是可打印的utf-8文本时返回文本，否则返回None"""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if not text:
+        return None
+    printable = sum(1 for ch in text if ch.isprintable() or ch in "\r\n\t")
+    return text if printable / len(text) >= PRINTABLE_RATIO else None
+
+
+class _ByteCache:
+    """按总字节数淘汰的 LRU 缓存，可在多个线程中使用"""
+    def __init__(self, max_bytes, max_entry_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()  # 键 -> (值, 字节数)
+        self.size = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+    
+    def put(self, key, value, size):
+        if size > self.max_entry_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_cache = _ByteCache(CACHE_BYTES, CACHE_ENTRY_BYTES)
+
+
+def clear_cache():
+    """清空解码缓存，批量扫描结束时调用"""
+    _cache.clear()
+
+
+def _expand(data, depth):
+    """data 的全部解码链（不含 data 本身），返回 ((解码方式, ...), 数据, 类型) 的元组"""
+    if depth <= 0:
+        return ()
+    key = (data, depth)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    found = []
+    for name, decoder in DECODERS:
+        try:
+            output = decoder(data)
+        except Exception:
+            output = None
+        if not output or output == data or len(output) > MAX_OUTPUT:
+            continue
+        # 先判断文本：base32 等文本以 "MZ"、"BM" 开头很常见，不能按两字节的文件签名当作二进制文件
+        kind = "文本" if printable_text(output) is not None else signature(output)
+        if kind:
+            found.append(((name,), output, kind))
+        for chain, inner, inner_kind in _expand(output, depth - 1):
+            found.append(((name,) + chain, inner, inner_kind))
+    found = tuple(found)
+    _cache.put(key, found, len(data) + sum(len(output) for _, output, _ in found))
+    return found
+
+
+def decode_payload(data, max_depth=MAX_DEPTH):
+    """
+    递归尝试各种编码和压缩，返回 [DecodedForm, ...]，层数多的（解得更彻底的）在前；
+    相同的结果只保留解码链最短的一个
+    """
+    forms = {}
+    for chain, output, kind in _expand(bytes(data), max_depth):
+        known = forms.get(output)
+        if known is None or len(chain) < len(known.chain):
+            forms[output] = DecodedForm(chain, output, kind)
+    return sorted(forms.values(), key=lambda form: -len(form.chain))
+
+
+def describe(form, limit=200):
+    """一行说明：解码链、类型和内容预览"""
+    chain = " → ".join(form.chain)
+    if form.kind == "文本":
+        text = form.data.decode("utf-8")
+        preview = text if len(text) <= limit else text[:limit] + "…"
+        return f"{chain}: {preview}"
+    return f"{chain}: {form.kind}，{len(form.data)} 字节"
+
+
+def to_dicts(forms):
+    """可序列化的解码结果：文本原样保存，二进制保存为十六进制（超过 EXPORT_LIMIT 的部分截断）"""
+    result = []
+    for form in forms:
+        entry = {"chain": list(form.chain), "kind": form.kind, "size": len(form.data)}
+        if form.kind == "文本":
+            entry["text"] = form.data.decode("utf-8")
+        else:
+            entry["hex"] = form.data[:EXPORT_LIMIT].hex()
+        result.append(entry)
+    return result
+
+
+def summarize(entries):
+    """to_dicts 结果的一行摘要，用于CSV等只能放一个字段的场合"""
+    parts = []
+    for entry in entries:
+        value = entry["text"] if "text" in entry else f"{entry['kind']}({entry['size']}字节)"
+        parts.append(f"{' → '.join(entry['chain'])}: {value}")
+    return " | ".join(parts)
@@ -0,0 +1,240 @@
+"""
+去模糊
+失焦和手抖造成的模糊是仅次于光照的识别失败原因，ImageEnhance.Sharpness 对真正的模糊几乎没有作用。
+这里只在二维码候选区域上做FFT反卷积：点扩散函数库包含高斯核（失焦）和不同长度、方向的线段（运动模糊），
+候选区域的频谱只计算一次，一批点扩散函数的维纳（Wiener）复原用一次批量逆FFT得到。
+运动模糊的长度和方向由倒谱估计：长为L的线段模糊在倒谱中距原点约L处沿运动方向有很强的负峰。
+复原结果按黑白两类的可分程度打分，只把得分最高的几张交给解码器；
+也可以对这几个点扩散函数改用 Richardson–Lucy 迭代复原
+"""
+import functools
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+from qr_repair import otsu_threshold, symbol_bounds
+
+# 高斯核（失焦）的σ
+GAUSSIAN_SIGMAS = (1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0)
+
+# 从倒谱中取的运动模糊候选个数，以及可估计的最大运动长度
+MOTION_PEAKS = 4
+MAX_MOTION = 40
+
+# 候选区域缩小到的最长边，点扩散函数以该尺度的像素为单位
+MAX_SIZE = 384
+
+# 维纳滤波的噪声与信号功率比
+NOISE_RATIO = 0.01
+
+# 每批同时复原的点扩散函数个数，限制批量FFT的内存
+BATCH = 16
+
+# 缓存的点扩散函数核个数：高斯核固定几个，运动核的长度和方向来自各图的估计，批量扫描中不断出现新值
+KERNEL_CACHE_SIZE = 256
+
+METHODS = ("wiener", "richardson_lucy")
+
+# kind 为 "gaussian"（size 为σ）或 "motion"（size 为长度，angle 为方向）
+Psf = namedtuple("Psf", ["kind", "size", "angle"])
+
+# 复原后的候选图像；transform 为 3×3 矩阵，把图像中的坐标换算回原图
+DeblurCandidate = namedtuple("DeblurCandidate", ["label", "image", "transform", "score"])
+
+
+def gaussian_kernel(sigma):
+    """失焦模糊：归一化的二维高斯核，半径取3σ"""
+    radius = int(np.ceil(3 * sigma))
+    x = np.arange(-radius, radius + 1)
+    g = np.exp(-x ** 2 / (2 * sigma ** 2))
+    kernel = np.outer(g, g)
+    return kernel / kernel.sum()
+
+
+def motion_kernel(length, angle):
+    """运动模糊：长 length 像素、方向 angle 度的线段，亚像素采样后双线性分配到相邻像素"""
+    radius = int(length) // 2 + 1
+    kernel = np.zeros((2 * radius + 1, 2 * radius + 1))
+    t = np.linspace(-(length - 1) / 2, (length - 1) / 2, int(length) * 4)
+    theta = np.deg2rad(angle)
+    xs = radius + t * np.cos(theta)
+    ys = radius - t * np.sin(theta)
+    x0 = np.floor(xs).astype(int)
+    y0 = np.floor(ys).astype(int)
+    fx = xs - x0
+    fy = ys - y0
+    for dy, dx, weight in ((0, 0, (1 - fx) * (1 - fy)), (0, 1, fx * (1 - fy)),
+                           (1, 0, (1 - fx) * fy), (1, 1, fx * fy)):
+        np.add.at(kernel, (y0 + dy, x0 + dx), weight)
+    return kernel / kernel.sum()
+
+
+@functools.lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def psf_kernel(psf):
+    kernel = gaussian_kernel(psf.size) if psf.kind == "gaussian" else motion_kernel(psf.size, psf.angle)
+    kernel.flags.writeable = False
+    return kernel
+
+
+def psf_label(psf):
+    if psf.kind == "gaussian":
+        return f"失焦σ={psf.size:g}"
+    return f"运动{psf.size:g}px/{psf.angle:g}°"
+
+
+def estimate_motion(pixels, peaks=MOTION_PEAKS, max_length=MAX_MOTION):
+    """
+    用倒谱估计运动模糊：加汉宁窗后取 log|FFT| 的逆变换，在半径 3..max_length 内找最深的几个负峰，
+    峰到原点的距离约为线段长度减1，方向即运动方向；返回 [Psf, ...]，每个峰给出长度相差1像素的三个候选
+    二维码本身的模块网格也会在水平、竖直方向产生负峰，所以多取几个峰交给后面的打分筛选
+    """
+    a = pixels.astype(np.float64)
+    a = (a - a.mean()) * np.hanning(a.shape[0])[:, None] * np.hanning(a.shape[1])[None, :]
+    shape = (_fast_length(a.shape[0]), _fast_length(a.shape[1]))
+    cepstrum = np.fft.fftshift(np.fft.irfft2(np.log(np.abs(np.fft.rfft2(a, s=shape)) + 1e-3), s=shape))
+    cy, cx = np.array(cepstrum.shape) // 2
+    yy, xx = np.mgrid[:cepstrum.shape[0], :cepstrum.shape[1]]
+    radius = np.hypot(yy - cy, xx - cx)
+    # 倒谱关于原点对称，只看上半平面
+    cepstrum[(radius < 3) | (radius > min(max_length, cy, cx)) | (yy > cy) | ((yy == cy) & (xx < cx))] = np.inf
+    found = []
+    for index in np.argsort(cepstrum, axis=None)[:peaks]:
+        y, x = divmod(int(index), cepstrum.shape[1])
+        length = int(round(np.hypot(x - cx, y - cy))) + 1
+        angle = float(np.degrees(np.arctan2(cy - y, x - cx)) % 180)
+        for candidate in (length - 1, length, length + 1):
+            psf = Psf("motion", candidate, round(angle, 1))
+            if candidate >= 3 and psf not in found:
+                found.append(psf)
+    return found
+
+
+def candidate_region(gray, margin=0.1):
+    """
+    候选区域：Otsu二值化后深色像素集中的外接框，四周扩展 margin 倍边长，返回 (x0, y0, x1, y1)
+    深色像素过少的行列视为噪点；找不到时返回整张图
+    """
+    pixels = np.asarray(gray)
+    dark = pixels <= otsu_threshold(pixels)
+    bounds = symbol_bounds(dark, min_count=max(2, int(min(dark.shape) * 0.02)))
+    if bounds is None:
+        return 0, 0, gray.width, gray.height
+    x0, y0, x1, y1 = bounds
+    pad = int(max(x1 - x0, y1 - y0) * margin)
+    return max(x0 - pad, 0), max(y0 - pad, 0), min(x1 + pad, gray.width), min(y1 + pad, gray.height)
+
+
+def _otfs(bank, shape):
+    """把各点扩散函数补零到 shape 并把中心移到原点，返回批量的光学传递函数（rfft2）"""
+    stacked = np.zeros((len(bank),) + shape)
+    for i, psf in enumerate(bank):
+        kernel = psf_kernel(psf)
+        h, w = kernel.shape
+        stacked[i, :h, :w] = kernel
+        stacked[i] = np.roll(stacked[i], (-(h // 2), -(w // 2)), axis=(0, 1))
+    return np.fft.rfft2(stacked)
+
+
+def _fast_length(n):
+    """不小于 n 的最小 2^a·3^b·5^c，FFT在这样的长度上最快（素数长度可能慢几十倍）"""
+    best = 2 * n
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            length = power35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def _pad(pixels, bank):
+    """
+    边缘复制填充，减轻循环卷积在图像边界产生的振铃；右下再补到FFT的快速长度
+    返回 (填充后的图像, 原图左上角在其中的偏移)
+    """
+    pad = max(max(psf_kernel(psf).shape) for psf in bank)
+    h, w = pixels.shape
+    extra_h = _fast_length(h + 2 * pad) - h - 2 * pad
+    extra_w = _fast_length(w + 2 * pad) - w - 2 * pad
+    padded = np.pad(pixels.astype(np.float64), ((pad, pad + extra_h), (pad, pad + extra_w)), mode="edge")
+    return padded, pad
+
+
+def wiener_deconvolve(pixels, bank, noise=NOISE_RATIO):
+    """对同一张图批量做维纳反卷积，返回形状 (len(bank), H, W) 的复原结果"""
+    padded, pad = _pad(pixels, bank)
+    h, w = pixels.shape
+    G = np.fft.rfft2(padded)
+    restored = []
+    for start in range(0, len(bank), BATCH):
+        H = _otfs(bank[start:start + BATCH], padded.shape)
+        batch = np.fft.irfft2(np.conj(H) * G / (np.abs(H) ** 2 + noise), s=padded.shape)
+        restored.append(batch[:, pad:pad + h, pad:pad + w])
+    return np.concatenate(restored)
+
+
+def richardson_lucy(pixels, bank, iterations=15):
+    """对同一张图批量做 Richardson–Lucy 迭代反卷积，返回形状 (len(bank), H, W) 的复原结果"""
+    padded, pad = _pad(pixels, bank)
+    h, w = pixels.shape
+    observed = padded + 1.0
+    H = _otfs(bank, observed.shape)
+    estimate = np.broadcast_to(observed, (len(bank),) + observed.shape).copy()
+    for _ in range(iterations):
+        blurred = np.fft.irfft2(np.fft.rfft2(estimate) * H, s=observed.shape)
+        ratio = observed / np.maximum(blurred, 1e-6)
+        estimate *= np.fft.irfft2(np.fft.rfft2(ratio) * np.conj(H), s=observed.shape)
+    return estimate[:, pad:pad + h, pad:pad + w] - 1.0
+
+
+def separability(restored):
+    """
+    复原结果的黑白可分程度（Otsu的类间方差占总方差的比例），形状 (N, H, W) → (N,)
+    点扩散函数与真实模糊一致时，二维码复原为接近两种灰度的图像，得分最高
+    """
+    images = np.clip(restored, 0, 255)
+    scores = np.zeros(len(images))
+    for i, image in enumerate(images):
+        variance = image.var()
+        if variance == 0:
+            continue
+        dark = image <= otsu_threshold(image.astype(np.uint8))
+        fraction = dark.mean()
+        if 0 < fraction < 1:
+            gap = image[~dark].mean() - image[dark].mean()
+            scores[i] = fraction * (1 - fraction) * gap ** 2 / variance
+    return scores
+
+
+def deblur_candidates(gray, method="wiener", top=6):
+    """
+    在候选区域上复原：高斯核库加倒谱估计出的运动核，按可分程度排序，
+    返回得分最高的 top 个复原结果 [DeblurCandidate, ...]
+    """
+    x0, y0, x1, y1 = candidate_region(gray)
+    crop = gray.crop((x0, y0, x1, y1))
+    scale = max(crop.size) / MAX_SIZE
+    if scale > 1:
+        crop = crop.resize((max(1, round(crop.width / scale)), max(1, round(crop.height / scale))), Image.LANCZOS)
+    else:
+        scale = 1.0
+    pixels = np.asarray(crop)
+    
+    bank = [Psf("gaussian", sigma, 0) for sigma in GAUSSIAN_SIGMAS] + estimate_motion(pixels)
+    restored = wiener_deconvolve(pixels, bank)
+    scores = separability(restored)
+    best = np.argsort(-scores)[:top]
+    chosen = [bank[i] for i in best]
+    if method == "richardson_lucy":
+        images = richardson_lucy(pixels, chosen)
+    else:
+        images = restored[best]
+    transform = np.array([[scale, 0, x0], [0, scale, y0], [0, 0, 1]], dtype=float)
+    return [DeblurCandidate(psf_label(psf), Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)),
+                            transform, float(scores[i]))
+            for psf, image, i in zip(chosen, images, best)]
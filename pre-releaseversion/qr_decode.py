@@ -0,0 +1,671 @@
+"""
+纯Python/numpy的QR码解码器（Reed–Solomon纠错+纠删）
+用于zbar识别失败、但模块矩阵还能采样出来的符号：穷举32种格式信息（纠错等级×掩码），
+去掩码、按块解交织后做RS解码，可以把模块标记为“未知”（纠删），纠删能力是纠错的两倍。
+32种组合的去掩码、取码字和伴随式计算是一次性批量完成的，只对最可能的组合做完整的RS解码
+"""
+import sys
+import functools
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+import qr_matrix
+from qr_repair import symbol_size
+from qr_matrix import ECC_LEVELS, mask_matrix, reserved_modules
+
+
+class ReedSolomonError(ValueError):
+    """错误过多，无法纠正"""
+
+
+# ================== GF(256) 运算（本原多项式 0x11D，与QR码一致） ==================
+
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    GF_EXP[_i] = _x
+    GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    GF_EXP[_i] = GF_EXP[_i - 255]
+del _x, _i
+
+# numpy版本的对数表，0 的对数用不到（单独屏蔽）
+GF_EXP_ARRAY = np.array(GF_EXP, dtype=np.uint8)
+GF_LOG_ARRAY = np.array(GF_LOG, dtype=np.int32)
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_div(a, b):
+    if b == 0:
+        raise ZeroDivisionError()
+    if a == 0:
+        return 0
+    return GF_EXP[(GF_LOG[a] + 255 - GF_LOG[b]) % 255]
+
+
+def gf_pow(a, power):
+    return GF_EXP[(GF_LOG[a] * power) % 255]
+
+
+def gf_inverse(a):
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+# 多项式按最高次项在前的列表表示
+
+def gf_poly_scale(p, x):
+    return [gf_mul(c, x) for c in p]
+
+
+def gf_poly_add(p, q):
+    r = [0] * max(len(p), len(q))
+    for i, c in enumerate(p):
+        r[i + len(r) - len(p)] = c
+    for i, c in enumerate(q):
+        r[i + len(r) - len(q)] ^= c
+    return r
+
+
+def gf_poly_mul(p, q):
+    r = [0] * (len(p) + len(q) - 1)
+    for j, b in enumerate(q):
+        for i, a in enumerate(p):
+            r[i + j] ^= gf_mul(a, b)
+    return r
+
+
+def gf_poly_eval(p, x):
+    y = p[0]
+    for c in p[1:]:
+        y = gf_mul(y, x) ^ c
+    return y
+
+
+def gf_poly_div(dividend, divisor):
+    """多项式除法，返回 (商, 余数)"""
+    out = list(dividend)
+    for i in range(len(dividend) - len(divisor) + 1):
+        coef = out[i]
+        if coef != 0:
+            for j in range(1, len(divisor)):
+                if divisor[j] != 0:
+                    out[i + j] ^= gf_mul(divisor[j], coef)
+    separator = -(len(divisor) - 1)
+    return out[:separator], out[separator:]
+
+
+@functools.lru_cache(maxsize=None)
+def rs_generator(nsym):
+    """生成多项式 (x - α^0)(x - α^1)...(x - α^(nsym-1))"""
+    g = [1]
+    for i in range(nsym):
+        g = gf_poly_mul(g, [1, gf_pow(2, i)])
+    return tuple(g)
+
+
+def rs_encode(data, nsym):
+    """计算 nsym 个纠错码字"""
+    _, remainder = gf_poly_div(list(data) + [0] * nsym, list(rs_generator(nsym)))
+    return remainder
+
+
+def rs_syndromes(msg, nsym):
+    return [gf_poly_eval(msg, gf_pow(2, i)) for i in range(nsym)]
+
+
+def _errata_locator(coef_pos):
+    loc = [1]
+    for p in coef_pos:
+        loc = gf_poly_mul(loc, gf_poly_add([1], [gf_pow(2, p), 0]))
+    return loc
+
+
+def _forney_syndromes(synd, erase_pos, length):
+    fsynd = list(synd)
+    for p in erase_pos:
+        x = gf_pow(2, length - 1 - p)
+        for j in range(len(fsynd) - 1):
+            fsynd[j] = gf_mul(fsynd[j], x) ^ fsynd[j + 1]
+    return fsynd
+
+
+def _error_locator(synd, nsym, erase_count):
+    """Berlekamp–Massey 求错误位置多项式（已用Forney伴随式消去纠删）"""
+    err_loc = [1]
+    old_loc = [1]
+    for i in range(nsym - erase_count):
+        delta = synd[i]
+        for j in range(1, len(err_loc)):
+            delta ^= gf_mul(err_loc[-(j + 1)], synd[i - j])
+        old_loc = old_loc + [0]
+        if delta != 0:
+            if len(old_loc) > len(err_loc):
+                new_loc = gf_poly_scale(old_loc, delta)
+                old_loc = gf_poly_scale(err_loc, gf_inverse(delta))
+                err_loc = new_loc
+            err_loc = gf_poly_add(err_loc, gf_poly_scale(old_loc, delta))
+    while err_loc and err_loc[0] == 0:
+        del err_loc[0]
+    if (len(err_loc) - 1) * 2 + erase_count > nsym:
+        raise ReedSolomonError("错误过多")
+    return err_loc
+
+
+def _find_errors(err_loc, length):
+    """Chien搜索：错误位置多项式的根对应的码字下标"""
+    positions = [length - 1 - i for i in range(length) if gf_poly_eval(err_loc, gf_pow(2, i)) == 0]
+    if len(positions) != len(err_loc) - 1:
+        raise ReedSolomonError("错误位置搜索失败")
+    return positions
+
+
+def _correct_errata(msg, synd, err_pos):
+    """Forney算法计算每个错误/纠删位置的错误值并改正"""
+    coef_pos = [len(msg) - 1 - p for p in err_pos]
+    err_loc = _errata_locator(coef_pos)
+    # 伴随式多项式 S(x) = S_0·x + S_1·x^2 + ...（最低次项补0）
+    _, remainder = gf_poly_div(gf_poly_mul(([0] + synd)[::-1], err_loc), [1] + [0] * len(err_loc))
+    err_eval = remainder[::-1]
+    X = [gf_pow(2, p) for p in coef_pos]
+    msg = list(msg)
+    for i, Xi in enumerate(X):
+        Xi_inv = gf_inverse(Xi)
+        denominator = 1
+        for j, Xj in enumerate(X):
+            if j != i:
+                denominator = gf_mul(denominator, 1 ^ gf_mul(Xi_inv, Xj))
+        if denominator == 0:
+            raise ReedSolomonError("无法计算错误值")
+        y = gf_mul(Xi, gf_poly_eval(err_eval[::-1], Xi_inv))
+        msg[err_pos[i]] ^= gf_div(y, denominator)
+    return msg
+
+
+def rs_correct(msg, nsym, erase_pos=()):
+    """
+    纠正一个RS码块（数据+纠错码字），erase_pos 为已知出错（未知值）的码字下标
+    返回 (改正后的码块, 改正的码字数)；错误超过纠错能力时抛出 ReedSolomonError
+    """
+    original = list(msg)
+    msg = list(msg)
+    erase_pos = list(erase_pos)
+    if len(erase_pos) > nsym:
+        raise ReedSolomonError("纠删位置过多")
+    for p in erase_pos:
+        msg[p] = 0
+    synd = rs_syndromes(msg, nsym)
+    if not any(synd):
+        return msg, sum(1 for a, b in zip(original, msg) if a != b)
+    fsynd = _forney_syndromes(synd, erase_pos, len(msg))
+    err_loc = _error_locator(fsynd, nsym, len(erase_pos))
+    err_pos = _find_errors(err_loc[::-1], len(msg))
+    corrected = _correct_errata(msg, synd, erase_pos + err_pos)
+    if any(rs_syndromes(corrected, nsym)):
+        raise ReedSolomonError("纠错后校验失败")
+    return corrected, sum(1 for a, b in zip(original, corrected) if a != b)
+
+
+# ================== 码块结构 ==================
+
+# 每块纠错码字数和块数，按纠错等级 L、M、Q、H 和版本1~40排列
+ECC_CODEWORDS_PER_BLOCK = {
+    "L": (7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+          28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "M": (10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+          26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    "Q": (13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+          28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "H": (17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+          30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+}
+NUM_BLOCKS = {
+    "L": (1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+          8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    "M": (1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+          17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    "Q": (1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+          23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    "H": (1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+          25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+}
+
+
+def raw_codewords(version):
+    """符号中数据和纠错码字的总数（不含剩余位）"""
+    modules = (16 * version + 128) * version + 64
+    if version >= 2:
+        count = version // 7 + 2
+        modules -= (25 * count - 10) * count - 55
+        if version >= 7:
+            modules -= 36
+    return modules // 8
+
+
+@functools.lru_cache(maxsize=None)
+def block_layout(version, level):
+    """
+    码块结构，返回 (每块数据码字数列表, 每块纠错码字数, 解交织下标)
+    按解交织下标取码字即得到依次排列的各块（数据+纠错）
+    """
+    total = raw_codewords(version)
+    count = NUM_BLOCKS[level][version - 1]
+    ecc = ECC_CODEWORDS_PER_BLOCK[level][version - 1]
+    short_length = total // count
+    long_count = total % count
+    data_lengths = [short_length - ecc + (1 if i >= count - long_count else 0) for i in range(count)]
+    
+    # 交织顺序：各块数据码字轮流排列，再是各块纠错码字
+    positions = [[] for _ in range(count)]
+    index = 0
+    for i in range(max(data_lengths)):
+        for block in range(count):
+            if i < data_lengths[block]:
+                positions[block].append(index)
+                index += 1
+    for i in range(ecc):
+        for block in range(count):
+            positions[block].append(index)
+            index += 1
+    return data_lengths, ecc, np.concatenate(positions)
+
+
+@functools.lru_cache(maxsize=None)
+def codeword_positions(version):
+    """
+    按放置顺序（从右下角起两列一组之字形）排列的数据模块坐标 (行, 列)，
+    只保留整码字部分，剩余位不计
+    """
+    n = symbol_size(version)
+    rights = np.arange(n - 1, 0, -2)
+    # 跳过竖向时序图案所在的第6列
+    rights[rights <= 6] -= 1
+    upward = ((rights + 1) & 2) == 0
+    vert = np.arange(n)
+    cols = np.broadcast_to(rights[:, None, None] - np.arange(2)[None, None, :], (len(rights), n, 2))
+    rows = np.broadcast_to(np.where(upward[:, None, None], n - 1 - vert[None, :, None], vert[None, :, None]),
+                           (len(rights), n, 2))
+    rows = rows.ravel()
+    cols = cols.ravel()
+    data = ~reserved_modules(version)[rows, cols]
+    count = raw_codewords(version) * 8
+    return rows[data][:count], cols[data][:count]
+
+
+@functools.lru_cache(maxsize=None)
+def _all_masks(version):
+    """8种掩码在数据模块上的取值，形状 (8, 码字数×8)"""
+    rows, cols = codeword_positions(version)
+    n = symbol_size(version)
+    return np.stack([mask_matrix(mask, n)[rows, cols] for mask in range(8)])
+
+
+def masked_codewords(modules, version):
+    """8种掩码分别去掩码后的码字流（交织顺序），形状 (8, 码字数)"""
+    rows, cols = codeword_positions(version)
+    bits = modules[rows, cols][None, :] ^ _all_masks(version)
+    return np.packbits(bits, axis=1)
+
+
+def erased_codewords(erased, version):
+    """每个码字（交织顺序）中未知模块的数量"""
+    rows, cols = codeword_positions(version)
+    counts = erased[rows, cols].reshape(-1, 8).sum(1)
+    return counts
+
+
+def batch_syndromes(blocks, nsym):
+    """
+    批量计算伴随式：blocks 形状 (..., L) 的码块，返回 (..., nsym)
+    S_j = Σ c_i · α^(j·(L-1-i))，用对数表做乘法，异或求和
+    """
+    length = blocks.shape[-1]
+    logs = GF_LOG_ARRAY[blocks]
+    powers = (np.arange(nsym)[:, None] * (length - 1 - np.arange(length))[None, :]) % 255
+    terms = GF_EXP_ARRAY[logs[..., None, :] + powers]
+    terms[np.broadcast_to((blocks == 0)[..., None, :], terms.shape)] = 0
+    return np.bitwise_xor.reduce(terms, axis=-1)
+
+
+def clean_blocks(streams, version, level):
+    """
+    各码块的伴随式是否全为0（无需纠错），streams 形状 (..., 码字数) 为交织顺序的码字流，
+    返回 (..., 块数) 的布尔数组；长块和短块分别批量计算
+    """
+    data_lengths, ecc, order = block_layout(version, level)
+    blocks = streams[..., order]
+    lengths = np.array(data_lengths) + ecc
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    clean = np.zeros(streams.shape[:-1] + (len(lengths),), dtype=bool)
+    for length in np.unique(lengths):
+        group = np.flatnonzero(lengths == length)
+        synd = batch_syndromes(blocks[..., starts[group][:, None] + np.arange(length)], ecc)
+        clean[..., group] = (synd == 0).all(-1)
+    return clean
+
+
+# ================== 数据解析 ==================
+
+ALPHANUMERIC = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+
+MODE_NAMES = {1: "数字", 2: "字母数字", 4: "字节", 8: "汉字", 7: "ECI", 3: "结构链接", 5: "FNC1", 9: "FNC1"}
+
+
+def _count_bits(mode, version):
+    """字符计数指示符的位数"""
+    group = 0 if version <= 9 else (1 if version <= 26 else 2)
+    return {1: (10, 12, 14), 2: (9, 11, 13), 4: (8, 16, 16), 8: (8, 10, 12)}[mode][group]
+
+
+class BitReader:
+    def __init__(self, data):
+        self.bits = "".join(f"{byte:08b}" for byte in data)
+        self.pos = 0
+    
+    def remaining(self):
+        return len(self.bits) - self.pos
+    
+    def read(self, count):
+        if count > self.remaining():
+            raise ValueError("数据位不足")
+        value = int(self.bits[self.pos:self.pos + count] or "0", 2)
+        self.pos += count
+        return value
+
+
+def _segment_data(segments):
+    """拼接各数据段的内容；ECI和结构链接是头信息，不属于数据"""
+    return b"".join(content for mode, content in segments if mode not in ("ECI", "结构链接"))
+
+
+def parse_segments(data, version):
+    """
+    解析数据码字中的各个数据段
+    返回 (段列表 [(模式, 内容字节)], 拼接后的数据, 终止符开始的位位置)
+    """
+    reader = BitReader(data)
+    segments = []
+    while reader.remaining() >= 4:
+        start = reader.pos
+        mode = reader.read(4)
+        if mode == 0:
+            return segments, _segment_data(segments), start
+        if mode == 7:
+            first = reader.read(8)
+            if first & 0x80 == 0:
+                value = first
+            elif first & 0xC0 == 0x80:
+                value = ((first & 0x3F) << 8) | reader.read(8)
+            else:
+                value = ((first & 0x1F) << 16) | reader.read(16)
+            segments.append(("ECI", str(value).encode()))
+            continue
+        if mode == 3:
+            # 结构链接：序号、总数和奇偶校验
+            segments.append(("结构链接", bytes([reader.read(8), reader.read(8)])))
+            continue
+        if mode == 5:
+            continue
+        if mode == 9:
+            reader.read(8)
+            continue
+        if mode not in (1, 2, 4, 8):
+            raise ValueError(f"未知的数据模式 {mode:04b}")
+        
+        count = reader.read(_count_bits(mode, version))
+        if mode == 1:
+            digits = []
+            while count >= 3:
+                digits.append(f"{reader.read(10):03d}")
+                count -= 3
+            if count == 2:
+                digits.append(f"{reader.read(7):02d}")
+            elif count == 1:
+                digits.append(str(reader.read(4)))
+            content = "".join(digits).encode()
+        elif mode == 2:
+            chars = []
+            while count >= 2:
+                value = reader.read(11)
+                chars.append(ALPHANUMERIC[value // 45] + ALPHANUMERIC[value % 45])
+                count -= 2
+            if count:
+                chars.append(ALPHANUMERIC[reader.read(6)])
+            content = "".join(chars).encode()
+        elif mode == 4:
+            content = bytes(reader.read(8) for _ in range(count))
+        else:
+            # 汉字模式：13位还原为Shift-JIS双字节
+            out = bytearray()
+            for _ in range(count):
+                value = reader.read(13)
+                code = ((value // 0xC0) << 8) | (value % 0xC0)
+                code += 0x8140 if code < 0x1F00 else 0xC140
+                out += code.to_bytes(2, "big")
+            content = bytes(out)
+        segments.append((MODE_NAMES[mode], content))
+    return segments, _segment_data(segments), reader.pos
+
+
+class QRDecodeResult:
+    """纯Python解码的结果：数据、使用的格式和每个码块的纠错情况"""
+    def __init__(self, version, ecc_level, mask, segments, data, blocks, raw_blocks, corrections, end_bit):
+        self.version = version
+        self.ecc_level = ecc_level
+        self.mask = mask
+        self.segments = segments
+        self.data = data
+        # 每块 (数据码字, 纠错码字)：blocks 为纠正后，raw_blocks 为采样读到的
+        self.blocks = blocks
+        self.raw_blocks = raw_blocks
+        self.corrections = corrections
+        self.end_bit = end_bit
+    
+    @property
+    def data_codewords(self):
+        """按块顺序拼接的数据码字"""
+        return [c for data, _ in self.blocks for c in data]
+    
+    def to_decoded(self, polygon=()):
+        """转换为与pyzbar结果同结构的 decoders.DecodedResult"""
+        # decoders 导入时需要pyzbar（libzbar），这里才导入，纯Python解码和命令行不依赖它
+        import decoders
+        
+        polygon = [(int(round(x)), int(round(y))) for x, y in polygon]
+        if polygon:
+            xs = [p[0] for p in polygon]
+            ys = [p[1] for p in polygon]
+            rect = (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+        else:
+            rect = (0, 0, 0, 0)
+        return decoders.DecodedResult("QRCODE", self.data, rect, polygon, 1, None)
+    
+    def report(self):
+        segments = "，".join(f"{mode}({len(content)})" for mode, content in self.segments)
+        return (f"纯Python解码: 版本 {self.version}，纠错等级 {self.ecc_level}，掩码 {self.mask}，"
+                f"纠正 {sum(self.corrections)} 个码字（各块 {self.corrections}），数据段: {segments}")
+
+
+def _decode_candidate(codewords, version, level, mask, erased_counts):
+    data_lengths, ecc, order = block_layout(version, level)
+    clean = clean_blocks(codewords, version, level)
+    blocks = []
+    raw_blocks = []
+    corrections = []
+    start = 0
+    for number, data_length in enumerate(data_lengths):
+        length = data_length + ecc
+        block_index = order[start:start + length]
+        start += length
+        block = [int(c) for c in codewords[block_index]]
+        # 未知模块最多的码字优先作为纠删，数量不超过纠错码字数
+        erase = []
+        if erased_counts is not None:
+            counts = erased_counts[block_index]
+            erase = [int(i) for i in np.argsort(-counts, kind="stable")[:ecc] if counts[i] > 0]
+        # 伴随式为0且没有纠删的块不用再跑RS
+        corrected, count = (block, 0) if clean[number] and not erase else rs_correct(block, ecc, erase)
+        blocks.append((corrected[:data_length], corrected[data_length:]))
+        raw_blocks.append((block[:data_length], block[data_length:]))
+        corrections.append(count)
+    data = [c for block_data, _ in blocks for c in block_data]
+    segments, payload, end_bit = parse_segments(data, version)
+    return QRDecodeResult(version, level, mask, segments, payload, blocks, raw_blocks, corrections, end_bit)
+
+
+def rank_formats(modules, version, format_hint=None):
+    """
+    给32种 (纠错等级, 掩码) 组合排序：批量计算所有组合所有码块的伴随式，
+    格式信息读出的组合最先，其余按伴随式全为0的块的比例排序。
+    单块的版本中，较强纠错等级的合法码字同时也是较弱等级的合法码字，同分时较强的等级在前
+    返回 [(纠错等级, 掩码), ...] 和对应的码字流
+    """
+    streams = masked_codewords(modules, version)
+    ranked = []
+    for level_bits, level in ECC_LEVELS.items():
+        ecc = ECC_CODEWORDS_PER_BLOCK[level][version - 1]
+        clean = clean_blocks(streams, version, level).mean(-1)
+        for mask in range(8):
+            code = (level_bits << 3) | mask
+            ranked.append(((code != format_hint, -clean[mask], -ecc), level, mask))
+    ranked.sort(key=lambda item: item[0])
+    return [(level, mask) for _, level, mask in ranked], streams
+
+
+def decode_matrix(matrix, erased=None, max_candidates=32):
+    """
+    对 qr_matrix.ModuleMatrix 做纯Python解码
+    erased 为 n×n 布尔矩阵，标出未知（损坏）的模块；为 None 时使用采样时判为不确定的模块
+    返回 QRDecodeResult，所有组合都无法解码时返回 None
+    """
+    version = matrix.version
+    if erased is None:
+        erased = matrix.uncertain
+    # 先按标记的纠删解码，失败（比如误标过多）再只做纠错
+    erasure_options = [None]
+    if erased is not None and erased.any():
+        erasure_options.insert(0, erased_codewords(erased, version))
+    
+    hint = None
+    if matrix.format_valid:
+        hint = ({v: k for k, v in ECC_LEVELS.items()}[matrix.ecc_level] << 3) | matrix.mask
+    candidates, streams = rank_formats(matrix.modules, version, hint)
+    for erased_counts in erasure_options:
+        for level, mask in candidates[:max_candidates]:
+            try:
+                return _decode_candidate(streams[mask], version, level, mask, erased_counts)
+            except (ReedSolomonError, ValueError, IndexError):
+                continue
+    return None
+
+
+def decode_modules(modules, erased=None):
+    """直接对 n×n 模块矩阵解码，版本由边长推出"""
+    version = (len(modules) - 17) // 4
+    return decode_matrix(qr_matrix.ModuleMatrix(np.asarray(modules, dtype=bool), version), erased)
+
+
+# ================== 隐藏数据检查 ==================
+
+# 标准的填充码字，交替出现
+PAD_CODEWORDS = (0xEC, 0x11)
+
+# kind 为所在区域，detail 为说明，data 为该区域读出的原始字节
+HiddenData = namedtuple("HiddenData", ["kind", "detail", "data"])
+
+
+def _bits_to_bytes(bits):
+    """按8位分组转换为字节，不足8位的尾部补0"""
+    bits += "0" * (-len(bits) % 8)
+    return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+
+
+def _trailing_segments(bits, version):
+    """尝试把终止符之后的位解析为数据段，解析不出内容时返回 None"""
+    try:
+        segments, payload, _ = parse_segments(_bits_to_bytes(bits), version)
+    except ValueError:
+        return None
+    if not payload:
+        return None
+    return "，".join(f"{mode}({len(content)})" for mode, content in segments), payload
+
+
+def structured_append(result):
+    """结构链接头，返回 (序号（从0开始）, 总数, 奇偶校验)；没有时返回None"""
+    for mode, content in result.segments:
+        if mode == "结构链接":
+            return content[0] >> 4, (content[0] & 0x0F) + 1, content[1]
+    return None
+
+
+def find_hidden_data(result):
+    """
+    检查 QRDecodeResult 中常规解码器忽略的区域，返回 [HiddenData, ...]：
+    终止符或字节补齐位不为0、填充码字不是 EC/11 交替、终止符之后还能解析出的数据段，
+    以及采样读到的码字与按纠正后的数据重新计算的码字不一致的位置
+    """
+    findings = []
+    data = result.data_codewords
+    bits = "".join(f"{byte:08b}" for byte in data)
+    end = result.end_bit
+    terminator = bits[end:end + 4]
+    after = end + len(terminator)
+    padding_start = -(-after // 8) * 8
+    if "1" in terminator:
+        findings.append(HiddenData("终止符", f"第 {end} 位起的终止符为 {terminator}", b""))
+    if "1" in bits[after:padding_start]:
+        findings.append(HiddenData("补齐位", f"字节补齐位为 {bits[after:padding_start]}", b""))
+    
+    padding = bytes(data[padding_start // 8:])
+    expected = bytes(PAD_CODEWORDS[i % 2] for i in range(len(padding)))
+    if padding != expected:
+        first = next(i for i in range(len(padding)) if padding[i] != expected[i])
+        findings.append(HiddenData("填充码字", f"{len(padding)} 个填充码字从第 {first + 1} 个起不是 EC/11 交替",
+                                   padding))
+        # 解码器读到终止符就停止，终止符之后（或字节对齐之后）可能还藏着完整的数据段
+        for start in dict.fromkeys((after, padding_start)):
+            trailing = _trailing_segments(bits[start:], result.version)
+            if trailing:
+                findings.append(HiddenData("终止符后数据段", f"第 {start} 位起: {trailing[0]}", trailing[1]))
+                break
+    
+    for number, ((block_data, block_ecc), (raw_data, raw_ecc)) in enumerate(zip(result.blocks, result.raw_blocks), 1):
+        # 纠正后的码字流一定合法，与采样值不同的位置就是被改动（或损坏）的码字
+        recomputed = rs_encode(block_data, len(block_ecc))
+        for kind, read, correct in (("数据码字", raw_data, block_data), ("纠错码字", raw_ecc, recomputed)):
+            changed = [i for i, (a, b) in enumerate(zip(read, correct)) if a != b]
+            if changed:
+                positions = "、".join(str(i + 1) for i in changed)
+                findings.append(HiddenData(kind, f"块 {number} 第 {positions} 个码字与重新计算的不一致",
+                                           bytes(read[i] for i in changed)))
+    return findings
+
+
+if __name__ == "__main__":
+    # 用法: python qr_decode.py 图片或导出的矩阵文件(.bits/.txt，? 表示未知模块)
+    path = sys.argv[1]
+    if path.lower().endswith((".bits", ".txt")):
+        found = [qr_matrix.ModuleMatrix.load(path)]
+    else:
+        with Image.open(path) as image:
+            found = qr_matrix.analyze_image(image)
+    for matrix in found:
+        result = decode_matrix(matrix)
+        if result is None:
+            print("无法解码（错误超过纠错能力）")
+            continue
+        print(result.report())
+        print(result.data.decode("utf-8", errors="replace"))
+        for kind, detail, data in find_hidden_data(result):
+            print(f"[{kind}] {detail}" + (f": {data.hex(' ')}" if data else ""))
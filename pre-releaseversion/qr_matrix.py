@@ -0,0 +1,398 @@
+"""
+二维码模块矩阵提取和底层分析
+用解码器给出的四边形顶点求单应矩阵，把符号采样成精确的模块矩阵（每个模块一个比特），
+读出版本、纠错等级、掩码和格式信息的校验情况，并可导出为文本、01位串或重新渲染的标准PNG，
+作为手工修复损坏二维码的基础。采样全部是按网格整体进行的numpy索引，没有逐模块的Python循环
+"""
+import sys
+import functools
+
+import numpy as np
+from PIL import Image
+
+import qr_repair
+from qr_repair import symbol_size, function_patterns
+
+# 格式信息中纠错等级的编码（与qrcode库的 ERROR_CORRECT_* 常量一致）
+ECC_LEVELS = {1: "L", 0: "M", 3: "Q", 2: "H"}
+
+FORMAT_GENERATOR = 0b10100110111
+FORMAT_MASK = 0b101010000010010
+VERSION_GENERATOR = 0b1111100100101
+
+# 掩码条件，i 为行，j 为列
+MASK_PATTERNS = [
+    lambda i, j: (i + j) % 2 == 0,
+    lambda i, j: i % 2 == 0,
+    lambda i, j: j % 3 == 0,
+    lambda i, j: (i + j) % 3 == 0,
+    lambda i, j: (i // 2 + j // 3) % 2 == 0,
+    lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
+    lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+    lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+]
+
+
+def _bch_remainder(value, generator):
+    """BCH码的校验位：value 左移后对生成多项式取模"""
+    shift = generator.bit_length() - 1
+    remainder = value << shift
+    while remainder.bit_length() > shift:
+        remainder ^= generator << (remainder.bit_length() - generator.bit_length())
+    return remainder
+
+
+# 32种合法格式信息（数据为 纠错等级<<3 | 掩码）
+FORMAT_CODES = np.array([((data << 10) | _bch_remainder(data, FORMAT_GENERATOR)) ^ FORMAT_MASK
+                         for data in range(32)])
+# 版本7~40的版本信息
+VERSION_CODES = np.array([(version << 12) | _bch_remainder(version, VERSION_GENERATOR) for version in range(7, 41)])
+
+
+def format_positions(n):
+    """两份格式信息的模块坐标，返回 ((行, 列), (行, 列))，下标 i 对应第 i 位"""
+    i = np.arange(15)
+    # 第一份围绕左上角定位图案：第0~7位在第8列，第8~14位在第8行
+    rows1 = np.where(i < 6, i, np.where(i < 8, i + 1, 8))
+    cols1 = np.where(i < 8, 8, np.where(i < 9, 7, 14 - i))
+    # 第二份分在右上角（第0~7位）和左下角（第8~14位）
+    rows2 = np.where(i < 8, 8, n - 15 + i)
+    cols2 = np.where(i < 8, n - 1 - i, 8)
+    return (rows1, cols1), (rows2, cols2)
+
+
+def version_positions(n):
+    """两份版本信息（版本7及以上）的模块坐标，下标 i 对应第 i 位"""
+    i = np.arange(18)
+    return (i // 3, i % 3 + n - 11), (i % 3 + n - 11, i // 3)
+
+
+@functools.lru_cache(maxsize=None)
+def reserved_modules(version):
+    """功能图形、格式信息和版本信息占用的模块，其余为数据和纠错码字模块（只读）"""
+    n = symbol_size(version)
+    reserved = function_patterns(version)[0].copy()
+    for rows, cols in format_positions(n):
+        reserved[rows, cols] = True
+    if version >= 7:
+        for rows, cols in version_positions(n):
+            reserved[rows, cols] = True
+    reserved.flags.writeable = False
+    return reserved
+
+
+def mask_matrix(mask, n):
+    """掩码图案的 n×n 布尔矩阵"""
+    i, j = np.indices((n, n))
+    return MASK_PATTERNS[mask](i, j)
+
+
+def _bits_to_int(bits):
+    return int((bits.astype(np.int64) << np.arange(len(bits))).sum())
+
+
+def _nearest(value, codes):
+    """与 value 汉明距离最小的合法码字，返回 (下标, 距离)"""
+    distance = np.array([bin(int(code) ^ value).count("1") for code in codes])
+    best = int(distance.argmin())
+    return best, int(distance[best])
+
+
+def homography(src, dst):
+    """由四对点求 3×3 单应矩阵，使 dst ~ H @ src"""
+    A = []
+    b = []
+    for (x, y), (u, v) in zip(src, dst):
+        A.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        A.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        b.extend([u, v])
+    h = np.linalg.solve(np.array(A, dtype=float), np.array(b, dtype=float))
+    return np.append(h, 1).reshape(3, 3)
+
+
+def project(H, points):
+    """对形状为 (..., 2) 的坐标批量做单应变换"""
+    points = np.asarray(points, dtype=float)
+    mapped = points @ H[:, :2].T + H[:, 2]
+    return mapped[..., :2] / mapped[..., 2:3]
+
+
+def order_corners(polygon):
+    """
+    从解码器给出的多边形取四个角，并按绕中心的角度排成环
+    多于四个点时取 x+y、x-y 的极值点
+    """
+    points = np.asarray(polygon, dtype=float)
+    if len(points) != 4:
+        s = points.sum(1)
+        d = points[:, 0] - points[:, 1]
+        points = points[[s.argmin(), d.argmax(), s.argmax(), d.argmin()]]
+    center = points.mean(0)
+    angle = np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+    return points[np.argsort(angle)]
+
+
+def sample_fraction(dark, H, n, spread=0.2):
+    """
+    把模块坐标系中每个模块中心及其周围8个点映射到图像上采样，返回每个模块中深色采样点的比例
+    spread 为周围采样点离中心的距离（模块边长的比例）
+    """
+    offsets = np.array([(dx, dy) for dy in (-spread, 0, spread) for dx in (-spread, 0, spread)])
+    centers = np.stack(np.meshgrid(np.arange(n) + 0.5, np.arange(n) + 0.5), axis=-1)
+    points = project(H, centers[:, :, None, :] + offsets)
+    X = np.floor(points[..., 0]).astype(np.intp)
+    Y = np.floor(points[..., 1]).astype(np.intp)
+    h, w = dark.shape
+    inside = (X >= 0) & (X < w) & (Y >= 0) & (Y < h)
+    sampled = dark[np.clip(Y, 0, h - 1), np.clip(X, 0, w - 1)] & inside
+    return sampled.mean(-1)
+
+
+def sample_grid(dark, H, n, spread=0.2):
+    """多数采样点为深色即记为深色模块"""
+    return sample_fraction(dark, H, n, spread) > 0.5
+
+
+class ModuleMatrix:
+    """
+    一个二维码符号的模块矩阵及其格式、版本信息
+    modules 为 n×n 布尔矩阵（True为深色），homography 把模块坐标映射到原图像素坐标，
+    uncertain 标出采样结果不确定（或手工标为未知）的模块，纯Python解码时作为纠删
+    """
+    def __init__(self, modules, version, homography=None, uncertain=None):
+        self.modules = modules
+        self.version = version
+        self.homography = homography
+        self.uncertain = uncertain
+        self.size = symbol_size(version)
+        
+        mask, value = function_patterns(version)
+        # 功能图形与标准图形的吻合比例，越接近1说明网格越准
+        self.pattern_score = float((modules[mask] == value[mask]).mean())
+        
+        # 两份格式信息分别纠错，取距离较小的一份
+        self.format_reads = []
+        for rows, cols in format_positions(self.size):
+            raw = _bits_to_int(modules[rows, cols])
+            index, distance = _nearest(raw, FORMAT_CODES)
+            self.format_reads.append((raw, index, distance))
+        raw, index, self.format_distance = min(self.format_reads, key=lambda read: read[2])
+        self.format_valid = self.format_distance <= 3
+        self.ecc_level = ECC_LEVELS[index >> 3]
+        self.mask = index & 7
+        
+        self.version_reads = []
+        if version >= 7:
+            for rows, cols in version_positions(self.size):
+                raw = _bits_to_int(modules[rows, cols])
+                index, distance = _nearest(raw, VERSION_CODES)
+                self.version_reads.append((raw, index + 7, distance))
+    
+    @property
+    def version_info(self):
+        """版本信息解出的 (版本, 距离)，版本6及以下没有版本信息时为 None"""
+        if not self.version_reads:
+            return None
+        _, version, distance = min(self.version_reads, key=lambda read: read[2])
+        return version, distance
+    
+    @classmethod
+    def from_samples(cls, fraction, version, homography=None, margin=0.2):
+        """由每个模块的深色采样比例创建，比例离0.5不超过 margin 的模块记为不确定"""
+        return cls(fraction > 0.5, version, homography, np.abs(fraction - 0.5) <= margin)
+    
+    @classmethod
+    def load(cls, path):
+        """
+        读取导出的01位串（.bits）或字符画文本，位串中的 ? 表示未知模块（纠删）
+        """
+        with open(path, encoding="utf-8") as f:
+            lines = [line.rstrip("\r\n") for line in f if line.strip()]
+        if all(set(line) <= set("01?") for line in lines):
+            rows = [list(line) for line in lines]
+        else:
+            # 字符画每个模块两个字符
+            rows = [["1" if line[i:i + 2].strip() else "0" for i in range(0, len(line), 2)] for line in lines]
+            width = max(len(row) for row in rows)
+            rows = [row + ["0"] * (width - len(row)) for row in rows]
+        grid = np.array(rows)
+        n = len(grid)
+        if grid.shape != (n, n) or (n - 17) % 4 or not 21 <= n <= 177:
+            raise ValueError(f"矩阵大小 {grid.shape} 不是合法的二维码尺寸")
+        unknown = grid == "?"
+        return cls(grid == "1", (n - 17) // 4, uncertain=unknown if unknown.any() else None)
+    
+    def polygon(self):
+        """符号四个角在原图中的坐标"""
+        if self.homography is None:
+            return []
+        n = self.size
+        return [tuple(p) for p in project(self.homography, [(0, 0), (n, 0), (n, n), (0, n)])]
+    
+    def unmasked(self, mask=None):
+        """去掉掩码后的模块矩阵（只对数据模块异或），mask 默认为格式信息中的掩码"""
+        mask = self.mask if mask is None else mask
+        data = ~reserved_modules(self.version)
+        return self.modules ^ (mask_matrix(mask, self.size) & data)
+    
+    def report(self):
+        """分析结果的文本描述"""
+        lines = [f"版本: {self.version} ({self.size}×{self.size} 模块)",
+                 f"功能图形吻合度: {self.pattern_score:.1%}"]
+        for number, (raw, index, distance) in enumerate(self.format_reads, 1):
+            state = "有效" if distance == 0 else (f"可纠正({distance}位错误)" if distance <= 3 else f"无效({distance}位差异)")
+            lines.append(f"格式信息{number}: {raw:015b} → 纠错等级 {ECC_LEVELS[index >> 3]}，掩码 {index & 7}，{state}")
+        if self.format_valid:
+            lines.append(f"纠错等级: {self.ecc_level}  掩码: {self.mask}")
+        else:
+            lines.append(f"格式信息无法确定，最接近: 纠错等级 {self.ecc_level}，掩码 {self.mask}")
+        for number, (raw, version, distance) in enumerate(self.version_reads, 1):
+            state = "有效" if distance == 0 else (f"可纠正({distance}位错误)" if distance <= 3 else f"无效({distance}位差异)")
+            lines.append(f"版本信息{number}: {raw:018b} → 版本 {version}，{state}")
+        return "\n".join(lines)
+    
+    def to_text(self, dark="██", light="  "):
+        """字符画形式的矩阵"""
+        return "\n".join("".join(dark if bit else light for bit in row) for row in self.modules)
+    
+    def to_bits(self):
+        """每行一串0/1，1为深色；不确定的模块导出为 ?"""
+        rows = np.where(self.modules, "1", "0")
+        if self.uncertain is not None:
+            rows[self.uncertain] = "?"
+        return "\n".join("".join(row) for row in rows)
+    
+    def to_image(self, scale=10):
+        """重新渲染为带静区的标准黑白图像"""
+        return qr_repair.render_modules(self.modules, scale)
+    
+    def save(self, path, scale=10):
+        """按扩展名导出：.png 等图片格式为重新渲染的图像，.bits 为01位串，其他为字符画文本"""
+        ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+        if ext in ("png", "bmp", "gif", "jpg", "jpeg"):
+            self.to_image(scale).save(path)
+            return
+        content = self.to_bits() if ext == "bits" else self.to_text()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content + "\n")
+
+
+def estimate_versions(dark, corners, side, spread=1):
+    """
+    用四边形范围内定位图案的 1:1:3:1:1 游程估计模块大小，返回估计版本附近的候选版本；
+    找不到定位图案时返回 None
+    """
+    x0, y0 = np.maximum(np.floor(corners.min(0)).astype(int), 0)
+    x1, y1 = np.ceil(corners.max(0)).astype(int) + 1
+    crop = dark[y0:y1, x0:x1]
+    # 只扫描部分行列：间隔不超过版本40的模块大小，每个定位图案中心的3个模块高度内仍至少扫到3行
+    step = max(1, int(side / symbol_size(40)))
+    units = np.concatenate([qr_repair._finder_units(crop[::step]), qr_repair._finder_units(crop[:, ::step].T)])
+    if len(units) < 3:
+        return None
+    version = int(round((side / np.median(units) - 17) / 4))
+    return [v for v in range(version - spread, version + spread + 1) if 1 <= v <= 40] or None
+
+
+def _fit_grid(dark, corners, versions):
+    """逐个版本和角点对应关系计算功能图形吻合度，返回最佳的 (吻合度, 版本, 单应矩阵)"""
+    best = None
+    for version in versions:
+        n = symbol_size(version)
+        grid_corners = np.array([(0, 0), (n, 0), (n, n), (0, n)], dtype=float)
+        mask, value = function_patterns(version)
+        rows, cols = np.nonzero(mask)
+        centers = np.stack([cols + 0.5, rows + 0.5], axis=-1)
+        for start in range(4):
+            for direction in (1, -1):
+                image_corners = np.roll(corners[::direction], -start, axis=0)
+                try:
+                    H = homography(grid_corners, image_corners)
+                except np.linalg.LinAlgError:
+                    continue
+                points = project(H, centers)
+                X = np.clip(np.floor(points[:, 0]).astype(np.intp), 0, dark.shape[1] - 1)
+                Y = np.clip(np.floor(points[:, 1]).astype(np.intp), 0, dark.shape[0] - 1)
+                score = (dark[Y, X] == value[rows, cols]).mean()
+                if best is None or score > best[0]:
+                    best = (score, version, H)
+    return best
+
+
+def extract_matrix(dark, polygon, versions=None, min_score=0.9):
+    """
+    按解码器给出的四边形提取模块矩阵
+    四个角与模块坐标系四角的对应关系有8种（起点和方向），版本未知时先试定位图案估计出的版本，
+    吻合度低于 min_score 再逐个尝试所有版本，取功能图形吻合度最高的组合；
+    返回 ModuleMatrix，无法提取时返回 None
+    """
+    corners = order_corners(polygon)
+    side = np.sqrt(((corners - np.roll(corners, 1, axis=0)) ** 2).sum(1)).mean()
+    best = None
+    if versions is None:
+        estimated = estimate_versions(dark, corners, side)
+        if estimated:
+            best = _fit_grid(dark, corners, estimated)
+        if best is None or best[0] < min_score:
+            # 模块至少约1像素
+            versions = [v for v in range(1, 41) if side / symbol_size(v) >= 1.0 and v not in (estimated or ())]
+    if versions:
+        fitted = _fit_grid(dark, corners, versions)
+        if fitted and (best is None or fitted[0] > best[0]):
+            best = fitted
+    if best is None:
+        return None
+    _, version, H = best
+    return ModuleMatrix.from_samples(sample_fraction(dark, H, symbol_size(version)), version, H)
+
+
+def binarize(img):
+    """灰度化后用Otsu阈值二值化，返回深色像素的布尔矩阵"""
+    gray = np.asarray(img.convert("L"))
+    return gray <= qr_repair.otsu_threshold(gray)
+
+
+def analyze_image(img, decoder=None, repair=True):
+    """
+    识别图像中的二维码并逐个提取模块矩阵
+    解码器找不到时，repair 为真则用定位图案修复估计出的网格提取（可能无法解码的符号也能拿到矩阵）
+    """
+    import scan_engine
+    
+    dark = binarize(img)
+    matrices = []
+    for result in scan_engine.scan_image(img.convert("L"), decoder):
+        if result.type == "QRCODE" and len(result.polygon) >= 4:
+            matrix = extract_matrix(dark, result.polygon)
+            if matrix:
+                matrices.append(matrix)
+    if matrices or not repair:
+        return matrices
+    return repair_matrices(dark, max_results=1)
+
+
+def matrix_from_geometry(dark, geometry):
+    """按定位图案修复估计出的网格（qr_repair.Geometry）提取模块矩阵"""
+    # 网格是在旋转后的坐标系中估计的：模块坐标 → 旋转后的像素坐标 → 原图坐标
+    grid = np.array([[geometry.module, 0, geometry.x], [0, geometry.module, geometry.y], [0, 0, 1]])
+    H = qr_repair._rotation_transform(geometry.rotation, dark.shape) @ grid
+    return ModuleMatrix.from_samples(sample_fraction(dark, H, symbol_size(geometry.version)), geometry.version, H)
+
+
+def repair_matrices(dark, max_results=2):
+    """按定位图案修复估计出的网格提取模块矩阵"""
+    return [matrix_from_geometry(dark, geometry) for geometry in qr_repair.find_geometries(dark, max_results)]
+
+
+if __name__ == "__main__":
+    # 用法: python qr_matrix.py 图片 [导出文件.png/.txt/.bits]
+    with Image.open(sys.argv[1]) as image:
+        found = analyze_image(image)
+    if not found:
+        print("未找到二维码")
+    for number, matrix in enumerate(found, 1):
+        print(f"== 符号 {number} ==")
+        print(matrix.report())
+        print(matrix.to_text())
+        if len(sys.argv) > 2:
+            matrix.save(sys.argv[2] if len(found) == 1 else f"{number}_{sys.argv[2]}")
@@ -0,0 +1,117 @@
+"""
+形态学清理
+网点印刷（半色调）、圆点风格和各种“艺术”二维码阈值化之后，模块内部是分散的点、圆或线条，
+百分位阈值和固定阈值都救不回来。这里在阈值化之后做二值形态学：
+闭运算把同色模块内的点连成实心块，闭运算后再开运算去掉浅色区域里残留的小点和细线；
+网点印刷的深浅模块都是点阵，只是点的大小不同，闭运算会把两者一起填满，所以另外按窗口内深色像素的比例
+（积分图求窗口和）重新阈值化。
+这类二维码的游程长度和模块大小无关，没法直接估计模块大小，所以由符号外接框的边长
+按版本1–10的范围推出模块大小的上下限，结构元素在这个范围内按几何级数取几档；
+方形结构元素可分解为行、列两次一维最小/最大值滤波，用 numpy 的滑动窗口视图一次算完
+"""
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+from numpy.lib.stride_tricks import sliding_window_view
+
+from qr_repair import otsu_threshold, symbol_bounds
+
+# 估计模块大小时假设的边长范围（模块数），对应版本1–10
+MIN_MODULES = 21
+MAX_MODULES = 57
+
+# 结构元素的档数和相对模块大小的范围
+SIZE_STEPS = 5
+MIN_FRACTION = 0.25
+MAX_FRACTION = 0.6
+
+# operation 为 "close"、"density" 或 "close_open"，size 为结构元素边长（像素）；transform 为坐标换算矩阵（恒等）
+MorphCandidate = namedtuple("MorphCandidate", ["label", "operation", "size", "transform"])
+
+
+def _filter(mask, size, axis, dilate):
+    """沿一个方向的一维最大（膨胀）或最小（腐蚀）滤波，窗口居中；边界外按不影响结果的值填充"""
+    before = (size - 1) // 2
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (before, size - 1 - before)
+    padded = np.pad(mask, pad, constant_values=not dilate)
+    windows = sliding_window_view(padded, size, axis=axis)
+    return windows.any(-1) if dilate else windows.all(-1)
+
+
+def dilate(mask, size):
+    """方形结构元素的膨胀"""
+    if size <= 1:
+        return mask
+    return _filter(_filter(mask, size, 0, True), size, 1, True)
+
+
+def erode(mask, size):
+    """方形结构元素的腐蚀"""
+    if size <= 1:
+        return mask
+    return _filter(_filter(mask, size, 0, False), size, 1, False)
+
+
+def closing(mask, size):
+    """闭运算：先膨胀后腐蚀，填平小于结构元素的空隙"""
+    return erode(dilate(mask, size), size)
+
+
+def opening(mask, size):
+    """开运算：先腐蚀后膨胀，去掉小于结构元素的孤立点和细线"""
+    return dilate(erode(mask, size), size)
+
+
+def density(mask, size):
+    """窗口内深色像素的比例（方形窗口，居中），用积分图计算"""
+    before = (size - 1) // 2
+    padded = np.pad(mask.astype(np.int32), ((before + 1, size - 1 - before), (before + 1, size - 1 - before)))
+    integral = padded.cumsum(0).cumsum(1)
+    total = (integral[size:, size:] - integral[:-size, size:]
+             - integral[size:, :-size] + integral[:-size, :-size])
+    return total / (size * size)
+
+
+def structuring_sizes(dark, steps=SIZE_STEPS):
+    """由深色区域外接框边长推出模块大小的范围，返回从小到大的结构元素边长"""
+    bounds = symbol_bounds(dark, min_count=max(2, int(min(dark.shape) * 0.01)))
+    if bounds is None:
+        side = min(dark.shape)
+    else:
+        x0, y0, x1, y1 = bounds
+        side = max(x1 - x0, y1 - y0)
+    low = max(2.0, side / MAX_MODULES * MIN_FRACTION)
+    high = max(low, side / MIN_MODULES * MAX_FRACTION)
+    sizes = np.unique(np.round(np.geomspace(low, high, steps)).astype(int))
+    return [int(size) for size in sizes if size >= 2]
+
+
+def morph_candidates(dark):
+    """全部候选：各档结构元素的闭运算，各档窗口的网点密度，再是闭运算后接半档大小的开运算"""
+    sizes = structuring_sizes(dark)
+    identity = np.eye(3)
+    candidates = [MorphCandidate(f"闭运算{size}px", "close", size, identity) for size in sizes]
+    candidates += [MorphCandidate(f"网点密度{size}px", "density", size, identity) for size in sizes]
+    candidates += [MorphCandidate(f"闭运算{size}px+开运算{size // 2}px", "close_open", size, identity)
+                   for size in sizes if size // 2 >= 2]
+    return candidates
+
+
+def binarize(gray):
+    """Otsu阈值化，返回深色像素的布尔矩阵"""
+    pixels = np.asarray(gray.convert("L"))
+    return pixels <= otsu_threshold(pixels)
+
+
+def apply_morph(dark, candidate):
+    """按候选做形态学运算，返回黑白图像"""
+    if candidate.operation == "density":
+        levels = (density(dark, candidate.size) * 255).astype(np.uint8)
+        cleaned = levels > otsu_threshold(levels)
+        return Image.fromarray(np.where(cleaned, 0, 255).astype(np.uint8))
+    cleaned = closing(dark, candidate.size)
+    if candidate.operation == "close_open":
+        cleaned = opening(cleaned, candidate.size // 2)
+    return Image.fromarray(np.where(cleaned, 0, 255).astype(np.uint8))
@@ -0,0 +1,502 @@
+"""
+碎片重组
+把被切成若干块或条（可能打乱了顺序）的二维码自动拼回原样，代替"合并图片"的固定网格手工拼接。
+相邻碎片的接缝两侧像素应当连续：一次矩阵乘法算出所有碎片两两之间左右、上下拼接的边缘差异；
+完整包含定位图案的碎片只能放在网格的四角，原图带静区时外圈碎片朝外的边缘应当空白。
+切口正好落在模块边界上时（如 33 个模块、每模块10像素的二维码切成3×3），接缝两侧本来就是不同的模块，
+像素连续性对正确和错误的拼接都差不多，只能靠这两条结构约束加解码验证；这时原图没有静区多半拼不出来。
+对每种可能的网格形状先做贪心拼接，再做束搜索，代价最低的若干种排列交给解码器验证
+"""
+import sys
+import math
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+from qr_repair import FINDER_RATIO, otsu_threshold
+
+# 束搜索保留的部分排列个数，以及每种网格形状最多交给解码器验证的排列个数
+# （按行填格子时后面的角和边只有少数碎片放得下，束太窄会在前面把它们用掉）
+BEAM_WIDTH = 512
+MAX_LAYOUTS = 8
+
+# 碎片尺寸相差不超过该像素数时视为同一规格（整图边长不能被等分时各块会差一两个像素）
+SIZE_TOLERANCE = 2
+
+# 拼好的整图宽高比超出该范围的网格形状不考虑（二维码是正方形）
+MAX_ASPECT = 1.5
+
+# 包含定位图案的碎片不在网格四角时的代价（边缘差异的单位：每条接缝的平均灰度差平方，取值0..1）；
+# 结构约束很少误判，罚分相当于几条完全不吻合的接缝，压过切口落在模块边界上时没有意义的边缘差异
+ANCHOR_PENALTY = 4.0
+
+# 原图带静区时，网格外圈的碎片朝外的边缘不是空白的代价（每条边）
+BORDER_PENALTY = 4.0
+
+# 两侧都是空白（如静区）的接缝的代价：空白边缘和任何空白边缘都完全吻合，
+# 不加代价时整张图可以循环平移，把静区拼到中间
+BLANK_SEAM = 0.05
+
+# 边缘灰度的极差小于该值时视为空白
+BLANK_RANGE = 0.1
+
+# 边长不同的两块拼在一起的代价（不可能相邻，用有限值使交换调整仍能比较）
+MISMATCH = 100.0
+
+# 拼好后四周补的白边，占边长的比例
+MARGIN = 0.1
+
+# shape 为 (行数, 列数)，order 为按行排列的碎片序号，cost 为每条接缝的平均边缘差异；
+# transform 把补白边后图像中的坐标换算回拼接图坐标（碎片按原尺寸拼接）
+Layout = namedtuple("Layout", ["label", "shape", "order", "cost", "transform"])
+
+
+def normalize_pieces(pieces):
+    """
+    转为灰度数组（0..1），返回 (数组列表, 可用的网格形状列表)
+    尺寸基本一致时可以拼成任意行列数的网格；只有高度一致（竖条）或宽度一致（横条）时只能拼成一行或一列
+    碎片不缩放：缩放会破坏接缝两侧像素的连续性
+    """
+    grays = [np.asarray(piece.convert("L"), dtype=np.float64) / 255 for piece in pieces]
+    heights = np.array([gray.shape[0] for gray in grays])
+    widths = np.array([gray.shape[1] for gray in grays])
+    n = len(grays)
+    same_height = np.ptp(heights) <= SIZE_TOLERANCE
+    same_width = np.ptp(widths) <= SIZE_TOLERANCE
+    if same_height and same_width:
+        return grays, [(rows, n // rows) for rows in range(1, n + 1) if n % rows == 0]
+    if same_height:
+        return grays, [(1, n)]
+    if same_width:
+        return grays, [(n, 1)]
+    raise ValueError("碎片尺寸不一致，无法按网格或条带拼接")
+
+
+def _edges(grays, axis, index):
+    """各碎片的一列（axis=1）或一行（axis=0）像素，补零到同一长度，返回 (N, L) 数组和各自的长度"""
+    lines = [np.take(gray, min(index, gray.shape[axis] - 1) if index >= 0 else max(gray.shape[axis] + index, 0),
+                     axis=axis) for gray in grays]
+    lengths = np.array([len(line) for line in lines])
+    stacked = np.zeros((len(lines), lengths.max()))
+    for i, line in enumerate(lines):
+        stacked[i, :len(line)] = line
+    return stacked, lengths
+
+
+def _square_distances(a, b, lengths):
+    """a (N, L) 与 b (N, L) 每两行之间的平均差平方，用矩阵乘法得到 (N, N)"""
+    squares = (a ** 2).sum(1)
+    distances = squares[:, None] + (b ** 2).sum(1)[None, :] - 2 * a @ b.T
+    return np.maximum(distances, 0) / lengths[:, None]
+
+
+def edge_costs(grays):
+    """
+    两两拼接的边缘差异：horizontal[i, j] 为 j 接在 i 右边，vertical[i, j] 为 j 接在 i 下边
+    除了接缝两侧像素直接比较，还比较由边缘内第二列（行）外推出的像素，对渐变和抗锯齿更敏感；
+    接缝紧挨模块边界时只有一侧的外推成立，所以取两个方向中较好的一个；
+    边长不同的两块不可能相邻，差异为 MISMATCH
+    """
+    def cost(axis):
+        near, lengths = _edges(grays, axis, -1)
+        inner, _ = _edges(grays, axis, -2)
+        far, _ = _edges(grays, axis, 0)
+        far_inner, _ = _edges(grays, axis, 1)
+        direct = _square_distances(near, far, lengths)
+        forward = _square_distances(2 * near - inner, far, lengths)
+        backward = _square_distances(near, 2 * far - far_inner, lengths)
+        blank = np.array([np.ptp(line[:length]) < BLANK_RANGE for line, length in zip(near, lengths)])
+        far_blank = np.array([np.ptp(line[:length]) < BLANK_RANGE for line, length in zip(far, lengths)])
+        costs = direct + np.minimum(forward, backward) + (blank[:, None] & far_blank[None, :]) * BLANK_SEAM
+        costs[lengths[:, None] != lengths[None, :]] = MISMATCH
+        return costs
+    
+    return cost(1), cost(0)
+
+
+def _finder_hits(dark):
+    """逐行按 1:1:3:1:1 查找定位图案，返回命中处的中心 [(x, y), ...] 和对应的模块大小"""
+    h, w = dark.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = dark
+    rows, cols = np.nonzero(np.diff(padded, axis=1))
+    if len(cols) < 6:
+        return np.empty((0, 2)), np.empty(0)
+    lengths = np.diff(cols)
+    same_row = rows[1:] == rows[:-1]
+    is_dark = dark[rows[:-1], np.minimum(cols[:-1], w - 1)]
+    windows = np.lib.stride_tricks.sliding_window_view(lengths, 5)
+    valid = np.lib.stride_tricks.sliding_window_view(same_row, 5).all(1) & is_dark[:len(windows)]
+    unit = windows.sum(1) / 7.0
+    matched = valid & (np.abs(windows - unit[:, None] * FINDER_RATIO) <= unit[:, None] * FINDER_RATIO * 0.5).all(1)
+    centers = np.stack([cols[:-1][:len(windows)] + windows.sum(1) / 2, rows[:-1][:len(windows)] + 0.5], axis=1)
+    return centers[matched], unit[matched]
+
+
+def finder_anchors(grays):
+    """
+    完整包含定位图案的碎片：行、列两个方向都命中 1:1:3:1:1 的位置即定位图案中心
+    返回碎片序号的列表；超过4个时说明有误检（或碎片太大），不作为约束
+    """
+    anchors = []
+    for index, gray in enumerate(grays):
+        dark = gray <= otsu_threshold((gray * 255).astype(np.uint8)) / 255
+        row_hits, units = _finder_hits(dark)
+        column_hits, _ = _finder_hits(dark.T)
+        if not len(row_hits) or not len(column_hits):
+            continue
+        column_hits = column_hits[:, ::-1]
+        if (np.abs(row_hits[:, None, :] - column_hits[None, :, :]).max(2) <= units[:, None]).any():
+            anchors.append(index)
+    return anchors if len(anchors) <= 4 else []
+
+
+def _anchor_costs(anchors, grays, shape, edges):
+    """
+    每个碎片放在每个格子上的代价 (N, 行数×列数)，用于接缝处像素不连续也无法判断的情况
+    （切口正好落在模块边界上时，任意两块的接缝差异都差不多，只能靠二维码的结构定位）：
+    包含定位图案的碎片不在四角时加罚；
+    各碎片每一侧的空白边缘都足够铺满网格的这一侧时认为原图带静区，外圈碎片朝外的边缘不是空白时加罚
+    """
+    rows, cols = shape
+    r, c = np.divmod(np.arange(rows * cols), cols)
+    corner = np.isin(r, (0, rows - 1)) & np.isin(c, (0, cols - 1))
+    costs = np.zeros((len(grays), rows * cols))
+    costs[np.asarray(anchors, dtype=int)[:, None], ~corner] = ANCHOR_PENALTY
+    
+    left, right, top, bottom = edges
+    if min(left.sum(), right.sum()) >= rows and min(top.sum(), bottom.sum()) >= cols:
+        for blank, outer in ((left, c == 0), (right, c == cols - 1), (top, r == 0), (bottom, r == rows - 1)):
+            costs[np.ix_(~blank, outer)] += BORDER_PENALTY
+    return costs
+
+
+def beam_search(horizontal, vertical, anchor_costs, shape, width=BEAM_WIDTH):
+    """
+    按行依次填入格子，每步只保留总代价最低的 width 个部分排列（width 为1即贪心拼接）
+    返回 [(总代价, 排列), ...]，按代价从低到高
+    """
+    rows, cols = shape
+    n = rows * cols
+    orders = np.zeros((1, 0), dtype=int)
+    totals = np.zeros(1)
+    used = np.zeros((1, n), dtype=bool)
+    for cell in range(n):
+        r, c = divmod(cell, cols)
+        added = np.broadcast_to(anchor_costs[:, cell], (len(orders), n)).copy()
+        if c > 0:
+            added += horizontal[orders[:, cell - 1]]
+        if r > 0:
+            added += vertical[orders[:, cell - cols]]
+        added[used] = np.inf
+        candidates = (totals[:, None] + added).ravel()
+        keep = min(width, int(np.isfinite(candidates).sum()))
+        best = np.argpartition(candidates, keep - 1)[:keep] if keep < len(candidates) else np.arange(len(candidates))
+        best = best[np.argsort(candidates[best])]
+        parents, pieces = np.divmod(best, n)
+        orders = np.concatenate([orders[parents], pieces[:, None]], axis=1)
+        totals = candidates[best]
+        used = used[parents].copy()
+        used[np.arange(len(pieces)), pieces] = True
+    return list(zip(totals, (tuple(int(i) for i in order) for order in orders)))
+
+
+def ranked_seams(horizontal, vertical):
+    """
+    互为最优匹配的接缝（对两块碎片来说都不比其他任何匹配差），按可信程度排序：
+    边缘差异减去两块碎片各自的其他最优匹配的差异，差值越小越可信
+    （二维码只有黑白两种灰度，接缝经常和好几块碎片都完全吻合，这样的接缝排在后面）
+    返回 [(方向, i, j), ...]，方向 0 为 j 接在 i 右边，1 为 j 接在 i 下边
+    """
+    margins, seams = [], []
+    for direction, costs in enumerate((horizontal, vertical)):
+        if len(costs) < 3:
+            continue
+        costs = costs.copy()
+        np.fill_diagonal(costs, np.inf)
+        margin = costs - np.minimum(_best_other(costs), _best_other(costs.T).T)
+        i, j = np.nonzero((costs < MISMATCH) & (margin <= 0))
+        margins.append(margin[i, j])
+        seams.append(np.stack([np.full(len(i), direction), i, j], axis=1))
+    if not margins:
+        return []
+    return np.concatenate(seams)[np.argsort(np.concatenate(margins), kind="stable")].tolist()
+
+
+def _best_other(costs):
+    """best[i, j] 为第 i 行除第 j 列以外的最小值"""
+    smallest = np.partition(costs, 1, axis=1)[:, :2]
+    best = np.broadcast_to(smallest[:, :1], costs.shape).copy()
+    argmin = costs.argmin(1)
+    best[np.arange(len(costs)), argmin] = smallest[:, 1]
+    return best
+
+
+def greedy_assembly(seams, horizontal, vertical, shape, blank=()):
+    """
+    贪心拼接：按可信程度依次采用接缝，把两块所在的碎片组合并；合并不能重叠、不能超出网格，
+    合并后新形成的所有接缝的平均差异也不能明显高于这条接缝（两组错位时会同时出现很多不吻合的接缝）。
+    全空白的碎片（静区）彼此没有区别，不参与合并，以免被粘到错误的一侧。
+    剩下的碎片组按大小依次放到第一个放得下的位置，单块填入与已放碎片最吻合的空格；返回按行排列的碎片序号
+    """
+    rows, cols = shape
+    n = rows * cols
+    group = list(range(n))
+    where = {i: (0, 0) for i in range(n)}
+    cells = {i: {(0, 0): i} for i in range(n)}
+    for direction, i, j in seams:
+        a, b = group[i], group[j]
+        if a == b or i in blank or j in blank:
+            continue
+        if len(cells[a]) < len(cells[b]):
+            # 移动较小的一组：把接缝反过来看
+            a, b = b, a
+            anchor, moving, sign = j, i, -1
+        else:
+            anchor, moving, sign = i, j, 1
+        dr, dc = (0, sign) if direction == 0 else (sign, 0)
+        target = cells[a]
+        ar, ac = where[anchor]
+        if (ar + dr, ac + dc) in target:
+            continue
+        mr, mc = where[moving]
+        shift = (ar + dr - mr, ac + dc - mc)
+        moved = {(r + shift[0], c + shift[1]): piece for (r, c), piece in cells[b].items()}
+        if any(cell in target for cell in moved):
+            continue
+        merged = list(target) + list(moved)
+        if (max(r for r, _ in merged) - min(r for r, _ in merged) >= rows
+                or max(c for _, c in merged) - min(c for _, c in merged) >= cols):
+            continue
+        seam_cost = horizontal[i, j] if direction == 0 else vertical[i, j]
+        costs = list(_new_seams(target, moved, horizontal, vertical))
+        if np.mean(costs) > seam_cost + BLANK_SEAM:
+            continue
+        target.update(moved)
+        for cell, piece in moved.items():
+            group[piece] = a
+            where[piece] = cell
+        del cells[b]
+        if len(target) == n:
+            break
+    
+    grid = {}
+    for key in sorted(cells, key=lambda key: -len(cells[key])):
+        members = cells[key]
+        if len(members) == 1:
+            continue
+        top = min(r for r, _ in members)
+        left = min(c for _, c in members)
+        height = max(r for r, _ in members) - top + 1
+        width = max(c for _, c in members) - left + 1
+        for r0, c0 in ((r0, c0) for r0 in range(rows - height + 1) for c0 in range(cols - width + 1)):
+            placed = {(r - top + r0, c - left + c0): piece for (r, c), piece in members.items()}
+            if not any(cell in grid for cell in placed):
+                grid.update(placed)
+                break
+    remaining = [piece for piece in range(n) if piece not in grid.values()]
+    for cell in ((r, c) for r in range(rows) for c in range(cols)):
+        if cell in grid:
+            continue
+        costs = [sum(_new_seams(grid, {cell: piece}, horizontal, vertical)) for piece in remaining]
+        grid[cell] = remaining.pop(int(np.argmin(costs)))
+    return tuple(grid[(r, c)] for r in range(rows) for c in range(cols))
+
+
+def _new_seams(placed, added, horizontal, vertical):
+    """把 added 中的碎片放到各自格子后，与 placed 中碎片新形成的各条接缝的差异"""
+    for (r, c), piece in added.items():
+        if (r, c - 1) in placed:
+            yield horizontal[placed[(r, c - 1)], piece]
+        if (r, c + 1) in placed:
+            yield horizontal[piece, placed[(r, c + 1)]]
+        if (r - 1, c) in placed:
+            yield vertical[placed[(r - 1, c)], piece]
+        if (r + 1, c) in placed:
+            yield vertical[piece, placed[(r + 1, c)]]
+
+
+def refine_swaps(order, horizontal, vertical, anchor_costs, shape, max_swaps=None):
+    """
+    局部调整：反复做使总代价下降最多的一次两块交换，直到没有可改进的交换
+    贪心拼接在空白较多、多块碎片边缘完全相同的地方容易放错，交换可以把这些碎片换回原位。
+    每块碎片放到每个格子上的代价（按格子当前的邻居）是一个矩阵，所有交换的代价变化由它一次算出；
+    相邻两格交换时这个估计不准，按实际总代价确认后才采用
+    """
+    rows, cols = shape
+    n = rows * cols
+    grid = np.array(order)
+    r, c = np.divmod(np.arange(n), cols)
+    max_swaps = max_swaps or 4 * n
+    lower = np.tri(n, dtype=bool)
+    current = layout_cost(horizontal, vertical, anchor_costs, shape, grid)
+    for _ in range(max_swaps):
+        place = anchor_costs.T.copy()
+        place[c > 0] += horizontal[grid[np.flatnonzero(c > 0) - 1]]
+        place[c < cols - 1] += horizontal[:, grid[np.flatnonzero(c < cols - 1) + 1]].T
+        place[r > 0] += vertical[grid[np.flatnonzero(r > 0) - cols]]
+        place[r < rows - 1] += vertical[:, grid[np.flatnonzero(r < rows - 1) + cols]].T
+        swapped = place[:, grid]
+        own = np.diag(swapped)
+        delta = swapped + swapped.T - own[:, None] - own[None, :]
+        delta[lower] = 0
+        improved = False
+        best = np.argpartition(delta, n - 1, axis=None)[:n]
+        for flat in best[np.argsort(delta.flat[best])]:
+            if delta.flat[flat] >= -1e-9:
+                break
+            p, q = divmod(int(flat), n)
+            grid[[p, q]] = grid[[q, p]]
+            cost = layout_cost(horizontal, vertical, anchor_costs, shape, grid)
+            if cost < current - 1e-9:
+                current = cost
+                improved = True
+                break
+            grid[[p, q]] = grid[[q, p]]
+        if not improved:
+            break
+    return tuple(int(piece) for piece in grid)
+
+
+def layout_cost(horizontal, vertical, anchor_costs, shape, order):
+    """排列的总代价：各接缝的边缘差异加定位图案约束的罚分"""
+    rows, cols = shape
+    grid = np.array(order).reshape(rows, cols)
+    total = anchor_costs[grid.ravel(), np.arange(rows * cols)].sum()
+    if cols > 1:
+        total += horizontal[grid[:, :-1], grid[:, 1:]].sum()
+    if rows > 1:
+        total += vertical[grid[:-1], grid[1:]].sum()
+    return float(total)
+
+
+def _offsets(grays, shape, order):
+    """各碎片在拼接图中的左上角坐标和拼接图大小；各行高度取该行最高的碎片"""
+    rows, cols = shape
+    positions = []
+    y = width = 0
+    for r in range(rows):
+        x = 0
+        for c in range(cols):
+            positions.append((x, y))
+            x += grays[order[r * cols + c]].shape[1]
+        width = max(width, x)
+        y += max(grays[order[r * cols + c]].shape[0] for c in range(cols))
+    return positions, (width, y)
+
+
+def _margin(grays, shape, order):
+    _, (width, height) = _offsets(grays, shape, order)
+    return int(math.ceil(max(height, width) * MARGIN))
+
+
+def blank_edges(grays):
+    """各碎片的左、右、上、下边缘是否空白，返回四个布尔数组"""
+    def blank(lines):
+        return np.array([np.ptp(line) < BLANK_RANGE for line in lines])
+    
+    return (blank(gray[:, 0] for gray in grays), blank(gray[:, -1] for gray in grays),
+            blank(gray[0] for gray in grays), blank(gray[-1] for gray in grays))
+
+
+def cyclic_shifts(order, shape, edges, blank):
+    """
+    排列按行、列循环平移的变体：空白接缝（如两侧都是静区）两边可以任意对调，
+    代价相同的排列里二维码可能被从中间切开、两半对调。全空白的行、列（静区）先移到最后，
+    其余的行、列只在接缝两侧都空白的位置循环平移
+    """
+    rows, cols = shape
+    left, right, top, bottom = edges
+    grid = np.array(order).reshape(rows, cols)
+    empty = np.isin(grid, list(blank))
+    
+    def shifts(count, is_empty, before, after):
+        content = [k for k in range(count) if not is_empty(k)]
+        tail = [k for k in range(count) if is_empty(k)]
+        for s in range(len(content)):
+            if s == 0 or (before(content[s]) and after(content[s - 1])):
+                yield content[s:] + content[:s] + tail
+    
+    row_orders = list(shifts(rows, lambda k: empty[k].all(),
+                             lambda k: top[grid[k]].all(), lambda k: bottom[grid[k]].all()))
+    column_orders = list(shifts(cols, lambda k: empty[:, k].all(),
+                                lambda k: left[grid[:, k]].all(), lambda k: right[grid[:, k]].all()))
+    for row_order in row_orders:
+        for column_order in column_orders:
+            shifted = tuple(int(piece) for piece in grid[np.ix_(row_order, column_order)].ravel())
+            if shifted != tuple(order):
+                yield shifted
+
+
+def candidate_layouts(grays, shapes, max_layouts=MAX_LAYOUTS):
+    """
+    全部网格形状的候选排列：先是各形状贪心拼接（加交换调整）的结果，再是束搜索结果，
+    同一组内按每条接缝的平均代价排序，每个排列后面跟着它在空白接缝处循环平移的变体，去掉重复排列
+    """
+    n = len(grays)
+    h, w = grays[0].shape
+    square = [shape for shape in shapes
+              if 1 / MAX_ASPECT <= (shape[0] * h) / (shape[1] * w) <= MAX_ASPECT] or shapes
+    horizontal, vertical = edge_costs(grays)
+    anchors = finder_anchors(grays)
+    seams = ranked_seams(horizontal, vertical)
+    blank = {i for i, gray in enumerate(grays) if np.ptp(gray) < BLANK_RANGE}
+    edges = blank_edges(grays)
+    
+    greedy, beam = [], []
+    for shape in square:
+        rows, cols = shape
+        seam_count = max(1, rows * (cols - 1) + (rows - 1) * cols)
+        anchor_costs = _anchor_costs(anchors, grays, shape, edges)
+        order = greedy_assembly(seams, horizontal, vertical, shape, blank)
+        order = refine_swaps(order, horizontal, vertical, anchor_costs, shape)
+        greedy.append((layout_cost(horizontal, vertical, anchor_costs, shape, order) / seam_count, shape, order))
+        for total, order in beam_search(horizontal, vertical, anchor_costs, shape)[:max_layouts]:
+            beam.append((total / seam_count, shape, order))
+    
+    seen = set()
+    layouts = []
+    for found, name in ((greedy, "贪心"), (beam, "束搜索")):
+        for cost, shape, order in sorted(found, key=lambda item: item[0]):
+            for variant, suffix in [(order, "")] + [(shifted, "平移") for shifted in cyclic_shifts(order, shape, edges, blank)]:
+                if variant in seen:
+                    continue
+                seen.add(variant)
+                margin = _margin(grays, shape, variant)
+                transform = np.array([[1, 0, -margin], [0, 1, -margin], [0, 0, 1]], dtype=float)
+                layouts.append(Layout(f"{name}{shape[0]}×{shape[1]}#{len(layouts) + 1}{suffix}", shape, variant,
+                                      float(cost), transform))
+    return layouts
+
+
+def render_layout(grays, layout):
+    """按排列拼接并在四周补白边，返回灰度图像"""
+    positions, (width, height) = _offsets(grays, layout.shape, layout.order)
+    margin = _margin(grays, layout.shape, layout.order)
+    canvas = np.ones((height + 2 * margin, width + 2 * margin))
+    for piece, (x, y) in zip(layout.order, positions):
+        h, w = grays[piece].shape
+        canvas[margin + y:margin + y + h, margin + x:margin + x + w] = grays[piece]
+    return Image.fromarray((canvas * 255).astype(np.uint8))
+
+
+if __name__ == "__main__":
+    # 用法: python qr_reassemble.py 碎片1 碎片2 ... [-o 拼好的图片]
+    import scan_engine
+    args = sys.argv[1:]
+    output = None
+    if "-o" in args:
+        index = args.index("-o")
+        output = args[index + 1]
+        del args[index:index + 2]
+    pieces = [Image.open(path) for path in args]
+    results, layout = scan_engine.reassemble(pieces)
+    if layout is None:
+        print("没有找到能识别的拼接方式")
+        sys.exit(1)
+    print(f"{layout.label}: 排列 {list(layout.order)}")
+    for result in results:
+        print(scan_engine.decode_data(result.data)[0])
+    if output:
+        render_layout(normalize_pieces(pieces)[0], layout).save(output)
@@ -0,0 +1,336 @@
+"""
+定位图案修复
+定位图案（回字形）被涂抹或遮挡的二维码，zbar连位置都找不到。这里从残存的定位图案和时序图案估计模块大小与网格，
+在副本上重绘标准的定位图案、校正图形、时序图案和静区后再交给解码器。
+候选网格（版本、模块大小、偏移、方向）的打分用numpy一次性批量采样，批量扫描时也够快
+"""
+import functools
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+from numpy.lib.stride_tricks import sliding_window_view
+
+QUIET_ZONE = 4
+
+# 7×7 定位图案
+FINDER = np.ones((7, 7), dtype=bool)
+FINDER[1:6, 1:6] = False
+FINDER[2:5, 2:5] = True
+
+FINDER_RATIO = np.array([1, 1, 3, 1, 1])
+
+# 网格：左上角像素坐标 (x, y)、模块边长、图像逆时针旋转 rotation 个90°后的坐标系、功能图形吻合度
+Geometry = namedtuple("Geometry", ["version", "x", "y", "module", "rotation", "score"])
+
+# 修复后的图像；transform 为 3×3 矩阵，把图像中的坐标换算回原图
+RepairCandidate = namedtuple("RepairCandidate", ["image", "geometry", "transform"])
+
+
+def symbol_size(version):
+    return 17 + 4 * version
+
+
+def alignment_positions(version):
+    """校正图形中心所在的行列坐标"""
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    size = symbol_size(version)
+    step = 26 if version == 32 else (version * 4 + count * 2 + 1) // (2 * count - 2) * 2
+    return sorted([size - 7 - i * step for i in range(count - 1)] + [6])
+
+
+@functools.lru_cache(maxsize=None)
+def function_patterns(version):
+    """
+    版本对应的功能图形，返回 (mask, value) 两个 n×n 布尔数组（只读）
+    mask 标出定位图案及分隔符、校正图形、时序图案和固定深色模块，value 为这些模块的颜色（True为深色）
+    """
+    n = symbol_size(version)
+    mask = np.zeros((n, n), dtype=bool)
+    value = np.zeros((n, n), dtype=bool)
+    for r, c in ((0, 0), (0, n - 7), (n - 7, 0)):
+        mask[max(r - 1, 0):r + 8, max(c - 1, 0):c + 8] = True
+        value[r:r + 7, c:c + 7] = FINDER
+    
+    # 与定位图案重叠的位置不放校正图形
+    positions = alignment_positions(version)
+    for r in positions:
+        for c in positions:
+            if mask[r, c]:
+                continue
+            mask[r - 2:r + 3, c - 2:c + 3] = True
+            value[r - 2:r + 3, c - 2:c + 3] = True
+            value[r - 1:r + 2, c - 1:c + 2] = False
+            value[r, c] = True
+    
+    timing = np.arange(8, n - 8) % 2 == 0
+    mask[6, 8:n - 8] = True
+    value[6, 8:n - 8] = timing
+    mask[8:n - 8, 6] = True
+    value[8:n - 8, 6] = timing
+    
+    mask[n - 8, 8] = True
+    value[n - 8, 8] = True
+    
+    mask.flags.writeable = False
+    value.flags.writeable = False
+    return mask, value
+
+
+def otsu_threshold(gray):
+    """Otsu阈值：使前景和背景类间方差最大的灰度值"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / hist.sum()
+    mu = np.cumsum(hist * np.arange(256)) / hist.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+
+
+def symbol_bounds(dark, min_count=2):
+    """深色像素的外接框 (x0, y0, x1, y1)，少于 min_count 个深色像素的行列视为噪点"""
+    rows = np.flatnonzero(dark.sum(1) >= min_count)
+    cols = np.flatnonzero(dark.sum(0) >= min_count)
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+
+def _runs(dark):
+    """逐行游程，返回 (长度, 与下一个游程同行, 是否深色) 三个一维数组"""
+    h, w = dark.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = dark
+    rows, cols = np.nonzero(np.diff(padded, axis=1))
+    lengths = np.diff(cols)
+    same_row = rows[1:] == rows[:-1]
+    is_dark = dark[rows[:-1], np.minimum(cols[:-1], w - 1)]
+    return lengths, same_row, is_dark
+
+
+def _finder_units(dark):
+    """按 1:1:3:1:1 比例逐行查找定位图案，返回每处命中估计的模块大小"""
+    lengths, same_row, is_dark = _runs(dark)
+    if len(lengths) < 5:
+        return np.empty(0)
+    windows = sliding_window_view(lengths, 5)
+    valid = sliding_window_view(same_row, 5).all(1) & is_dark[:len(windows)]
+    unit = windows.sum(1) / 7.0
+    # 与ZXing相同的容差：每段偏差不超过半个模块，中间一段不超过1.5个模块
+    tolerance = unit[:, None] * (FINDER_RATIO * 0.5)
+    matched = valid & (np.abs(windows - unit[:, None] * FINDER_RATIO) <= tolerance).all(1)
+    return unit[matched]
+
+
+def estimate_module(dark, max_runs=4000):
+    """
+    估计模块边长（像素）
+    二维码中所有游程长度都接近模块边长的整数倍：在候选边长上批量计算游程长度到最近整数倍的平均偏差，
+    取偏差接近最小值的最大边长（边长的约数同样吻合）；再用残存定位图案的 1:1:3:1:1 扫描结果细化
+    """
+    lengths = np.concatenate([_runs(dark)[0], _runs(dark.T)[0]])
+    lengths = lengths[lengths > 0]
+    if len(lengths) < 10:
+        return None
+    if len(lengths) > max_runs:
+        lengths = np.random.default_rng(0).choice(lengths, max_runs, replace=False)
+    sizes = np.arange(1.5, max(min(dark.shape) / 21, 2.0), 0.05)
+    fraction = (lengths[None, :] / sizes[:, None]) % 1
+    deviation = np.minimum(fraction, 1 - fraction).mean(1)
+    module = sizes[deviation <= deviation.min() + 0.05].max()
+    
+    units = np.concatenate([_finder_units(dark), _finder_units(dark.T)])
+    units = units[np.abs(units - module) <= module * 0.15]
+    if len(units) >= 3:
+        module = float(np.median(units))
+    return float(module)
+
+
+@functools.lru_cache(maxsize=None)
+def _pattern_blocks(version):
+    """
+    功能图形模块的坐标和标准颜色，按分组排列（三个定位图案各一组，其余为一组），
+    返回 (行, 列, 颜色, 每组的起始下标)
+    """
+    mask, value = function_patterns(version)
+    n = symbol_size(version)
+    r, c = np.nonzero(mask)
+    block = np.full(len(r), 3)
+    block[(r < 8) & (c < 8)] = 0
+    block[(r < 8) & (c >= n - 8)] = 1
+    block[(r >= n - 8) & (c < 8)] = 2
+    order = np.argsort(block, kind="stable")
+    starts = np.searchsorted(block[order], np.arange(4))
+    return r[order], c[order], value[r, c][order], starts
+
+
+def score_geometries(dark, version, xs, ys, modules, finder_threshold=0.75):
+    """
+    批量给候选网格打分：xs、ys、modules 为形状相同的一维数组，
+    在功能图形模块中心采样并与标准图形比较，返回每个候选的吻合比例。
+    被涂掉的定位图案（吻合比例低于 finder_threshold）不计入，只用残存的定位图案、时序图案和校正图形打分
+    """
+    r, c, expected, starts = _pattern_blocks(version)
+    X = np.floor(xs[:, None] + (c + 0.5) * modules[:, None]).astype(np.intp)
+    Y = np.floor(ys[:, None] + (r + 0.5) * modules[:, None]).astype(np.intp)
+    h, w = dark.shape
+    # 图像以外的采样点指向末尾追加的一个浅色像素
+    flat = np.append(dark.ravel(), False)
+    index = np.where((X >= 0) & (X < w) & (Y >= 0) & (Y < h), Y * w + X, h * w)
+    matched = np.add.reduceat(flat[index] == expected, starts, axis=1, dtype=np.int32)
+    total = np.diff(np.append(starts, len(r)))
+    kept = matched >= total * finder_threshold
+    kept[:, 3] = True
+    return (matched * kept).sum(1) / (total * kept).sum(1)
+
+
+def _search(dark, bounds, version, scales, offsets_x, offsets_y, base=None):
+    """在 (模块大小 × 横向偏移 × 纵向偏移) 的候选网格中找吻合度最高的一个"""
+    x0, y0, x1, y1 = bounds
+    if base is None:
+        base = max(x1 - x0, y1 - y0) / symbol_size(version)
+    S, DX, DY = np.meshgrid(base * scales, offsets_x, offsets_y, indexing="ij")
+    xs = (x0 + DX * S).ravel()
+    ys = (y0 + DY * S).ravel()
+    modules = S.ravel()
+    scores = score_geometries(dark, version, xs, ys, modules)
+    # 模块中心采样对小的偏差不敏感，最高分往往是一片区域，取其中心
+    best = scores >= scores.max() - 1e-9
+    return xs[best].mean(), ys[best].mean(), modules[best].mean(), float(scores.max())
+
+
+def find_geometries(dark, max_results=2, min_score=0.7):
+    """
+    估计二维码网格：对四个方向、估计版本附近的几个版本，先粗搜再在最好的结果附近细搜
+    返回按吻合度从高到低排列的 Geometry 列表
+    """
+    module = estimate_module(dark)
+    if not module or module < 1.5:
+        return []
+    
+    coarse_scales = np.linspace(0.92, 1.08, 17)
+    coarse_offsets = np.arange(-2.0, 2.01, 0.5)
+    fine_scales = np.linspace(0.99, 1.01, 9)
+    fine_offsets = np.linspace(-0.5, 0.5, 9)
+    
+    found = []
+    for rotation in range(4):
+        rotated = np.rot90(dark, rotation)
+        bounds = symbol_bounds(rotated)
+        if bounds is None:
+            continue
+        x0, y0, x1, y1 = bounds
+        estimated = (max(x1 - x0, y1 - y0) / module - 17) / 4
+        # 外接框可能因涂抹偏小，版本偏向往大估
+        for version in range(max(1, int(round(estimated)) - 1), min(40, int(round(estimated)) + 2) + 1):
+            x, y, size, score = _search(rotated, bounds, version, coarse_scales, coarse_offsets, coarse_offsets)
+            found.append((score, version, rotation, x, y, size))
+    
+    found.sort(reverse=True)
+    geometries = []
+    for score, version, rotation, x, y, size in found[:max_results * 2]:
+        rotated = np.rot90(dark, rotation)
+        x, y, size, score = _search(rotated, (x, y, x, y), version, fine_scales, fine_offsets, fine_offsets,
+                                    base=size)
+        if score >= min_score:
+            geometries.append(Geometry(version, x, y, size, rotation, score))
+    geometries.sort(key=lambda g: g.score, reverse=True)
+    return geometries[:max_results]
+
+
+def sample_modules(dark, geometry):
+    """按网格对每个模块中心附近的小窗口取多数，得到 n×n 模块矩阵（True为深色）"""
+    n = symbol_size(geometry.version)
+    radius = max(int(geometry.module * 0.2), 0)
+    window = np.arange(-radius, radius + 1)
+    centers = np.arange(n) + 0.5
+    X = np.floor(geometry.x + centers * geometry.module).astype(np.intp)[:, None] + window
+    Y = np.floor(geometry.y + centers * geometry.module).astype(np.intp)[:, None] + window
+    h, w = dark.shape
+    inside = ((Y >= 0) & (Y < h))[:, None, :, None] & ((X >= 0) & (X < w))[None, :, None, :]
+    patch = dark[np.clip(Y, 0, h - 1)[:, None, :, None], np.clip(X, 0, w - 1)[None, :, None, :]] & inside
+    return patch.mean(axis=(2, 3)) > 0.5
+
+
+def repaint_modules(modules, version):
+    """在模块矩阵副本上写入标准的功能图形"""
+    mask, value = function_patterns(version)
+    repaired = modules.copy()
+    repaired[mask] = value[mask]
+    return repaired
+
+
+def render_modules(modules, scale=6, quiet=QUIET_ZONE):
+    """把模块矩阵渲染为带静区的黑白图像"""
+    padded = np.pad(modules, quiet)
+    pixels = padded.repeat(scale, axis=0).repeat(scale, axis=1)
+    return Image.fromarray(np.where(pixels, 0, 255).astype(np.uint8))
+
+
+def paint_patterns(gray, geometry):
+    """在灰度副本上按网格重绘功能图形，并把符号外 QUIET_ZONE 个模块宽的一圈涂白"""
+    mask, value = function_patterns(geometry.version)
+    n = symbol_size(geometry.version)
+    h, w = gray.shape
+    cols = np.floor((np.arange(w) + 0.5 - geometry.x) / geometry.module).astype(np.intp)
+    rows = np.floor((np.arange(h) + 0.5 - geometry.y) / geometry.module).astype(np.intp)
+    inside = ((rows >= 0) & (rows < n))[:, None] & ((cols >= 0) & (cols < n))[None, :]
+    near = ((rows >= -QUIET_ZONE) & (rows < n + QUIET_ZONE))[:, None] & \
+        ((cols >= -QUIET_ZONE) & (cols < n + QUIET_ZONE))[None, :]
+    
+    R = np.clip(rows, 0, n - 1)[:, None]
+    C = np.clip(cols, 0, n - 1)[None, :]
+    painted = gray.copy()
+    painted[near & ~inside] = 255
+    pattern = inside & mask[R, C]
+    painted[pattern] = np.where(value[R, C], 0, 255)[pattern]
+    return painted
+
+
+def _rotation_transform(rotation, shape):
+    """np.rot90(图像, rotation) 后的坐标换算回原图的 3×3 矩阵"""
+    transform = np.eye(3)
+    h, w = shape
+    for _ in range(rotation):
+        # 逆时针转一次：新图 (x, y) 对应旧图 (w - y, x)
+        transform = transform @ np.array([[0, -1, w], [1, 0, 0], [0, 0, 1]], dtype=float)
+        h, w = w, h
+    return transform
+
+
+def repair_candidates(img, max_geometries=2):
+    """
+    生成修复后的候选图像：每个估计出的网格给出两张
+    1. 原图副本上直接重绘功能图形和静区（坐标与原图一致）
+    2. 按网格采样出模块矩阵，重绘功能图形后重新渲染的标准图像
+    """
+    gray = np.asarray(img.convert("L"))
+    dark = gray <= otsu_threshold(gray)
+    for geometry in find_geometries(dark, max_geometries):
+        rotated = np.rot90(gray, geometry.rotation)
+        painted = np.rot90(paint_patterns(rotated, geometry), -geometry.rotation)
+        yield RepairCandidate(Image.fromarray(np.ascontiguousarray(painted)), geometry, np.eye(3))
+        
+        modules = repaint_modules(sample_modules(np.rot90(dark, geometry.rotation), geometry), geometry.version)
+        scale = 6
+        step = geometry.module / scale
+        offset = QUIET_ZONE * geometry.module
+        render_transform = np.array([[step, 0, geometry.x - offset], [0, step, geometry.y - offset], [0, 0, 1]])
+        yield RepairCandidate(render_modules(modules, scale), geometry,
+                              _rotation_transform(geometry.rotation, gray.shape) @ render_transform)
+
+
+def remap_result(result, transform):
+    """
+    把解码结果（pyzbar的Decoded或同结构的namedtuple）的多边形和外接框换算回原图坐标
+    transform 可以是仿射或透视（单应）矩阵
+    """
+    if np.allclose(transform, np.eye(3)) or not result.polygon:
+        return result
+    points = np.array([(p[0], p[1], 1.0) for p in result.polygon]) @ transform.T
+    polygon = [(int(round(x / w)), int(round(y / w))) for x, y, w in points]
+    xs = [p[0] for p in polygon]
+    ys = [p[1] for p in polygon]
+    return result._replace(rect=(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)), polygon=polygon)
@@ -0,0 +1,213 @@
+"""
+分片数据拼接
+CTF和物流批量中常把一份数据拆成多个二维码：按文件编号、QR结构链接（Structured Append）或数据开头的“i/n”序号。
+这里逐个接收批量扫描的结果，按序号标记分组：结构链接头（序号、总数、奇偶校验）优先，其次是数据开头的序号前缀，
+都没有时（且明确开启了 file_numbers）用文件名中的编号——相机照片等普通编号文件默认不会被当成分片；
+每组按序号排列，报告缺失的序号、重复和内容冲突的分片，并拼出数据。只有知道总数的组才会报告为完整。
+每加入一个结果只更新对应的组，长时间扫描中途也能随时查看部分拼接结果
+"""
+import os
+import re
+from collections import namedtuple
+from functools import reduce
+
+MARKERS = ("结构链接", "序号前缀", "文件编号")
+
+# 数据开头的序号前缀，total 可省略；依次尝试，第一个匹配的生效
+PREFIX_PATTERNS = [re.compile(pattern.encode("utf-8"), re.IGNORECASE) for pattern in (
+    # [1/5] (1/5) 1/5: part 1/5 - 第1/5部分 ……
+    r"^\s*[\[(<{【（]?\s*(?:part|chunk|frag(?:ment)?|seg(?:ment)?|p|第)?\s*#?(?P<index>\d{1,6})\s*"
+    r"(?:/|／|of)\s*(?P<total>\d{1,6})\s*(?:部分|片|段)?\s*[\])>}】）]?\s*[:：|,，\-]?\s?",
+    # part1: chunk 02 - frag#3|
+    r"^\s*[\[(<{【（]?\s*(?:part|chunk|frag(?:ment)?|seg(?:ment)?)\s*#?(?P<index>\d{1,6})"
+    r"\s*[\])>}】）]?\s*[:：|\-]\s?",
+    # 01:xxx  03|xxx
+    r"^\s*(?P<index>\d{1,6})\s*[:：|]\s?",
+)]
+
+# 界面和命令行显示拼接结果时最多显示的字节数
+PREVIEW_LIMIT = 64 * 1024
+
+# 文件名中的编号（取最后一组数字），前面的部分作为分组依据
+FILE_NUMBER = re.compile(r"^(?P<stem>.*?)(?P<index>\d+)(?P<tail>\D*)$")
+
+# index 为序号，payload 为去掉序号标记后的数据
+Fragment = namedtuple("Fragment", ["marker", "group", "index", "total", "payload", "source"])
+
+
+def parse_prefix(data):
+    """数据开头的序号前缀，返回 (序号, 总数或None, 前缀长度)；没有时返回None"""
+    for pattern in PREFIX_PATTERNS:
+        match = pattern.match(data)
+        if not match or match.end() >= len(data):
+            continue
+        index = int(match.group("index"))
+        total = match.groupdict().get("total")
+        total = int(total) if total else None
+        if total is not None and not (1 <= index <= total and total >= 2):
+            continue
+        return index, total, match.end()
+    return None
+
+
+def file_number(source):
+    """文件名中的编号，返回 (分组依据, 编号)；没有数字时返回None"""
+    name = os.path.splitext(os.path.basename(source))[0]
+    match = FILE_NUMBER.match(name)
+    if not match:
+        return None
+    return (os.path.dirname(source), match.group("stem")), int(match.group("index"))
+
+
+def classify(data, source, structured=None, file_numbers=False):
+    """
+    判断一个结果属于哪种序号标记，返回 Fragment，无法排序时返回None
+    structured 为结构链接头 (序号, 总数, 奇偶校验)，序号从0开始；file_numbers=True 时才按文件名编号分组
+    """
+    data = bytes(data)
+    if structured:
+        index, total, parity = structured
+        return Fragment("结构链接", (total, parity), index, total, data, source)
+    prefix = parse_prefix(data)
+    if prefix:
+        index, total, length = prefix
+        return Fragment("序号前缀", total, index, total, data[length:], source)
+    if file_numbers and source:
+        numbered = file_number(source)
+        if numbered:
+            group, index = numbered
+            return Fragment("文件编号", group, index, None, data, source)
+    return None
+
+
+class SequenceGroup:
+    """一组分片：按序号保存首次收到的数据，另外记录重复和内容冲突的分片"""
+    def __init__(self, marker, group, total):
+        self.marker = marker
+        self.group = group
+        self.total = total
+        self.parts = {}
+        self.duplicates = {}
+        self.conflicts = {}
+    
+    def add(self, fragment):
+        first = self.parts.get(fragment.index)
+        if first is None:
+            self.parts[fragment.index] = fragment
+        elif first.payload == fragment.payload:
+            self.duplicates.setdefault(fragment.index, []).append(fragment.source)
+        else:
+            self.conflicts.setdefault(fragment.index, []).append(fragment)
+    
+    @property
+    def label(self):
+        if self.marker == "结构链接":
+            return f"结构链接(校验{self.group[1]:02X})"
+        if self.marker == "文件编号":
+            directory, stem = self.group
+            return f"文件编号 {os.path.join(os.path.basename(directory), stem)}*"
+        return "序号前缀" + (f"(共{self.total})" if self.total else "")
+    
+    def expected(self):
+        """应有的序号范围：结构链接从0开始，序号前缀有总数时从1开始，否则取收到的最小到最大序号"""
+        if self.marker == "结构链接":
+            return range(self.total)
+        if self.total:
+            return range(1, self.total + 1)
+        return range(min(self.parts), max(self.parts) + 1)
+    
+    def missing(self):
+        return [index for index in self.expected() if index not in self.parts]
+    
+    @property
+    def complete(self):
+        """没有总数（文件编号、不带总数的序号前缀）时无法确认是否收齐，始终为False"""
+        return bool(self.total) and not self.missing()
+    
+    def payload(self):
+        """按序号拼接已收到的分片（缺失的分片直接跳过）"""
+        return b"".join(self.parts[index].payload for index in sorted(self.parts))
+    
+    def parity_ok(self):
+        """结构链接的奇偶校验为全部数据字节的异或；不是结构链接或尚不完整时返回None"""
+        if self.marker != "结构链接" or not self.complete:
+            return None
+        return reduce(lambda a, b: a ^ b, self.payload(), 0) == self.group[1]
+    
+    def progress(self):
+        expected = len(self.expected())
+        return f"{self.label}: {len(self.parts)}/{expected}" + ("" if self.total else "（总数未知）")
+    
+    def report(self):
+        """多行的文字报告（不含拼接出的数据）"""
+        lines = [self.progress() + ("，完整" if self.complete else "")]
+        missing = self.missing()
+        if missing:
+            lines.append(f"  缺少序号: {_ranges(missing)}")
+        if self.duplicates:
+            lines.append(f"  重复（内容相同）: {_ranges(sorted(self.duplicates))}")
+        for index, fragments in sorted(self.conflicts.items()):
+            sources = "、".join(os.path.basename(f.source or "?") for f in fragments)
+            lines.append(f"  序号 {index} 内容冲突: 已采用 {os.path.basename(self.parts[index].source or '?')}，"
+                         f"另有 {sources}")
+        parity = self.parity_ok()
+        if parity is False:
+            lines.append("  结构链接奇偶校验不符")
+        return "\n".join(lines)
+
+
+def _ranges(indices):
+    """把有序的序号列表压缩为 1-3、7、9-10 的形式"""
+    parts = []
+    start = previous = None
+    for index in indices:
+        if previous is not None and index == previous + 1:
+            previous = index
+            continue
+        if start is not None:
+            parts.append(str(start) if start == previous else f"{start}-{previous}")
+        start = previous = index
+    if start is not None:
+        parts.append(str(start) if start == previous else f"{start}-{previous}")
+    return "、".join(parts)
+
+
+class SequenceAssembler:
+    """
+    增量拼接：add 每次加入一个结果，只更新所属的组
+    只有一个分片、又没有总数的组不算序列；file_numbers=True 时没有其他序号标记的结果按文件名编号分组
+    """
+    def __init__(self, file_numbers=False):
+        self.file_numbers = file_numbers
+        self.groups = {}
+    
+    def add(self, data, source=None, structured=None):
+        """加入一个结果，返回它所属的组；无法排序时返回None"""
+        fragment = classify(data, source, structured, self.file_numbers)
+        if fragment is None:
+            return None
+        key = (fragment.marker, fragment.group)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = SequenceGroup(fragment.marker, fragment.group, fragment.total)
+        group.add(fragment)
+        return group
+    
+    def add_records(self, source, records):
+        """加入一个文件的扫描记录（scan_engine.ScanRecord），返回有变化的组"""
+        changed = []
+        for record in records:
+            group = self.add(record.data, source, getattr(record, "sequence", None))
+            if group is not None and group not in changed:
+                changed.append(group)
+        return changed
+    
+    def sequences(self):
+        """当前所有成序列的组，结构链接、序号前缀在前，文件编号在后"""
+        found = [group for group in self.groups.values()
+                 if len(group.parts) + len(group.conflicts) > 1 or (group.total or 0) > 1]
+        return sorted(found, key=lambda group: MARKERS.index(group.marker))
+    
+    def progress(self):
+        """一行进度摘要，用于长时间扫描中的状态显示"""
+        return "，".join(group.progress() for group in self.sequences())
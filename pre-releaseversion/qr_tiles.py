@@ -0,0 +1,94 @@
+"""
+多码页面分块
+标签页一张图上有几百个小二维码，整图一次 pyzbar.decode 既慢又会漏码，失败后的增强流程还要对整页反复执行。
+这里把图像切成相互重叠的分块，每块单独识别；结果坐标平移回整图，
+重叠区域内被相邻分块重复识别的同一个码按内容和位置去重。
+分块里还有大片深色区域没有被识别结果覆盖时，视为识别失败，只对这些分块做增强后重试
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# 分块边长和相邻分块的重叠（像素），重叠应大于页面上最大的二维码边长
+TILE_SIZE = 640
+OVERLAP = 160
+
+# 深色像素少于该比例的分块视为空白，不重试
+MIN_INK = 0.02
+
+# 未被识别结果覆盖的深色像素超过该比例时重试（文字等零散内容通常低于此值）
+MAX_UNCOVERED = 0.25
+
+# label 为分块名称，box 为 (左, 上, 右, 下)，transform 为分块坐标到整图坐标的平移矩阵
+Tile = namedtuple("Tile", ["label", "box", "transform"])
+
+
+def _starts(length, size, step):
+    """分块起点：按步长排列，最后一块与边缘对齐"""
+    if length <= size:
+        return [0]
+    starts = list(range(0, length - size, step))
+    starts.append(length - size)
+    return starts
+
+
+def tile_grid(width, height, size=TILE_SIZE, overlap=OVERLAP):
+    """覆盖整张图的重叠分块，按行排列"""
+    step = max(1, size - overlap)
+    tiles = []
+    for row, y in enumerate(_starts(height, size, step)):
+        for column, x in enumerate(_starts(width, size, step)):
+            box = (x, y, min(x + size, width), min(y + size, height))
+            transform = np.array([[1, 0, x], [0, 1, y], [0, 0, 1]], dtype=float)
+            tiles.append(Tile(f"分块{row}-{column}", box, transform))
+    return tiles
+
+
+def _center(rect):
+    left, top, width, height = rect
+    return left + width / 2, top + height / 2
+
+
+def _contains(rect, point):
+    left, top, width, height = rect
+    return left <= point[0] <= left + width and top <= point[1] <= top + height
+
+
+def same_code(a, b):
+    """两个结果（整图坐标）是否为同一个码：码制和内容相同，且任一个的中心落在另一个的外接框内"""
+    if a.type != b.type or bytes(a.data) != bytes(b.data):
+        return False
+    return _contains(a.rect, _center(b.rect)) or _contains(b.rect, _center(a.rect))
+
+
+def dedupe(results):
+    """合并重叠分块的重复结果；同一个码保留外接框最大的一次（不在分块边缘被截断的那次）"""
+    kept = []
+    for result in results:
+        for i, other in enumerate(kept):
+            if same_code(result, other):
+                if result.rect[2] * result.rect[3] > other.rect[2] * other.rect[3]:
+                    kept[i] = result
+                break
+        else:
+            kept.append(result)
+    return kept
+
+
+def needs_retry(dark, tile, results, margin=2):
+    """
+    分块是否需要重试：dark 为整图的深色像素矩阵，results 为已有的整图坐标结果
+    空白分块不重试；已识别码的外接框（略微扩大）之外仍有较多深色像素时重试
+    """
+    x0, y0, x1, y1 = tile.box
+    mask = dark[y0:y1, x0:x1].copy()
+    ink = int(mask.sum())
+    if ink < mask.size * MIN_INK:
+        return False
+    for result in results:
+        left, top, width, height = result.rect
+        left, top = left - margin - x0, top - margin - y0
+        right, bottom = left + width + 2 * margin, top + height + 2 * margin
+        if right > 0 and bottom > 0:
+            mask[max(top, 0):bottom, max(left, 0):right] = False
+    return mask.sum() > ink * MAX_UNCOVERED
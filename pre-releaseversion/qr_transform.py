@@ -0,0 +1,138 @@
+"""
+变换搜索
+镜像打印、斜拍或被刻意剪切变形的二维码，zbar直接识别不了（镜像码完全无法识别）。
+这里生成一组候选变换：镜像、90°旋转、若干剪切，以及由深色区域角点估计出的透视校正。
+每个候选只是一个 3×3 矩阵（输出坐标 → 原图坐标），由 Image.transform 在工作线程里生成变换后的图像，
+同一个矩阵也用于把识别结果的坐标换算回原图
+"""
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+from qr_matrix import homography, order_corners
+from qr_repair import otsu_threshold
+
+# 剪切系数（水平、竖直各一组）
+SHEARS = (-0.3, -0.15, 0.15, 0.3)
+
+# 透视校正后四周留出的静区，占边长的比例
+MARGIN = 0.1
+
+# 角点检测前把图像缩小到的最长边
+DETECT_SIZE = 400
+
+# label 为变换名称，size 为输出图像大小，transform 为输出坐标到原图坐标的 3×3 矩阵
+Warp = namedtuple("Warp", ["label", "size", "transform"])
+
+
+def _affine(a, b, c, d, e, f):
+    return np.array([[a, b, c], [d, e, f], [0, 0, 1]], dtype=float)
+
+
+def mirror_warps(width, height):
+    """左右镜像（上下镜像等价于左右镜像再旋转180°，解码器本身能处理旋转）"""
+    yield Warp("镜像", (width, height), _affine(-1, 0, width, 0, 1, 0))
+
+
+def rotation_warps(width, height):
+    """逆时针旋转 90°、180°、270°"""
+    yield Warp("旋转90°", (height, width), _affine(0, -1, width, 1, 0, 0))
+    yield Warp("旋转180°", (width, height), _affine(-1, 0, width, 0, -1, height))
+    yield Warp("旋转270°", (height, width), _affine(0, 1, 0, -1, 0, height))
+
+
+def shear_warps(width, height, shears=SHEARS):
+    """水平和竖直剪切，输出图像放大到能容纳整张剪切后的原图"""
+    for k in shears:
+        # 输出 x = 原图 x + k·y，向右平移使输出坐标不为负
+        shift = -k * height if k < 0 else 0
+        yield Warp(f"水平剪切{k:+.2f}", (int(width + abs(k) * height), height),
+                   _affine(1, -k, -shift, 0, 1, 0))
+    for k in shears:
+        shift = -k * width if k < 0 else 0
+        yield Warp(f"竖直剪切{k:+.2f}", (width, int(height + abs(k) * width)),
+                   _affine(1, 0, 0, -k, 1, -shift))
+
+
+def _extreme_points(ys, xs):
+    """深色像素中两组四个极值点：对角方向（x±y）和坐标轴方向（最左、最上、最右、最下）"""
+    s = xs + ys
+    d = xs - ys
+    diagonal = [s.argmin(), d.argmax(), s.argmax(), d.argmin()]
+    axis = [xs.argmin(), ys.argmin(), xs.argmax(), ys.argmax()]
+    for index in (diagonal, axis):
+        yield np.stack([xs[index], ys[index]], axis=-1).astype(float)
+
+
+def corner_candidates(gray, block=8, density=0.3):
+    """
+    估计二维码外轮廓的四边形候选，返回原图坐标下的 [4×2 角点数组, ...]
+    在缩小后的图像上分别取全部深色像素和深色密集区域（按块统计，滤掉细线、文字等稀疏噪点）的极值点
+    """
+    scale = max(gray.size) / DETECT_SIZE
+    small = gray.reduce(int(scale)) if scale >= 2 else gray
+    factor = gray.width / small.width
+    pixels = np.asarray(small)
+    dark = pixels <= otsu_threshold(pixels)
+    
+    quads = []
+    ys, xs = np.nonzero(dark)
+    if len(xs) >= 4:
+        quads.extend(quad + 0.5 for quad in _extreme_points(ys, xs))
+    
+    h, w = (dark.shape[0] // block) * block, (dark.shape[1] // block) * block
+    if h and w:
+        blocks = dark[:h, :w].reshape(h // block, block, w // block, block).mean((1, 3))
+        ys, xs = np.nonzero(blocks > density)
+        if len(xs) >= 4:
+            # 块坐标换算为块中心的像素坐标
+            quads.extend(quad * block + block / 2 for quad in _extreme_points(ys, xs))
+    return [quad * factor for quad in quads]
+
+
+def _quad_ok(corners, min_side):
+    """四边形是凸的且各边都不太短"""
+    sides = np.sqrt(((corners - np.roll(corners, -1, axis=0)) ** 2).sum(1))
+    if sides.min() < min_side:
+        return False
+    edges = np.roll(corners, -1, axis=0) - corners
+    cross = edges[:, 0] * np.roll(edges, -1, axis=0)[:, 1] - edges[:, 1] * np.roll(edges, -1, axis=0)[:, 0]
+    return bool((cross > 0).all() or (cross < 0).all())
+
+
+def perspective_warps(gray, min_fraction=0.05, tolerance=0.02):
+    """把角点候选组成的四边形校正为带静区的正方形；相互接近的候选只保留一个"""
+    min_side = min(gray.size) * min_fraction
+    kept = []
+    for corners in corner_candidates(gray):
+        corners = order_corners(corners)
+        if not _quad_ok(corners, min_side):
+            continue
+        side = np.sqrt(((corners - np.roll(corners, -1, axis=0)) ** 2).sum(1)).max()
+        if any(np.abs(corners - other).max() < side * tolerance for other in kept):
+            continue
+        kept.append(corners)
+        margin = side * MARGIN
+        square = np.array([(0, 0), (side, 0), (side, side), (0, side)]) + margin
+        try:
+            H = homography(square, corners)
+        except np.linalg.LinAlgError:
+            continue
+        size = int(round(side + 2 * margin))
+        yield Warp(f"透视校正{len(kept)}", (size, size), H)
+
+
+def candidate_warps(gray):
+    """按命中可能性排列的全部候选变换：镜像、透视校正、剪切、旋转"""
+    width, height = gray.size
+    yield from mirror_warps(width, height)
+    yield from perspective_warps(gray)
+    yield from shear_warps(width, height)
+    yield from rotation_warps(width, height)
+
+
+def apply_warp(gray, warp):
+    """生成变换后的图像，原图以外的区域填白色"""
+    H = warp.transform / warp.transform[2, 2]
+    return gray.transform(warp.size, Image.PERSPECTIVE, tuple(H.ravel()[:8]), Image.BILINEAR, fillcolor=255)
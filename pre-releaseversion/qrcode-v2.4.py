@@ -17,9 +17,27 @@ import datetime
 from PIL.PngImagePlugin import PngInfo
 import zlib
 import concurrent.futures
+import collections
 import json
+import time
 import natsort  # 用于自然排序
 import sys
+import scan_engine  # 无界面扫描引擎
+import result_export  # 扫描结果流式导出
+import decoders  # 可插拔解码后端
+from ui_dispatch import UIDispatcher  # 后台线程的界面更新队列
+import color_scan  # 彩色分层识别
+import qr_matrix  # 模块矩阵提取和底层分析
+import qr_decode  # 纯Python的RS纠错/纠删解码
+import qr_transform  # 镜像、旋转、剪切和透视变换搜索
+import qr_deblur  # FFT反卷积去模糊
+import qr_morph  # 形态学清理
+import qr_reassemble  # 碎片重组
+import image_merge  # 流式网格拼图
+import qr_sequence  # 分片数据拼接
+import payload_decode  # base64/hex/压缩等载荷的递归解码
+import scan_guard  # 文件头检查和带看门狗的扫描进程池
+import read_ahead  # 批量扫描时预读后面的文件
 
 # 处理资源路径问题
 def resource_path(relative_path):
@@ -41,6 +59,9 @@ class QRScannerApp(TkinterDnD.Tk):
         self.geometry("1000x800")
         self.configure(bg="#f0f0f0")
         
+        # 后台线程通过 post_ui 更新界面，必须在各模块之前创建
+        self.ui = UIDispatcher(self)
+        
         # 加载配置
         self.config = self.load_config()
         
@@ -115,7 +136,38 @@ class QRScannerApp(TkinterDnD.Tk):
             "batch_scan": {
                 "sort_order": "none",  # none, numeric, alphabetical
                 "show_detailed": True,
-                "separator": "\n" + "-" * 50 + "\n"
+                "separator": "\n" + "-" * 50 + "\n",
+                "checkpoint": True,  # 批量/文件夹扫描时保存断点
+                "jobs_dir": "scan_jobs",
+                "export_enabled": False,  # 边扫描边导出结果
+                "export_format": "jsonl",  # jsonl, csv
+                "export_only": False,  # 导出时界面只显示进度
+                "export_fsync": False,
+                "file_timeout": 60,  # 单个文件的处理时间上限（秒），大于0时批量扫描在可终止的工作进程中进行
+                "scan_workers": 0,  # 工作进程数，0为CPU核数减1
+                "max_megapixels": 100,  # 像素数上限（百万），只读文件头检查，0为不限制
+                "max_file_mb": 200,  # 文件大小上限（MB），0为不限制
+                "cost_schedule": True,  # 工作进程按估计代价先扫小文件，结果按完成顺序显示
+                "read_ahead_mb": 64  # 预读缓存上限（MB），读文件和解码并行进行，0为不预读
+            },
+            "decoder": {
+                "backends": ["pyzbar"],  # pyzbar, opencv, wechat, zxing
+                "strategy": "cheapest",  # cheapest, race, consensus
+                "symbols": ["QRCODE"],  # 按优先级排列的码制
+                "stop_after_first": False,  # 找到一种码制后不再尝试其余码制
+                "stop_symbols": [],  # 命中即停止的码制
+                "color_layers": False,  # 彩色分层识别
+                "color_clusters": 6,  # 彩色分层时的k-means颜色簇数量
+                "sheet_mode": False,  # 多码页面：分块并行识别并去除重复结果
+                "morphology": True,  # 识别失败时尝试形态学清理（网点、圆点、艺术码）
+                "deblur": True,  # 识别失败时尝试FFT反卷积去模糊
+                "deblur_method": "wiener",  # wiener, richardson_lucy
+                "transform_search": True,  # 识别失败时搜索镜像、旋转、剪切和透视变换
+                "finder_repair": False,  # 识别失败时尝试定位图案修复
+                "hidden_data": True,  # 识别成功后检查QR码填充、终止符之后和纠错码字中的隐藏数据
+                "sequence_assembly": True,  # 批量扫描时按结构链接或序号前缀拼接分片数据
+                "sequence_file_numbers": False,  # 没有序号标记的结果也按文件名编号拼接（普通编号照片会被误拼）
+                "payload_decoding": True  # 显示结果时递归尝试base64/base32/hex/URL编码和gzip/zlib等解压
             },
             "analysis": {
                 "auto_wrap": True,
@@ -198,9 +250,16 @@ class QRScannerApp(TkinterDnD.Tk):
             if valid_files:
                 self.binary_editor_module.handle_drop(valid_files)
     
+    def post_ui(self, func):
+        """在主线程中执行界面更新，可在任意线程调用"""
+        self.ui.post(func)
+    
     def update_status(self, message):
-        """更新状态栏"""
-        self.status_var.set(message)
+        """更新状态栏，后台线程调用时转交主线程"""
+        if self.ui.in_main_thread():
+            self.status_var.set(message)
+        else:
+            self.ui.post(lambda: self.status_var.set(message))
 class ScanModule:
     """二维码扫描模块，封装扫描相关功能"""
     def __init__(self, parent, config):
@@ -208,11 +267,19 @@ class ScanModule:
         self.config = config
         self.scanning = False
         self.stop_requested = False
+        # 停止请求同时通知看门狗进程池，正在处理的文件不必等到处理完
+        self.stop_event = threading.Event()
         self.current_preview_image = None
         self.current_image_path = None
         self.current_image_url = None
         self.enhance_level = 1.0
-        self.attempted_enhancements = 0
+        self.resume_target = None  # 待恢复的断点任务
+        self.resume_changes = []  # 恢复任务时改回的扫描选项
+        self.result_writer = None  # 流式导出
+        self.batch_results = scan_engine.ScanResults()  # 本次批量扫描的全部结果
+        self.decoder = None  # 按解码设置创建的解码链
+        self.decoder_key = None
+        self.module_matrices = []  # 最近一次模块矩阵分析的结果
     
     def init_ui(self, parent_frame):
         """初始化扫描选项卡UI"""
@@ -296,6 +363,33 @@ class ScanModule:
                                         variable=self.detailed_output_var)
         detailed_check.pack(anchor="w", padx=5, pady=(0, 5))
         
+        # 断点续扫
+        checkpoint_frame = ttk.Frame(batch_options_frame)
+        checkpoint_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        
+        self.checkpoint_var = tk.BooleanVar(value=self.config["batch_scan"]["checkpoint"])
+        ttk.Checkbutton(checkpoint_frame, text="保存断点",
+                        variable=self.checkpoint_var).pack(side=tk.LEFT)
+        
+        self.resume_button = ttk.Button(checkpoint_frame, text="恢复任务...", command=self.resume_job)
+        self.resume_button.pack(side=tk.RIGHT)
+        
+        # 流式导出
+        export_frame = ttk.Frame(batch_options_frame)
+        export_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        
+        self.export_var = tk.BooleanVar(value=self.config["batch_scan"]["export_enabled"])
+        ttk.Checkbutton(export_frame, text="流式导出",
+                        variable=self.export_var).pack(side=tk.LEFT)
+        
+        self.export_format_var = tk.StringVar(value=self.config["batch_scan"]["export_format"])
+        ttk.Combobox(export_frame, textvariable=self.export_format_var, state="readonly", width=6,
+                     values=result_export.EXPORT_FORMATS).pack(side=tk.LEFT, padx=5)
+        
+        self.export_only_var = tk.BooleanVar(value=self.config["batch_scan"]["export_only"])
+        ttk.Checkbutton(export_frame, text="仅写入文件",
+                        variable=self.export_only_var).pack(side=tk.LEFT)
+        
         # 异形二维码增强设置
         complex_qr_frame = ttk.Frame(control_frame)
         complex_qr_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -310,6 +404,68 @@ class ScanModule:
             ttk.Radiobutton(complex_qr_frame, text=text, variable=self.enhance_var, 
                            value=value).pack(side=tk.LEFT, padx=5)
         
+        # 码制选择，只勾选需要的码制可以加快识别
+        symbol_frame = ttk.LabelFrame(control_frame, text="码制")
+        symbol_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.symbol_vars = {}
+        for i, (name, label) in enumerate(decoders.SYMBOLOGIES.items()):
+            self.symbol_vars[name] = tk.BooleanVar(value=name in self.config["decoder"]["symbols"])
+            ttk.Checkbutton(symbol_frame, text=label, variable=self.symbol_vars[name]).grid(
+                row=i//3, column=i%3, sticky="w", padx=5, pady=2)
+        
+        self.stop_after_first_var = tk.BooleanVar(value=self.config["decoder"]["stop_after_first"])
+        ttk.Checkbutton(symbol_frame, text="找到一种码制后停止", variable=self.stop_after_first_var).grid(
+            row=2, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 彩色分层：R/G/B(C/M/Y)通道、颜色空间投影和颜色簇分别识别
+        self.color_layers_var = tk.BooleanVar(value=self.config["decoder"]["color_layers"])
+        ttk.Checkbutton(symbol_frame, text="彩色分层识别", variable=self.color_layers_var).grid(
+            row=3, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 定位图案被涂抹或遮挡时，重绘定位图案、校正图形和静区后再识别
+        self.finder_repair_var = tk.BooleanVar(value=self.config["decoder"]["finder_repair"])
+        ttk.Checkbutton(symbol_frame, text="定位图案修复", variable=self.finder_repair_var).grid(
+            row=4, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 完整解码码字流，报告非标准的填充码字、终止符之后的数据和被改动的纠错码字
+        self.hidden_data_var = tk.BooleanVar(value=self.config["decoder"]["hidden_data"])
+        ttk.Checkbutton(symbol_frame, text="隐藏数据检查", variable=self.hidden_data_var).grid(
+            row=5, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 镜像码、斜拍和剪切变形的二维码：并行尝试一组变换后的图像
+        self.transform_search_var = tk.BooleanVar(value=self.config["decoder"]["transform_search"])
+        ttk.Checkbutton(symbol_frame, text="变换搜索（镜像/旋转/剪切/透视）", variable=self.transform_search_var).grid(
+            row=6, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 失焦和运动模糊：候选区域上做FFT反卷积
+        self.deblur_var = tk.BooleanVar(value=self.config["decoder"]["deblur"])
+        ttk.Checkbutton(symbol_frame, text="去模糊", variable=self.deblur_var).grid(
+            row=7, column=0, sticky="w", padx=5, pady=2)
+        self.deblur_method_var = tk.StringVar(value=self.config["decoder"]["deblur_method"])
+        ttk.Combobox(symbol_frame, textvariable=self.deblur_method_var, values=qr_deblur.METHODS,
+                     state="readonly", width=14).grid(row=7, column=1, columnspan=2, sticky="w", padx=5, pady=2)
+        
+        # 网点印刷、圆点和线条风格的二维码：阈值化后做闭运算、开运算和网点密度重采样
+        self.morphology_var = tk.BooleanVar(value=self.config["decoder"]["morphology"])
+        ttk.Checkbutton(symbol_frame, text="形态学清理（网点/圆点/艺术码）", variable=self.morphology_var).grid(
+            row=8, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 一张图上有大量小二维码的标签页：切成重叠分块并行识别，只对失败的分块增强重试
+        self.sheet_mode_var = tk.BooleanVar(value=self.config["decoder"]["sheet_mode"])
+        ttk.Checkbutton(symbol_frame, text="多码页面（分块并行识别）", variable=self.sheet_mode_var).grid(
+            row=9, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 一份数据拆成多个二维码时，批量扫描后按序号拼接
+        self.sequence_var = tk.BooleanVar(value=self.config["decoder"]["sequence_assembly"])
+        ttk.Checkbutton(symbol_frame, text="分片拼接（结构链接/序号）", variable=self.sequence_var).grid(
+            row=10, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
+        # 扫到的内容是base64、hex或压缩数据时，显示逐层解码的结果
+        self.payload_decoding_var = tk.BooleanVar(value=self.config["decoder"]["payload_decoding"])
+        ttk.Checkbutton(symbol_frame, text="自动解码载荷（base64/hex/压缩等）", variable=self.payload_decoding_var).grid(
+            row=11, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+        
         # 扫描按钮
         button_frame = ttk.Frame(control_frame)
         button_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -337,6 +493,9 @@ class ScanModule:
         self.merge_button = ttk.Button(row1_frame, text="合并图片", command=self.merge_images)
         self.merge_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        self.reassemble_button = ttk.Button(row1_frame, text="碎片重组", command=self.reassemble_images)
+        self.reassemble_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
         self.save_button = ttk.Button(row1_frame, text="保存预览", command=self.save_preview_image)
         self.save_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
@@ -357,9 +516,28 @@ class ScanModule:
         self.enhance_qr_button = ttk.Button(row3_frame, text="增强二维码", command=self.enhance_qr)
         self.enhance_qr_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
-        self.transform_button = ttk.Button(row3_frame, text="变换视角", command=self.transform_perspective)
+        self.transform_button = ttk.Button(row3_frame, text="变换搜索", command=self.transform_perspective)
         self.transform_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        self.deblur_button = ttk.Button(row3_frame, text="去模糊", command=self.deblur_preview)
+        self.deblur_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
+        self.morph_button = ttk.Button(row3_frame, text="形态学清理", command=self.morph_preview)
+        self.morph_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
+        # 第四行按钮 - 模块矩阵分析，用于手工修复损坏的二维码
+        row4_frame = ttk.Frame(tool_buttons_frame)
+        row4_frame.pack(fill=tk.X)
+        
+        self.matrix_button = ttk.Button(row4_frame, text="模块矩阵分析", command=self.analyze_matrix)
+        self.matrix_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
+        self.export_matrix_button = ttk.Button(row4_frame, text="导出矩阵", command=self.export_matrix)
+        self.export_matrix_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
+        self.import_matrix_button = ttk.Button(row4_frame, text="导入矩阵", command=self.import_matrix)
+        self.import_matrix_button.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
         # 右侧结果面板
         result_frame = ttk.LabelFrame(scan_container, text="扫描结果")
         result_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, pady=10)
@@ -481,25 +659,116 @@ class ScanModule:
             
         self.scanning = True
         self.stop_requested = False
-        self.attempted_enhancements = 0
+        self.stop_event.clear()
         self.scan_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
+        self.resume_button.config(state=tk.DISABLED)
         self.result_text.delete(1.0, tk.END)
         self.clear_preview()
+        self.batch_results = scan_engine.ScanResults()
+        self.result_writer = self.open_result_writer()
+        # 本次扫描的码制选择写回配置，保存设置时一并保存
+        self.config["decoder"]["symbols"] = self.selected_symbols()
+        self.config["decoder"]["stop_after_first"] = self.stop_after_first_var.get()
+        self.config["decoder"]["color_layers"] = self.color_layers_var.get()
+        self.config["decoder"]["finder_repair"] = self.finder_repair_var.get()
+        self.config["decoder"]["hidden_data"] = self.hidden_data_var.get()
+        self.config["decoder"]["transform_search"] = self.transform_search_var.get()
+        self.config["decoder"]["sheet_mode"] = self.sheet_mode_var.get()
+        self.config["decoder"]["sequence_assembly"] = self.sequence_var.get()
+        self.config["decoder"]["payload_decoding"] = self.payload_decoding_var.get()
+        self.config["decoder"]["morphology"] = self.morphology_var.get()
+        self.config["decoder"]["deblur"] = self.deblur_var.get()
+        self.config["decoder"]["deblur_method"] = self.deblur_method_var.get()
         
         # 在后台线程中执行扫描
         scan_thread = threading.Thread(target=self._scan_thread, daemon=True)
         scan_thread.start()
     
+    def resume_job(self):
+        """选择未完成的断点任务并继续扫描"""
+        if self.scanning:
+            return
+        
+        jobs_root = self.config["batch_scan"]["jobs_dir"]
+        unfinished = scan_engine.ScanJob.list_jobs(jobs_root)
+        if not unfinished:
+            messagebox.showinfo("提示", "没有未完成的扫描任务")
+            return
+        
+        if len(unfinished) == 1:
+            job = unfinished[0]
+            if not messagebox.askyesno("恢复任务", 
+                                       f"继续任务 {job.info['id']}？\n"
+                                       f"来源: {job.info['source']}\n"
+                                       f"进度: {job.done_count}/{job.total}"):
+                return
+        else:
+            job_dir = filedialog.askdirectory(initialdir=os.path.abspath(jobs_root), 
+                                              title="选择要恢复的任务目录")
+            if not job_dir:
+                return
+            try:
+                job = scan_engine.ScanJob.load(job_dir, readonly=True)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("错误", f"无法读取任务:\n{str(e)}")
+                return
+        
+        # 剩余文件按任务创建时的扫描选项扫描，检查点中的结果才是同一设置下得到的
+        self.resume_changes = self.apply_job_options(job.info.get("options", {}))
+        self.resume_target = job.job_dir
+        self.scan_qr()
+    
+    def open_result_writer(self):
+        """批量/文件夹扫描开启流式导出时，选择导出文件并创建写入器"""
+        if not self.export_var.get():
+            return None
+        if not self.resume_target and self.mode_var.get() not in ("batch", "folder"):
+            return None
+        
+        fmt = self.export_format_var.get()
+        file_path = filedialog.asksaveasfilename(
+            title="导出扫描结果",
+            defaultextension="." + fmt,
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV 文件", "*.csv"), ("所有文件", "*.*")])
+        if not file_path:
+            return None
+        
+        try:
+            return result_export.StreamingResultWriter(
+                file_path, fmt,
+                fsync=self.config["batch_scan"]["export_fsync"],
+                append=bool(self.resume_target))
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"无法创建导出文件:\n{str(e)}")
+            return None
+    
     def _scan_thread(self):
         """后台扫描线程"""
         try:
             mode = self.mode_var.get()
             
-            if mode == "local":
+            if self.resume_target:
+                job_dir, self.resume_target = self.resume_target, None
+                job = scan_engine.ScanJob.load(job_dir)
+                if job.finished:
+                    self.parent.post_ui(lambda: messagebox.showinfo("提示", "该任务已经完成"))
+                    return
+                
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, 
+                                  f"恢复任务 {job.info['id']}: 已完成 {job.done_count}/{job.total}，"
+                                  f"其中失败 {job.failed_count}\n"))
+                if self.resume_changes:
+                    changes, self.resume_changes = "，".join(self.resume_changes), []
+                    self.parent.post_ui(lambda: self.result_text.insert(tk.END, 
+                                      f"已按任务创建时的扫描选项恢复: {changes}\n"))
+                folder_path = job.info["source"] if job.info["mode"] == "folder" else None
+                self._scan_file_list(job.files, folder_path, job)
+            
+            elif mode == "local":
                 file_path = self.file_entry.get()
                 if not file_path:
-                    self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
+                    self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
                     return
                 
                 self.process_image(file_path)
@@ -507,163 +776,345 @@ class ScanModule:
             elif mode == "web":
                 url = self.url_entry.get()
                 if not url:
-                    self.parent.after(0, lambda: messagebox.showwarning("警告", "请输入图片URL"))
+                    self.parent.post_ui(lambda: messagebox.showwarning("警告", "请输入图片URL"))
                     return
                 
                 self.process_web_image(url)
             
             elif mode == "batch":
-                file_paths = self.file_entry.get().split(";")
-                if not any(file_paths):
-                    self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
+                file_paths = [p.strip() for p in self.file_entry.get().split(";") if p.strip()]
+                if not file_paths:
+                    self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择要扫描的图片文件"))
                     return
                 
                 # 应用排序
                 file_paths = self.apply_sorting(file_paths)
-                
-                total = len(file_paths)
-                self.parent.after(0, lambda: self.progress_bar.pack(fill=tk.X))
-                self.progress_var.set(0)
-                
-                for i, file_path in enumerate(file_paths):
-                    if self.stop_requested:
-                        break
-                        
-                    if not file_path.strip():
-                        continue
-                    
-                    # 是否显示详细输出
-                    if self.detailed_output_var.get():
-                        self.parent.after(0, lambda i=i, file_path=file_path: 
-                                         self.result_text.insert(tk.END, 
-                                         f"\n\n--- 文件 {i+1}/{total}: {os.path.basename(file_path)} ---\n"))
-                    
-                    self.process_image(file_path.strip())
-                    
-                    # 更新进度
-                    progress = (i + 1) / total * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda p=progress, i=i, total=total: 
-                                     self.parent.update_status(f"处理中: {i+1}/{total} ({p:.1f}%)"))
-                
-                self.parent.after(0, lambda: self.progress_bar.pack_forget())
+                job = self.create_scan_job("batch", os.path.dirname(file_paths[0]), file_paths)
+                self._scan_file_list(file_paths, None, job)
             
             elif mode == "folder":
                 folder_path = self.file_entry.get()
                 if not folder_path or not os.path.isdir(folder_path):
-                    self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择要扫描的文件夹"))
+                    self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择要扫描的文件夹"))
                     return
                 
                 # 获取所有图片文件
                 image_files = self.get_image_files(folder_path)
                 if not image_files:
-                    self.parent.after(0, lambda: messagebox.showinfo("提示", "该文件夹下未找到图片文件"))
+                    self.parent.post_ui(lambda: messagebox.showinfo("提示", "该文件夹下未找到图片文件"))
                     return
                 
                 # 应用排序
                 image_files = self.apply_sorting(image_files)
-                
-                total = len(image_files)
-                self.parent.after(0, lambda: self.progress_bar.pack(fill=tk.X))
-                self.progress_var.set(0)
-                
-                for i, file_path in enumerate(image_files):
-                    if self.stop_requested:
-                        break
-                        
-                    # 是否显示详细输出
-                    if self.detailed_output_var.get():
-                        self.parent.after(0, lambda i=i, file_path=file_path: 
-                                         self.result_text.insert(tk.END, 
-                                         f"\n\n--- 文件 {i+1}/{total}: {os.path.relpath(file_path, folder_path)} ---\n"))
-                    
-                    self.process_image(file_path)
-                    
-                    # 更新进度
-                    progress = (i + 1) / total * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda p=progress, i=i, total=total: 
-                                     self.parent.update_status(f"处理中: {i+1}/{total} ({p:.1f}%)"))
-                
-                self.parent.after(0, lambda: self.progress_bar.pack_forget())
+                job = self.create_scan_job("folder", folder_path, image_files)
+                self._scan_file_list(image_files, folder_path, job)
         
         except Exception as e:
-            self.parent.after(0, lambda: self.parent.update_status(f"错误: {str(e)}"))
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"扫描过程中发生错误:\n{str(e)}"))
+            self.parent.post_ui(lambda: self.parent.update_status(f"错误: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"扫描过程中发生错误:\n{str(e)}"))
         finally:
+            if self.result_writer:
+                self.result_writer.close()
+                self.result_writer = None
             self.scanning = False
             self.stop_requested = False
-            self.parent.after(0, lambda: self.scan_button.config(state=tk.NORMAL))
-            self.parent.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
-            self.parent.after(0, lambda: self.parent.update_status("扫描完成"))
+            self.parent.post_ui(lambda: self.scan_button.config(state=tk.NORMAL))
+            self.parent.post_ui(lambda: self.stop_button.config(state=tk.DISABLED))
+            self.parent.post_ui(lambda: self.resume_button.config(state=tk.NORMAL))
+            self.parent.post_ui(lambda: self.parent.update_status("扫描完成"))
+    
+    def create_scan_job(self, mode, source, file_list):
+        """启用断点时为本次扫描创建任务清单"""
+        if not self.checkpoint_var.get():
+            return None
+        
+        try:
+            return scan_engine.ScanJob.create(
+                self.config["batch_scan"]["jobs_dir"], mode, source, file_list,
+                sort_order=self.sort_var.get(),
+                options=self.job_options())
+        except OSError as e:
+            # 断点目录不可写时不影响扫描本身
+            self.parent.post_ui(lambda: self.parent.update_status(f"无法创建断点任务: {str(e)}"))
+            return None
     
-    def apply_sorting(self, file_list):
-        """应用排序到文件列表"""
-        sort_order = self.sort_var.get()
+    def _scan_file_list(self, file_paths, folder_path, job=None):
+        """逐个扫描文件列表，有任务清单时跳过已完成的文件并写入检查点"""
+        total = len(file_paths)
+        done = job.done_count if job else 0
+        pending = job.pending() if job else enumerate(file_paths)
+        
+        self.parent.post_ui(lambda: self.progress_bar.pack(fill=tk.X))
+        self.progress_var.set(done / total * 100 if total else 0)
+        decoder = self.get_decoder()
+        decoder.reset_stats()
+        assembler = (qr_sequence.SequenceAssembler(self.config["decoder"]["sequence_file_numbers"])
+                     if self.sequence_var.get() else None)
+        sequence_text = ""
+        guard = self.create_guard()
+        if guard:
+            scanned = self._scan_guarded(guard, pending, folder_path, total)
+        else:
+            scanned = self._scan_in_process(pending, folder_path, total)
         
-        if sort_order == "none":
-            return file_list
+        try:
+            for i, file_path, results, error, elapsed in scanned:
+                if self.stop_requested:
+                    break
+                
+                if job:
+                    job.record(i, file_path, results, error)
+                if self.result_writer:
+                    self.result_writer.write_file(i, file_path, results, error, elapsed)
+                if results:
+                    self.batch_results.add(file_path, results)
+                    # 分片拼接逐个文件增量更新，状态栏显示各序列的进度
+                    if assembler and assembler.add_records(file_path, results):
+                        sequence_text = assembler.progress()
+                
+                # 更新进度
+                done += 1
+                progress = done / total * 100
+                self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                self.parent.post_ui(lambda p=progress, done=done, total=total, extra=sequence_text: 
+                                 self.parent.update_status(f"处理中: {done}/{total} ({p:.1f}%)"
+                                                           + (f"，{extra}" if extra else "")))
+            
+            if job and not self.stop_requested:
+                job.finish()
+            
+            if guard and (guard.timeouts or guard.restarts):
+                self.parent.post_ui(lambda count=guard.timeouts, restarts=guard.restarts: 
+                                 self.result_text.insert(tk.END, f"\n看门狗: {count} 个文件处理超时，重启工作进程 {restarts} 次\n"))
+            
+            unique = len(self.batch_results.deduplicated())
+            self.parent.post_ui(lambda count=len(self.batch_results), unique=unique: 
+                             self.result_text.insert(tk.END, f"\n\n共识别 {count} 个二维码，去重后 {unique} 个\n"))
+            # 多码制扫描时按码制分别统计
+            hidden_count = sum(1 for record in self.batch_results if record.hidden)
+            if hidden_count:
+                self.parent.post_ui(lambda count=hidden_count: 
+                                 self.result_text.insert(tk.END, f"其中 {count} 个二维码发现隐藏数据\n"))
+            symbol_counts = self.batch_results.symbol_counts()
+            if len(decoder.symbols) > 1 or len(symbol_counts) > 1:
+                text = "，".join(f"{name} {symbol_counts.get(name, 0)}"
+                                for name in dict.fromkeys(decoder.symbols + list(symbol_counts)))
+                self.parent.post_ui(lambda text=text: 
+                                 self.result_text.insert(tk.END, f"按码制: {text}\n"))
+            # 各解码后端的调用次数、命中率和平均耗时；工作进程中的解码链各自统计，这里并入
+            if guard:
+                decoder.merge_stats(guard.decoder_stats())
+            decoder_summary = decoder.summary()
+            if decoder_summary:
+                self.parent.post_ui(lambda text=decoder_summary: 
+                                 self.result_text.insert(tk.END, f"解码器统计: {text}\n"))
+            if assembler:
+                self.show_sequences(assembler)
+        finally:
+            if job:
+                job.close()
+            if guard:
+                guard.close()
+            payload_decode.clear_cache()
+            self.parent.post_ui(lambda: self.progress_bar.pack_forget())
+    
+    def show_sequences(self, assembler):
+        """显示分片拼接结果：每个序列的缺失、重复和冲突情况，以及按序号拼出的数据"""
+        for group in assembler.sequences():
+            payload = group.payload()
+            text, encoding = scan_engine.decode_data(payload[:qr_sequence.PREVIEW_LIMIT])
+            if len(payload) > qr_sequence.PREVIEW_LIMIT:
+                text += f"\n…（共 {len(payload)} 字节，只显示前 {qr_sequence.PREVIEW_LIMIT} 字节）"
+            self.parent.post_ui(lambda report=group.report(), text=text, encoding=encoding: 
+                             self.result_text.insert(tk.END, f"\n分片拼接 {report}\n拼接结果 ({encoding}):\n{text}\n"))
+    
+    def show_file_header(self, i, total, file_path, folder_path):
+        """详细输出模式下显示文件标题"""
+        if self.detailed_output_var.get() and not self.export_only():
+            name = os.path.relpath(file_path, folder_path) if folder_path else os.path.basename(file_path)
+            self.parent.post_ui(lambda i=i, name=name: 
+                             self.result_text.insert(tk.END, 
+                             f"\n\n--- 文件 {i+1}/{total}: {name} ---\n"))
+    
+    def _scan_in_process(self, pending, folder_path, total):
+        """在界面进程中逐个扫描，显示预览，后面的文件在后台预读；产生 (序号, 路径, 结果, 错误信息, 耗时)"""
+        for i, file_path, data in read_ahead.prefetch(pending, self.read_ahead_bytes()):
+            if self.stop_requested:
+                return
+            self.show_file_header(i, total, file_path, folder_path)
+            results, error, elapsed = self.process_image(file_path, data)
+            yield i, file_path, results, error, elapsed
+    
+    def _scan_guarded(self, guard, pending, folder_path, total):
+        """
+        在可终止的工作进程中扫描（不显示逐个文件的预览）
+        按代价排队时在滑动窗口内小文件先扫，结果一完成就交给调用方记录和导出；
+        界面显示仍按排序顺序，先完成的结果暂存到前面的文件都显示完为止
+        """
+        if not self.config["batch_scan"]["cost_schedule"]:
+            for result in guard.imap(pending, self.stop_event):
+                self.show_guarded_result(result, total, folder_path)
+                yield result.index, result.path, result.results, result.error, result.elapsed
+            return
+        
+        expected = collections.deque()  # 按排序顺序排列的已提交序号
+        finished = {}  # 序号 -> 已完成但还没轮到显示的结果
+        
+        def track(items):
+            for index, path in items:
+                expected.append(index)
+                yield index, path
         
         try:
-            if sort_order == "numeric":
-                # 自然排序（数字顺序）
-                return natsort.natsorted(file_list, key=lambda x: os.path.basename(x))
-            elif sort_order == "alphabetical":
-                # 字母顺序
-                return sorted(file_list, key=lambda x: os.path.basename(x))
-        except Exception:
-            # 如果排序失败，返回原始列表
-            return file_list
-        
-        return file_list
+            for result in guard.imap(scan_guard.schedule(track(pending)), self.stop_event, ordered=False):
+                finished[result.index] = result
+                while expected and expected[0] in finished:
+                    self.show_guarded_result(finished.pop(expected.popleft()), total, folder_path)
+                yield result.index, result.path, result.results, result.error, result.elapsed
+        finally:
+            # 被停止时显示已完成的结果，跳过没扫完的文件
+            for index in expected:
+                if index in finished:
+                    self.show_guarded_result(finished.pop(index), total, folder_path)
+    
+    def show_guarded_result(self, result, total, folder_path):
+        """显示工作进程返回的一个文件的结果（scan_guard.GuardedResult）"""
+        self.show_file_header(result.index, total, result.path, folder_path)
+        name = os.path.basename(result.path)
+        if result.error is not None:
+            if not self.export_only():
+                self.parent.post_ui(lambda error=result.error: self.result_text.insert(tk.END, f"错误: {error}\n"))
+            self.parent.update_status(f"扫描失败: {name}")
+        elif not self.export_only():
+            self.display_results(result.results, name)
+    
+    def scan_limits(self):
+        """配置中的文件大小和像素数上限"""
+        settings = self.config["batch_scan"]
+        return scan_guard.Limits(int(settings["max_megapixels"] * 1_000_000),
+                                 int(settings["max_file_mb"] * 1024 * 1024))
+    
+    def create_guard(self):
+        """配置了单个文件的处理时间上限时，为批量扫描创建带看门狗的进程池"""
+        settings = self.config["batch_scan"]
+        if not settings["file_timeout"]:
+            return None
+        if self.color_layers_var.get():
+            # 彩色分层识别只在界面进程中实现
+            self.parent.update_status("彩色分层识别不支持工作进程，本次在界面进程中扫描（无超时保护）")
+            return None
+        
+        decoder_settings = self.config["decoder"]
+        decoder_options = {
+            "names": decoder_settings["backends"],
+            "strategy": decoder_settings["strategy"],
+            "symbols": self.selected_symbols(),
+            "stop_symbols": decoder_settings["stop_symbols"],
+            "stop_after_first": self.stop_after_first_var.get(),
+        }
+        log = lambda message: self.parent.post_ui(
+            lambda: self.result_text.insert(tk.END, f"\n[看门狗] {message}\n"))
+        return scan_guard.GuardedPool(settings["scan_workers"] or None, settings["file_timeout"],
+                                      self.scan_options(), decoder_options, self.scan_limits(), log=log,
+                                      read_ahead=self.read_ahead_bytes())
+    
+    def option_vars(self):
+        """scan_options 中各选项对应的界面变量"""
+        return {
+            "enhance_level": self.enhance_var,
+            "repair": self.finder_repair_var,
+            "hidden": self.hidden_data_var,
+            "transforms": self.transform_search_var,
+            "deblur": self.deblur_var,
+            "morph": self.morphology_var,
+            "sheet": self.sheet_mode_var,
+            "sequence": self.sequence_var,
+            "deblur_method": self.deblur_method_var,
+        }
+    
+    def scan_options(self):
+        """扫描选项对应的 scan_engine.scan_loaded / scan_file 关键字参数（不含解码链）"""
+        return {key: var.get() for key, var in self.option_vars().items()}
+    
+    def job_options(self):
+        """写入断点任务的扫描选项（与 scan_engine 命令行创建的任务使用相同的键）"""
+        options = self.scan_options()
+        options["symbols"] = self.selected_symbols()
+        options["stop_after_first"] = self.stop_after_first_var.get()
+        options["color_layers"] = self.color_layers_var.get()
+        return options
+    
+    def apply_job_options(self, options):
+        """把界面的扫描选项改回任务中保存的设置，返回改动过的选项说明；任务中没有保存的选项保持不变"""
+        variables = self.option_vars()
+        variables["stop_after_first"] = self.stop_after_first_var
+        variables["color_layers"] = self.color_layers_var
+        changes = []
+        for key, value in options.items():
+            if key == "symbols":
+                if set(value) != set(self.selected_symbols()):
+                    for name, var in self.symbol_vars.items():
+                        var.set(name in value)
+                    changes.append(f"码制={'/'.join(value)}")
+            elif key in variables and variables[key].get() != value:
+                variables[key].set(value)
+                changes.append(f"{key}={value}")
+        return changes
+    
+    def read_ahead_bytes(self):
+        """配置中的预读缓存上限（字节）"""
+        return int(self.config["batch_scan"]["read_ahead_mb"] * 1024 * 1024)
+    
+    def apply_sorting(self, file_list):
+        """应用排序到文件列表"""
+        return scan_engine.sort_files(file_list, self.sort_var.get())
+    
+    def export_only(self):
+        """结果只写入导出文件，界面不保留"""
+        return self.result_writer is not None and self.export_only_var.get()
     
     def stop_scan(self):
         """停止扫描"""
         self.stop_requested = True
+        self.stop_event.set()
         self.parent.update_status("正在停止...")
     
     def get_image_files(self, folder_path):
         """递归获取文件夹中的所有图片文件"""
-        image_extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif']
-        image_files = []
-        
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in image_extensions):
-                    image_files.append(os.path.join(root, file))
-        
-        return image_files
+        return scan_engine.get_image_files(folder_path)
     
-    def process_image(self, file_path):
-        """处理本地图片文件"""
+    def process_image(self, file_path, data=None):
+        """处理本地图片文件，返回 (结果列表, 错误信息, 解码耗时秒)；data 为已预读的文件内容"""
+        started = time.perf_counter()
         try:
             # 保存当前图片路径
             self.current_image_path = file_path
             self.current_image_url = None
             
+            # 先只读文件头检查大小，过大的图片不做完整解码
+            source = read_ahead.open_source(file_path, data)
+            scan_guard.check_image(source, self.scan_limits())
+            
             # 打开并显示图片
-            img = Image.open(file_path)
+            img = Image.open(source)
             self.show_preview(img)
             
             # 处理并扫描二维码
-            processed_img = self.preprocess_image(img)
-            results = self.scan_image(processed_img)
-            
-            # 如果没找到二维码且增强模式不是关闭，尝试更高级的识别方法
-            enhance_level = self.enhance_var.get()
-            if not results and enhance_level != "off" and self.attempted_enhancements < 3:
-                self.attempted_enhancements += 1
-                processed_img = self.enhance_qr_image(processed_img, level=enhance_level)
-                results = self.scan_image(processed_img)
-                self.parent.update_status(f"增强处理级别 {self.attempted_enhancements} 应用于: {os.path.basename(file_path)}")
+            decode_started = time.perf_counter()
+            results, layer_tags = self.scan_loaded_image(img, os.path.basename(file_path))
+            elapsed = time.perf_counter() - decode_started
             
             # 显示结果
-            self.display_results(results, os.path.basename(file_path))
+            if not self.export_only():
+                self.display_results(results, os.path.basename(file_path), layer_tags)
             self.parent.update_status(f"扫描完成: {os.path.basename(file_path)}")
+            return results, None, elapsed
         
         except Exception as e:
-            self.parent.after(0, lambda: self.result_text.insert(tk.END, f"错误: {str(e)}\n"))
+            if not self.export_only():
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, f"错误: {str(e)}\n"))
             self.parent.update_status(f"扫描失败: {os.path.basename(file_path)}")
+            return None, str(e), time.perf_counter() - started
     
     def process_web_image(self, url):
         """处理网络图片"""
@@ -677,142 +1128,126 @@ class ScanModule:
             response.raise_for_status()
             
             # 打开并显示图片
-            img = Image.open(BytesIO(response.content))
+            data = BytesIO(response.content)
+            scan_guard.check_image(data, self.scan_limits())
+            img = Image.open(data)
             self.show_preview(img)
             
             # 处理并扫描二维码
-            processed_img = self.preprocess_image(img)
-            results = self.scan_image(processed_img)
+            results, layer_tags = self.scan_loaded_image(img, url)
             
             # 显示结果
-            self.display_results(results, url)
+            self.display_results(results, url, layer_tags)
             self.parent.update_status(f"扫描完成: {url}")
         
         except Exception as e:
-            self.parent.after(0, lambda: self.result_text.insert(tk.END, f"错误: {str(e)}\n"))
+            self.parent.post_ui(lambda: self.result_text.insert(tk.END, f"错误: {str(e)}\n"))
             self.parent.update_status(f"扫描失败: {url}")
     
     def preprocess_image(self, img):
         """图像预处理以提高识别率"""
-        # 转换为灰度图
-        img = img.convert("L") if img else None
-        
-        # 增强对比度
-        if img:
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(2.0)
-            
-            # 增强锐度
-            enhancer = ImageEnhance.Sharpness(img)
-            img = enhancer.enhance(2.0)
-            
-            # 调整大小（如果太小）
-            if img.width < 300 or img.height < 300:
-                img = img.resize((img.width * 2, img.height * 2), Image.LANCZOS)
-        
-        return img
+        return scan_engine.preprocess_image(img)
     
     def enhance_qr_image(self, img, level="auto"):
         """增强二维码图像以提高识别率"""
-        if not img:
-            return None
-            
-        # 设置增强级别
-        if level == "auto":
-            contrast_level = 2.5
-            sharpness_level = 2.5
-        elif level == "medium":
-            contrast_level = 3.0
-            sharpness_level = 3.0
-        else:  # strong
-            contrast_level = 4.0
-            sharpness_level = 4.0
-        
-        # 应用自适应阈值
-        img = ImageOps.autocontrast(img)
-        
-        # 增强对比度
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(contrast_level)
-        
-        # 增强锐度
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(sharpness_level)
-        
-        # 尝试不同阈值方法
-        img = img.point(lambda p: p > 128 and 255)
-        
-        return img
+        return scan_engine.enhance_qr_image(img, level)
+    
+    def selected_symbols(self):
+        """扫描选项中勾选的码制，按配置中的优先级排列"""
+        order = dict.fromkeys(list(self.config["decoder"]["symbols"]) + list(decoders.SYMBOLOGIES))
+        selected = [name for name in order if name in self.symbol_vars and self.symbol_vars[name].get()]
+        return selected or ["QRCODE"]
+    
+    def get_decoder(self):
+        """返回当前解码设置和码制选择对应的解码链，设置变化时重新创建"""
+        settings = self.config["decoder"]
+        symbols = self.selected_symbols()
+        stop_after_first = self.stop_after_first_var.get()
+        key = (tuple(settings["backends"]), settings["strategy"], tuple(symbols),
+               tuple(settings["stop_symbols"]), stop_after_first)
+        if key != self.decoder_key:
+            if self.decoder:
+                self.decoder.close()
+            self.decoder = decoders.create_chain(settings["backends"], settings["strategy"], symbols,
+                                                 stop_symbols=settings["stop_symbols"],
+                                                 stop_after_first=stop_after_first)
+            self.decoder_key = key
+            if self.decoder.unsupported:
+                names = "、".join(self.decoder.unsupported)
+                self.parent.post_ui(lambda names=names: 
+                                 self.result_text.insert(tk.END, f"没有可识别 {names} 的解码后端（DataMatrix、Aztec需要Java以使用ZXing）\n"))
+        return self.decoder
     
     def scan_image(self, img):
-        """扫描图像中的二维码"""
-        if not img:
-            return []
-            
-        # 将PIL图像转换为numpy数组供pyzbar使用
-        img_array = np.array(img)
-        
-        # 尝试扫描二维码
-        decoded_objs = pyzbar.decode(img_array, symbols=[pyzbar.ZBarSymbol.QRCODE])
-        
-        # 如果未找到二维码，尝试使用更激进的阈值
-        if not decoded_objs:
-            # 应用Otsu's 二值化
-            img = img.convert('L')
-            img_array = np.array(img)
-            thresh = np.percentile(img_array, 35)  # 使用较低的阈值
-            img_array = np.where(img_array > thresh, 255, 0).astype(np.uint8)
-            decoded_objs = pyzbar.decode(img_array, symbols=[pyzbar.ZBarSymbol.QRCODE])
-        
-        # 如果还没找到，尝试反转图像
-        if not decoded_objs:
-            img = ImageOps.invert(img.convert('RGB'))
-            img_array = np.array(img)
-            decoded_objs = pyzbar.decode(img_array, symbols=[pyzbar.ZBarSymbol.QRCODE])
-        
-        return decoded_objs
-    
-    def display_results(self, results, source):
-        """显示扫描结果"""
+        """扫描图像中的二维码，返回紧凑结果记录"""
+        return scan_engine.to_records(scan_engine.scan_image(img, self.get_decoder()))
+    
+    def scan_loaded_image(self, img, source):
+        """
+        按扫描选项识别已打开的图片（本地和网络图片共用 scan_engine 的识别流程），
+        返回 (结果记录列表, 彩色分层识别时每个结果所在的图层标签或None)，补救手段命中时在状态栏显示
+        """
+        if self.color_layers_var.get() and img.mode not in color_scan.GRAYSCALE_MODES:
+            return self.scan_color_layers(img)
+        report = lambda message: self.parent.update_status(f"{message} ({source})")
+        return scan_engine.scan_loaded(img, decoder=self.get_decoder(), report=report, **self.scan_options()), None
+    
+    def scan_color_layers(self, img):
+        """彩色分层并行识别，返回 (结果记录列表, 每个结果所在的图层标签列表)"""
+        layered = color_scan.scan_color_layers(img, self.get_decoder(),
+                                               clusters=self.config["decoder"]["color_clusters"])
+        return [record for record, _ in layered], [tags for _, tags in layered]
+    
+    def display_results(self, results, source, layer_tags=None):
+        """显示扫描结果，layer_tags 为彩色分层识别时每个结果所在的图层"""
         if not results:
-            self.parent.after(0, lambda: self.result_text.insert(tk.END, f"未在 {source} 中找到二维码\n"))
+            self.parent.post_ui(lambda: self.result_text.insert(tk.END, f"未在 {source} 中找到二维码\n"))
             return
         
         # 只有在详细输出模式下才显示标题
         if self.detailed_output_var.get():
-            self.parent.after(0, lambda: self.result_text.insert(tk.END, f"在 {source} 中找到 {len(results)} 个二维码:\n"))
+            self.parent.post_ui(lambda: self.result_text.insert(tk.END, f"在 {source} 中找到 {len(results)} 个二维码:\n"))
         
-        for i, obj in enumerate(results):
-            try:
-                data = obj.data.decode('utf-8')
-            except:
-                try:
-                    data = obj.data.decode('latin-1')
-                except:
-                    data = str(obj.data)
+        for i, record in enumerate(results):
+            # 闭包里只保留字符串，不持有结果对象
+            data = record.text
             
             # 只有在详细输出模式下才显示二维码索引
             if self.detailed_output_var.get():
-                self.parent.after(0, lambda i=i, obj=obj, data=data: 
+                self.parent.post_ui(lambda i=i: 
                                  self.result_text.insert(tk.END, f"\n二维码 {i+1}:\n"))
-                self.parent.after(0, lambda obj=obj: 
-                                 self.result_text.insert(tk.END, f"类型: {obj.type}\n"))
-                self.parent.after(0, lambda: self.result_text.insert(tk.END, "内容:\n"))
+                self.parent.post_ui(lambda symbol_type=record.type: 
+                                 self.result_text.insert(tk.END, f"类型: {symbol_type}\n"))
+                if layer_tags:
+                    self.parent.post_ui(lambda tags="、".join(layer_tags[i]): 
+                                     self.result_text.insert(tk.END, f"图层: {tags}\n"))
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, "内容:\n"))
             
             # 检查内容是否为URL
             if data.startswith(('http://', 'https://')):
-                self.parent.after(0, lambda data=data: 
+                self.parent.post_ui(lambda data=data: 
                                  self.result_text.insert(tk.END, data, "hyperlink"))
             else:
-                self.parent.after(0, lambda data=data: self.result_text.insert(tk.END, data))
+                self.parent.post_ui(lambda data=data: self.result_text.insert(tk.END, data))
+            
+            for kind, detail, raw in record.hidden:
+                text = f"\n[隐藏数据-{kind}] {detail}"
+                if raw:
+                    text += f"\n  十六进制: {raw.hex(' ')}\n  文本: {scan_engine.decode_data(raw)[0]!r}"
+                self.parent.post_ui(lambda text=text: self.result_text.insert(tk.END, text))
+            
+            if self.payload_decoding_var.get():
+                for form in payload_decode.decode_payload(record.data):
+                    self.parent.post_ui(lambda text=payload_decode.describe(form): 
+                                     self.result_text.insert(tk.END, f"\n[解码] {text}"))
             
             # 添加分隔符
             if self.detailed_output_var.get():
-                self.parent.after(0, lambda: self.result_text.insert(tk.END, "\n" + "-" * 50 + "\n"))
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, "\n" + "-" * 50 + "\n"))
             else:
                 # 在简洁模式下，使用配置的分隔符
                 separator = self.config["batch_scan"]["separator"]
-                self.parent.after(0, lambda: self.result_text.insert(tk.END, separator))
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, separator))
     
     def show_preview(self, img):
         """显示图片预览，仅扫描模块使用此方法，分析模块应使用原始图片预览"""
@@ -829,7 +1264,7 @@ class ScanModule:
         
         # 转换为PhotoImage
         self.preview_img_tk = ImageTk.PhotoImage(preview_img)
-        self.parent.after(0, lambda: self.preview_label.config(image=self.preview_img_tk))
+        self.parent.post_ui(lambda: self.preview_label.config(image=self.preview_img_tk))
 
     def clear_preview(self):
         """清除图片预览"""
@@ -844,7 +1279,7 @@ class ScanModule:
     def save_preview_image(self):
         """保存当前预览的图片"""
         if not self.current_preview_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可保存的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可保存的预览图片"))
             return
         
         # 弹出文件保存对话框
@@ -871,9 +1306,9 @@ class ScanModule:
             # 保存图片
             self.current_preview_image.save(file_path, format=format)
             self.parent.update_status(f"图片已保存到: {file_path}")
-            self.parent.after(0, lambda: messagebox.showinfo("成功", f"图片已成功保存到:\n{file_path}"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", f"图片已成功保存到:\n{file_path}"))
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存图片时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存图片时出错:\n{str(e)}"))
     
     def merge_images(self):
         """合并多张图片为一张大图"""
@@ -890,7 +1325,7 @@ class ScanModule:
             "请输入每行显示的图片数量:", 
             parent=self.parent,
             minvalue=1,
-            maxvalue=10
+            maxvalue=100
         )
         
         if cols is None:  # 用户取消了输入
@@ -946,75 +1381,86 @@ class ScanModule:
         )
         
         try:
-            # 加载所有图片
-            images = []
-            max_width, max_height = 0, 0
-            for path in file_paths:
-                img = Image.open(path)
-                images.append(img)
-                max_width = max(max_width, img.width)
-                max_height = max(max_height, img.height)
-            
-            # 计算网格尺寸
-            rows = math.ceil(len(images) / cols)
-            
-            # 在智能模式下，计算目标尺寸
-            if use_smart_mode:
-                # 计算平均尺寸作为目标尺寸
-                total_width = sum(img.width for img in images)
-                total_height = sum(img.height for img in images)
-                avg_width = total_width // len(images)
-                avg_height = total_height // len(images)
+            # 只读文件头计算布局，图片在拼接时逐行载入
+            layout = image_merge.grid_layout(image_merge.read_sizes(file_paths), cols, spacing, use_smart_mode)
+            width, height = layout.size
+            
+            if width * height <= image_merge.MAX_MEMORY_PIXELS:
+                merged_img = image_merge.merge_in_memory(file_paths, layout, bg_color)
                 
-                # 使用最大尺寸或平均尺寸中较小的一个，防止图片过大
-                target_width = min(max_width, avg_width)
-                target_height = min(max_height, avg_height)
+                # 显示合并后的图片
+                self.show_preview(merged_img)
+                self.parent.update_status(f"成功合并 {len(file_paths)} 张图片")
                 
-                # 创建缩放后的图片列表
-                scaled_images = []
-                for img in images:
-                    # 保持宽高比缩放
-                    ratio = min(target_width / img.width, target_height / img.height)
-                    new_width = int(img.width * ratio)
-                    new_height = int(img.height * ratio)
+                # 询问用户是否保存
+                if messagebox.askyesno("保存图片", "是否保存合并后的图片？"):
+                    # 弹出文件保存对话框
+                    file_path = filedialog.asksaveasfilename(
+                        defaultextension=".png",
+                        filetypes=[("PNG 文件", "*.png"), 
+                                   ("JPEG 文件", "*.jpg;*.jpeg"),
+                                   ("所有文件", "*.*")])
                     
-                    # 高质量缩放
-                    scaled_img = img.resize((new_width, new_height), Image.LANCZOS)
-                    scaled_images.append(scaled_img)
-                
-                # 更新图片列表为缩放后的图片
-                images = scaled_images
-                
-                # 更新最大尺寸为缩放后的尺寸
-                max_width = max(img.width for img in images)
-                max_height = max(img.height for img in images)
+                    if file_path:
+                        merged_img.save(file_path)
+                        self.parent.update_status(f"合并图片已保存到: {file_path}")
+                        self.parent.post_ui(lambda: messagebox.showinfo("成功", f"图片已成功保存到:\n{file_path}"))
+                return
             
-            # 计算大图尺寸
-            total_width = cols * max_width + (cols - 1) * spacing
-            total_height = rows * max_height + (rows - 1) * spacing
+            # 整图太大，逐行直接写入文件，只显示缩小的预览
+            messagebox.showinfo("图片合并", f"合并结果为 {width}×{height} 像素，将逐行直接写入PNG或TIFF文件")
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".png",
+                filetypes=[("PNG 文件", "*.png"), 
+                           ("TIFF 文件", "*.tif;*.tiff")])
+            if not file_path:
+                return
             
-            # 创建新图片
-            merged_img = Image.new('RGB', (total_width, total_height), bg_color)
+            def progress(done, total):
+                self.parent.update_status(f"正在合并图片: 第 {done}/{total} 行")
             
-            # 粘贴图片
-            for i, img in enumerate(images):
-                row = i // cols
-                col = i % cols
-                
-                # 计算位置（左上角对齐）
-                x = col * (max_width + spacing)
-                y = row * (max_height + spacing)
-                
-                # 直接粘贴图片
-                merged_img.paste(img, (x, y))
+            def merge_thread():
+                try:
+                    preview = image_merge.merge_to_file(file_paths, file_path, layout, bg_color, progress=progress)
+                    self.parent.post_ui(lambda: self.show_preview(preview))
+                    self.parent.update_status(f"成功合并 {len(file_paths)} 张图片，已保存到: {file_path}")
+                except Exception as e:
+                    message = str(e)
+                    self.parent.post_ui(lambda: messagebox.showerror("错误", f"合并图片时出错:\n{message}"))
+            
+            threading.Thread(target=merge_thread, daemon=True).start()
+            
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"合并图片时出错:\n{str(e)}"))
+    
+    def reassemble_images(self):
+        """把被切开、打乱顺序的二维码碎片自动拼回原样并识别"""
+        file_paths = filedialog.askopenfilenames(
+            filetypes=[("图片文件", "*.png;*.jpg;*.jpeg;*.bmp;*.tiff;*.gif")])
+        
+        if not file_paths:
+            return
+        
+        try:
+            pieces = [Image.open(path) for path in file_paths]
+            grays, shapes = qr_reassemble.normalize_pieces(pieces)
+            self.parent.update_status(f"正在重组 {len(pieces)} 块碎片...")
+            results, layout = scan_engine.reassemble(pieces, self.get_decoder())
+            if not layout:
+                # 没有识别成功时显示边缘代价最低的排列，方便手动调整
+                layouts = qr_reassemble.candidate_layouts(grays, shapes, max_layouts=1)
+                if layouts:
+                    self.show_preview(qr_reassemble.render_layout(grays, layouts[0]))
+                self.parent.update_status("碎片重组后未识别到二维码" + (f"，已显示 {layouts[0].label} 的拼接结果" if layouts else ""))
+                return
             
-            # 显示合并后的图片
-            self.show_preview(merged_img)
-            self.parent.update_status(f"成功合并 {len(images)} 张图片")
+            reassembled = qr_reassemble.render_layout(grays, layout)
+            self.show_preview(reassembled)
+            self.parent.update_status(f"碎片重组命中: {layout.label}")
+            self.result_text.delete(1.0, tk.END)
+            self.display_results(scan_engine.to_records(results), f"碎片重组 {len(pieces)} 块 ({layout.label})")
             
-            # 询问用户是否保存
-            if messagebox.askyesno("保存图片", "是否保存合并后的图片？"):
-                # 弹出文件保存对话框
+            if messagebox.askyesno("保存图片", "是否保存重组后的图片？"):
                 file_path = filedialog.asksaveasfilename(
                     defaultextension=".png",
                     filetypes=[("PNG 文件", "*.png"), 
@@ -1022,17 +1468,17 @@ class ScanModule:
                                ("所有文件", "*.*")])
                 
                 if file_path:
-                    merged_img.save(file_path)
-                    self.parent.update_status(f"合并图片已保存到: {file_path}")
-                    self.parent.after(0, lambda: messagebox.showinfo("成功", f"图片已成功保存到:\n{file_path}"))
-            
+                    reassembled.save(file_path)
+                    self.parent.update_status(f"重组图片已保存到: {file_path}")
+        except ValueError as e:
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", str(e)))
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"合并图片时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"碎片重组时出错:\n{str(e)}"))
     
     def invert_image(self):
         """对当前预览图像进行反色处理"""
         if not self.current_preview_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
             return
         
         try:
@@ -1059,12 +1505,12 @@ class ScanModule:
                 self.result_text.delete(1.0, tk.END)
                 self.display_results(results, source)
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"反色处理时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"反色处理时出错:\n{str(e)}"))
     
     def reset_image(self):
         """重置图片到原始状态"""
         if self.current_image_path is None and self.current_image_url is None:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有原始图片可重置"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有原始图片可重置"))
             return
         
         try:
@@ -1083,12 +1529,12 @@ class ScanModule:
                 self.show_preview(img)
                 self.parent.update_status("已重置到原始图片")
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"重置图片时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"重置图片时出错:\n{str(e)}"))
     
     def enhance_qr(self):
         """增强二维码识别"""
         if not self.current_preview_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
             return
         
         try:
@@ -1118,39 +1564,168 @@ class ScanModule:
                 self.result_text.delete(1.0, tk.END)
                 self.display_results(results, source)
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"二维码增强时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"二维码增强时出错:\n{str(e)}"))
+    
+    def deblur_preview(self):
+        """对预览图做去模糊（维纳或Richardson–Lucy反卷积），显示识别成功的复原图，否则显示得分最高的复原图"""
+        if not self.current_preview_image:
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            return
+        
+        try:
+            method = self.deblur_method_var.get()
+            results, candidate = scan_engine.scan_deblurred(self.current_preview_image, self.get_decoder(), method)
+            if not candidate:
+                # 没有识别成功时也给出最清晰的复原结果，方便继续手工处理
+                best = qr_deblur.deblur_candidates(self.current_preview_image.convert("L"), method, top=1)
+                if best:
+                    self.show_preview(best[0].image)
+                self.parent.update_status("去模糊后仍未识别到二维码" + (f"，已显示 {best[0].label} 的复原结果" if best else ""))
+                return
+            
+            self.show_preview(candidate.image)
+            self.parent.update_status(f"去模糊命中: {candidate.label}")
+            
+            source = "去模糊图片"
+            if self.current_image_path:
+                source = os.path.basename(self.current_image_path)
+            elif self.current_image_url:
+                source = self.current_image_url
+            self.result_text.delete(1.0, tk.END)
+            self.display_results(scan_engine.to_records(results), f"{source} ({candidate.label})")
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"去模糊时出错:\n{str(e)}"))
+    
+    def morph_preview(self):
+        """对预览图做形态学清理，显示识别成功的清理结果，否则显示中档结构元素的闭运算结果"""
+        if not self.current_preview_image:
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            return
+        
+        try:
+            processed_img = self.preprocess_image(self.current_preview_image)
+            results, candidate = scan_engine.scan_morphology(processed_img, self.get_decoder())
+            dark = qr_morph.binarize(processed_img)
+            if not candidate:
+                candidates = qr_morph.morph_candidates(dark)
+                if candidates:
+                    middle = candidates[len(qr_morph.structuring_sizes(dark)) // 2]
+                    self.show_preview(qr_morph.apply_morph(dark, middle))
+                self.parent.update_status("形态学清理后仍未识别到二维码" + (f"，已显示 {middle.label} 的结果" if candidates else ""))
+                return
+            
+            self.show_preview(qr_morph.apply_morph(dark, candidate))
+            self.parent.update_status(f"形态学清理命中: {candidate.label}")
+            
+            source = "形态学清理图片"
+            if self.current_image_path:
+                source = os.path.basename(self.current_image_path)
+            elif self.current_image_url:
+                source = self.current_image_url
+            self.result_text.delete(1.0, tk.END)
+            self.display_results(scan_engine.to_records(results), f"{source} ({candidate.label})")
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"形态学清理时出错:\n{str(e)}"))
     
     def transform_perspective(self):
-        """变换图像视角"""
+        """对预览图做变换搜索（镜像、透视校正、剪切、旋转），显示命中的变换后图像并重新扫描"""
         if not self.current_preview_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
             return
         
         try:
-            # 创建一个简单的视角变换
-            width, height = self.current_preview_image.size
-            
-            # 定义变换矩阵 - 简单的倾斜变换
-            transform_amount = 0.2
-            transform_matrix = [
-                1, transform_amount, 0,
-                transform_amount, 1, 0,
-                0, 0
-            ]
-            
-            # 应用透视变换
-            transformed_img = self.current_preview_image.transform(
-                (width, height),
-                Image.PERSPECTIVE,
-                transform_matrix,
-                Image.BICUBIC
-            )
+            processed_img = self.preprocess_image(self.current_preview_image)
+            results, warp = scan_engine.scan_transformed(processed_img, self.get_decoder())
+            if not warp:
+                self.parent.update_status("变换搜索未识别到二维码")
+                self.parent.post_ui(lambda: messagebox.showinfo("提示", "所有候选变换都未识别到二维码"))
+                return
             
-            # 显示处理后的图像
-            self.show_preview(transformed_img)
-            self.parent.update_status("视角变换完成")
+            # 预览换成命中的变换后图像
+            self.show_preview(qr_transform.apply_warp(processed_img, warp))
+            self.parent.update_status(f"变换搜索命中: {warp.label}")
+            
+            source = "变换后图片"
+            if self.current_image_path:
+                source = os.path.basename(self.current_image_path)
+            elif self.current_image_url:
+                source = self.current_image_url
+            self.result_text.delete(1.0, tk.END)
+            self.display_results(scan_engine.to_records(results), f"{source} ({warp.label})")
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"变换搜索时出错:\n{str(e)}"))
+    
+    def analyze_matrix(self):
+        """提取当前预览图中二维码的模块矩阵，显示版本、纠错等级、掩码和格式信息"""
+        if not self.current_preview_image:
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            return
+        
+        try:
+            self.module_matrices = qr_matrix.analyze_image(self.current_preview_image, self.get_decoder())
+            if not self.module_matrices:
+                self.result_text.insert(tk.END, "模块矩阵分析: 未找到二维码\n")
+                return
+            for i, matrix in enumerate(self.module_matrices, 1):
+                self.show_matrix(i, matrix)
+            self.result_text.see(tk.END)
+            # 预览换成重新渲染的标准图像
+            self.show_preview(self.module_matrices[0].to_image())
+            self.parent.update_status(f"模块矩阵分析完成，共 {len(self.module_matrices)} 个符号")
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"模块矩阵分析时出错:\n{str(e)}"))
+    
+    def show_matrix(self, index, matrix):
+        """显示模块矩阵的分析结果和纯Python解码结果"""
+        self.result_text.insert(tk.END, f"===== 模块矩阵 {index} =====\n{matrix.report()}\n")
+        decoded = qr_decode.decode_matrix(matrix)
+        if decoded:
+            text, encoding = scan_engine.decode_data(decoded.data)
+            self.result_text.insert(tk.END, f"{decoded.report()}\n内容 ({encoding}): {text}\n")
+        else:
+            self.result_text.insert(tk.END, "纯Python解码失败：错误超过纠错能力，可导出位串把损坏的模块改为 ? 后再导入\n")
+        self.result_text.insert(tk.END, matrix.to_text(dark="█", light="·") + "\n\n")
+    
+    def import_matrix(self):
+        """导入（手工修改过的）矩阵文件并解码，位串中的 ? 作为纠删位置"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("01位串", "*.bits"),
+                       ("字符画文本", "*.txt"),
+                       ("所有文件", "*.*")])
+        if not file_path:
+            return
+        
+        try:
+            matrix = qr_matrix.ModuleMatrix.load(file_path)
+            self.module_matrices = [matrix]
+            self.show_matrix(1, matrix)
+            self.result_text.see(tk.END)
+            self.show_preview(matrix.to_image())
+            self.parent.update_status(f"已导入模块矩阵: {os.path.basename(file_path)}")
+        except Exception as e:
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"导入模块矩阵时出错:\n{str(e)}"))
+    
+    def export_matrix(self):
+        """导出最近一次分析的模块矩阵：PNG为重新渲染的图像，txt为字符画，bits为01位串"""
+        if not self.module_matrices:
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "请先进行模块矩阵分析"))
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".png",
+            filetypes=[("PNG 文件", "*.png"),
+                       ("字符画文本", "*.txt"),
+                       ("01位串", "*.bits")])
+        if not file_path:
+            return
+        
+        try:
+            root, ext = os.path.splitext(file_path)
+            for i, matrix in enumerate(self.module_matrices, 1):
+                matrix.save(file_path if i == 1 else f"{root}_{i}{ext}")
+            self.parent.update_status(f"模块矩阵已导出到: {file_path}")
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"变换视角时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"导出模块矩阵时出错:\n{str(e)}"))
     
     def open_hyperlink(self, event):
         """打开超链接"""
@@ -1410,7 +1985,7 @@ class AnalysisModule:
         content = self.analysis_text.get(1.0, tk.END)
         
         if not content.strip():
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "结果区域为空"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "结果区域为空"))
             return
             
         file_path = filedialog.asksaveasfilename(
@@ -1423,9 +1998,9 @@ class AnalysisModule:
         try:
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(content)
-            self.parent.after(0, lambda: messagebox.showinfo("成功", f"结果已保存到:\n{file_path}"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", f"结果已保存到:\n{file_path}"))
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存结果时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存结果时出错:\n{str(e)}"))
     
     def browse_files(self):
         """打开文件对话框选择文件"""
@@ -1451,7 +2026,7 @@ class AnalysisModule:
         url = self.analysis_url_entry.get()
         
         if not file_path and not url:
-            self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择图片文件或输入图片URL"))
+            self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择图片文件或输入图片URL"))
             return
         
         try:
@@ -1480,7 +2055,7 @@ class AnalysisModule:
             
         except Exception as e:
             self.parent.update_status(f"加载图片失败: {str(e)}")
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"加载图片时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"加载图片时出错:\n{str(e)}"))
             self.analysis_image = None
             self.original_analysis_image = None
             self.clear_preview()
@@ -1497,7 +2072,7 @@ class AnalysisModule:
         
         # 转换为PhotoImage
         self.preview_img_tk = ImageTk.PhotoImage(preview_img)
-        self.parent.after(0, lambda: self.preview_label.config(image=self.preview_img_tk))
+        self.parent.post_ui(lambda: self.preview_label.config(image=self.preview_img_tk))
     
     def clear_preview(self):
         """清除分析模块的图片预览"""
@@ -1507,7 +2082,7 @@ class AnalysisModule:
     def invert_image(self):
         """对当前预览图像进行反色处理"""
         if not self.analysis_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可处理的预览图片"))
             return
         
         try:
@@ -1519,12 +2094,12 @@ class AnalysisModule:
             self.analysis_image = inverted_img
             self.parent.update_status("图片已反色处理")
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"反色处理时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"反色处理时出错:\n{str(e)}"))
     
     def reset_image(self):
         """重置图片到原始状态"""
         if not self.original_analysis_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有原始图片可重置"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有原始图片可重置"))
             return
         
         try:
@@ -1535,7 +2110,7 @@ class AnalysisModule:
             self.show_preview(self.original_analysis_image)
             self.parent.update_status("已重置到原始图片")
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"重置图片时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"重置图片时出错:\n{str(e)}"))
     
     def show_image_info(self):
         """显示当前图片的详细信息"""
@@ -1543,7 +2118,7 @@ class AnalysisModule:
             self.analysis_text.delete(1.0, tk.END)
             
             if not self.analysis_image:
-                self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可分析的图片"))
+                self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可分析的图片"))
                 return
                 
             # 1. 基本图片信息
@@ -1669,7 +2244,7 @@ class AnalysisModule:
             self.parent.update_status("图片信息分析完成")
         
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"获取图片信息时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"获取图片信息时出错:\n{str(e)}"))
     
     def calculate_entropy(self, data):
         """计算数据的熵"""
@@ -1699,7 +2274,7 @@ class AnalysisModule:
     def show_lsb(self):
         """显示LSB平面"""
         if not self.analysis_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可分析的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可分析的预览图片"))
             return
         
         try:
@@ -1724,12 +2299,12 @@ class AnalysisModule:
             self.parent.update_status("LSB平面显示")
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"显示LSB平面时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"显示LSB平面时出错:\n{str(e)}"))
     
     def show_bit_plane(self):
         """显示位平面"""
         if not self.analysis_image:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可分析的预览图片"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可分析的预览图片"))
             return
         
         try:
@@ -1767,7 +2342,7 @@ class AnalysisModule:
             self.parent.update_status(f"显示位平面 {bit_pos} (0=LSB, 7=MSB)")
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"显示位平面时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"显示位平面时出错:\n{str(e)}"))
     
     def start_analysis(self):
         """开始隐写分析"""
@@ -1816,7 +2391,7 @@ class AnalysisModule:
                 if img.mode != 'RGB':
                     img = img.convert('RGB')
             else:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "错误: 没有加载图片\n", "warning"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "错误: 没有加载图片\n", "warning"))
                 return
             
             # 分离通道
@@ -1832,15 +2407,15 @@ class AnalysisModule:
             bit_positions = self.analysis_config["selected_bit_positions"]
             
             if not channels_to_analyze:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "错误: 没有选择分析通道\n", "warning"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "错误: 没有选择分析通道\n", "warning"))
                 return
                 
             if not bit_positions:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "错误: 没有选择位位置\n", "warning"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "错误: 没有选择位位置\n", "warning"))
                 return
             
             # 开始分析
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "=== 开始隐写分析 ===\n\n", "header"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "=== 开始隐写分析 ===\n\n", "header"))
             
             total_combinations = len(channels_to_analyze) * len(bit_positions)
             completed = 0
@@ -1853,24 +2428,24 @@ class AnalysisModule:
                     # 更新进度
                     completed += 1
                     progress = int((completed / total_combinations) * 100)
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda: self.parent.update_status(f"分析中: {progress}%"))
+                    self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                    self.parent.post_ui(lambda: self.parent.update_status(f"分析中: {progress}%"))
                     
                     # 分析指定的通道和位
                     self.analyze_channel(channels[channel], channel, bit_pos, output_format, max_output)
             
-            self.parent.after(0, lambda: self.progress_bar.pack_forget())
+            self.parent.post_ui(lambda: self.progress_bar.pack_forget())
             self.parent.update_status("隐写分析完成")
             
             # 如果选择了导出结果到文件
             if self.dump_var.get():
-                self.parent.after(0, self.dump_full_results)
+                self.parent.post_ui(self.dump_full_results)
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"分析隐写数据时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"分析隐写数据时出错:\n{str(e)}"))
         finally:
-            self.parent.after(0, lambda: self.steg_button.config(state=tk.NORMAL))
-            self.parent.after(0, lambda: self.stop_analysis_button.config(state=tk.DISABLED))
+            self.parent.post_ui(lambda: self.steg_button.config(state=tk.NORMAL))
+            self.parent.post_ui(lambda: self.stop_analysis_button.config(state=tk.DISABLED))
     
     def analyze_channel(self, channel, channel_name, bit_position, output_format, max_output):
         """分析单个通道的隐写数据"""
@@ -1878,7 +2453,7 @@ class AnalysisModule:
             # 显示标题
             bit_name = "LSB" if bit_position == "LSB" else "MSB"
             header = f"=== 通道 {channel_name} - {bit_name} ==="
-            self.parent.after(0, lambda h=header: self.analysis_text.insert(tk.END, h + "\n", "subheader"))
+            self.parent.post_ui(lambda h=header: self.analysis_text.insert(tk.END, h + "\n", "subheader"))
             
             # 提取位数据
             extracted_bits = []
@@ -1910,7 +2485,7 @@ class AnalysisModule:
             extracted_data = bytes(extracted_bytes)
             
             # 输出结果
-            self.parent.after(0, lambda s=f"提取数据大小: {len(extracted_data)} 字节": 
+            self.parent.post_ui(lambda s=f"提取数据大小: {len(extracted_data)} 字节": 
                              self.analysis_text.insert(tk.END, s + "\n"))
             
             # 根据选择的格式输出，自动检测格式
@@ -1919,10 +2494,10 @@ class AnalysisModule:
             else:
                 self.output_data(extracted_data, output_format, max_output)
             
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "\n"))
             
         except Exception as e:
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, f"分析通道 {channel_name} 时出错: {str(e)}\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, f"分析通道 {channel_name} 时出错: {str(e)}\n"))
     
     def auto_detect_format_and_output(self, data, max_output):
         """自动检测数据格式并输出"""
@@ -1950,7 +2525,7 @@ class AnalysisModule:
                     text_ratio = printable_count / len(ascii_data) if len(ascii_data) > 0 else 0
                     
                     if text_ratio > 0.6:
-                        self.parent.after(0, lambda e=encoding: 
+                        self.parent.post_ui(lambda e=encoding: 
                              self.analysis_text.insert(tk.END, f"检测到编码: {e}\n"))
                         self.output_data(data, "ascii", max_output)
                         return
@@ -1959,33 +2534,33 @@ class AnalysisModule:
             
             # 尝试检测PNG文件
             if data.startswith(b'\x89PNG\r\n\x1a\n'):
-                self.parent.after(0, lambda: 
+                self.parent.post_ui(lambda: 
                      self.analysis_text.insert(tk.END, "检测到PNG文件签名\n"))
                 self.output_png_info(data, max_output)
                 return
             
             # 尝试检测JPEG文件
             if data.startswith(b'\xFF\xD8'):
-                self.parent.after(0, lambda: 
+                self.parent.post_ui(lambda: 
                      self.analysis_text.insert(tk.END, "检测到JPEG文件签名\n"))
                 self.output_general_binary(data, max_output)
                 return
                 
             # 尝试检测ZIP文件 (PK header)
             if data.startswith(b'PK\x03\x04'):
-                self.parent.after(0, lambda: 
+                self.parent.post_ui(lambda: 
                      self.analysis_text.insert(tk.END, "检测到ZIP文件签名\n"))
                 self.output_general_binary(data, max_output)
                 return
                 
             # 默认十六进制输出
                         # 默认十六进制输出
-            self.parent.after(0, lambda: 
+            self.parent.post_ui(lambda: 
                  self.analysis_text.insert(tk.END, "无法识别文件类型, 显示十六进制数据\n"))
             self.output_data(data, "hex", max_output)
             
         except Exception as e:
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, f"自动检测时出错: {str(e)}\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, f"自动检测时出错: {str(e)}\n"))
     
     def output_data(self, data, format_type, max_output):
         """以指定格式输出数据"""
@@ -1997,14 +2572,14 @@ class AnalysisModule:
             display_data = hex_data
             if len(hex_data) > max_output * 2:
                 display_data = hex_data[:max_output * 2] + f" ... (截断，只显示前{max_output}字节)"
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "十六进制数据 (截断):\n"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "十六进制数据 (截断):\n"))
             else:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "十六进制数据:\n"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "十六进制数据:\n"))
             
             # 格式化输出，每行32个字节
             hex_lines = [display_data[i:i+64] for i in range(0, len(display_data), 64)]
             for line in hex_lines:
-                self.parent.after(0, lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
+                self.parent.post_ui(lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
         
         elif format_type == "bin":
             # 二进制输出
@@ -2014,14 +2589,14 @@ class AnalysisModule:
             display_data = bin_data
             if len(bin_data) > max_output * 8:
                 display_data = bin_data[:max_output * 8] + f" ... (截断，只显示前{max_output}字节)"
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "二进制数据 (截断):\n"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "二进制数据 (截断):\n"))
             else:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "二进制数据:\n"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "二进制数据:\n"))
             
             # 格式化输出，每行32位
             bin_lines = [display_data[i:i+32] for i in range(0, len(display_data), 32)]
             for i, line in enumerate(bin_lines):
-                self.parent.after(0, lambda i=i, l=line: 
+                self.parent.post_ui(lambda i=i, l=line: 
                                  self.analysis_text.insert(tk.END, f"{i*4:08X}: {l}\n"))
         
         else:  # ascii
@@ -2033,19 +2608,19 @@ class AnalysisModule:
                 display_data = ascii_data
                 if len(ascii_data) > max_output:
                     display_data = ascii_data[:max_output] + f"\n... (截断，显示前{max_output}字符)"
-                    self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "ASCII数据 (截断):\n"))
+                    self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "ASCII数据 (截断):\n"))
                 else:
-                    self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "ASCII数据:\n"))
+                    self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "ASCII数据:\n"))
                 
-                self.parent.after(0, lambda d=display_data: self.analysis_text.insert(tk.END, d + '\n'))
+                self.parent.post_ui(lambda d=display_data: self.analysis_text.insert(tk.END, d + '\n'))
             except Exception as e:
-                self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "无法解码为ASCII文本，显示十六进制数据:\n"))
+                self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "无法解码为ASCII文本，显示十六进制数据:\n"))
                 # 尝试以十六进制格式输出
                 hex_data = binascii.hexlify(data).decode('utf-8')
                 hex_data = hex_data[:max_output * 2] + " ... (截断)" if len(hex_data) > max_output * 2 else hex_data
                 hex_lines = [hex_data[i:i+64] for i in range(0, len(hex_data), 64)]
                 for line in hex_lines:
-                    self.parent.after(0, lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
+                    self.parent.post_ui(lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
     
     def output_png_info(self, data, max_output):
         """输出PNG文件信息"""
@@ -2057,7 +2632,7 @@ class AnalysisModule:
                 
             # 跳过文件头
             pos = 8
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "PNG块结构:\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "PNG块结构:\n"))
             
             while pos < len(data) and pos < max_output + 8:
                 # 读取块长度
@@ -2085,7 +2660,7 @@ class AnalysisModule:
                 pos += 4
                 
                 # 输出信息
-                self.parent.after(0, lambda t=chunk_type, l=chunk_length: 
+                self.parent.post_ui(lambda t=chunk_type, l=chunk_length: 
                                  self.analysis_text.insert(tk.END, f"\n块: {t}, 长度: {l}\n"))
                 
                 # 特殊处理IHDR块
@@ -2098,7 +2673,7 @@ class AnalysisModule:
                     filter_method = chunk_data[11]
                     interlace = chunk_data[12]
                     
-                    self.parent.after(0, lambda w=width, h=height, b=bit_depth, c=color_type: 
+                    self.parent.post_ui(lambda w=width, h=height, b=bit_depth, c=color_type: 
                                      self.analysis_text.insert(tk.END, 
                                      f"尺寸: {w}x{h}, 位深度: {b}, 颜色类型: {c}\n"))
                 
@@ -2111,10 +2686,10 @@ class AnalysisModule:
                             text_data = chunk_data[null_pos+1:]
                             try:
                                 text_str = text_data.decode('latin-1')
-                                self.parent.after(0, lambda k=keyword, t=text_str: 
+                                self.parent.post_ui(lambda k=keyword, t=text_str: 
                                      self.analysis_text.insert(tk.END, f"关键字: {k}\n内容: {t}\n"))
                             except:
-                                self.parent.after(0, lambda k=keyword: 
+                                self.parent.post_ui(lambda k=keyword: 
                                      self.analysis_text.insert(tk.END, f"关键字: {k}\n内容: <二进制数据>\n"))
                     except:
                         pass
@@ -2124,22 +2699,22 @@ class AnalysisModule:
                     break
             
         except Exception as e:
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, f"解析PNG结构时出错: {str(e)}\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, f"解析PNG结构时出错: {str(e)}\n"))
             self.output_general_binary(data, max_output)
     
     def output_general_binary(self, data, max_output):
         """输出通用二进制信息"""
         if len(data) > max_output:
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, f"二进制数据 (只显示前{max_output}字节):\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, f"二进制数据 (只显示前{max_output}字节):\n"))
             data = data[:max_output]
         else:
-            self.parent.after(0, lambda: self.analysis_text.insert(tk.END, "二进制数据:\n"))
+            self.parent.post_ui(lambda: self.analysis_text.insert(tk.END, "二进制数据:\n"))
         
         # 以十六进制格式输出
         hex_data = binascii.hexlify(data).decode('utf-8')
         hex_lines = [hex_data[i:i+64] for i in range(0, len(hex_data), 64)]
         for line in hex_lines:
-            self.parent.after(0, lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
+            self.parent.post_ui(lambda l=line: self.analysis_text.insert(tk.END, l + '\n'))
     
     def dump_full_results(self):
         """导出完整的结果到文件"""
@@ -2234,10 +2809,10 @@ class AnalysisModule:
                         
                         f.write("\n")
             
-            self.parent.after(0, lambda: messagebox.showinfo("成功", f"完整结果已导出到:\n{output_path}"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", f"完整结果已导出到:\n{output_path}"))
         
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"导出完整结果时出错:\n{str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"导出完整结果时出错:\n{str(e)}"))
 class BinaryToolsModule:
     """二进制工具模块，提供二进制数据处理功能"""
     def __init__(self, parent):
@@ -2419,7 +2994,7 @@ class BinaryToolsModule:
         """分析二进制文件中的隐写数据"""
         file_path = self.file_entry.get()
         if not file_path or not os.path.exists(file_path):
-            self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择有效的文件"))
+            self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择有效的文件"))
             return
         
         try:
@@ -2457,13 +3032,13 @@ class BinaryToolsModule:
             analyze_thread.start()
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"分析文件时出错: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"分析文件时出错: {str(e)}"))
     
     def perform_stego_analysis(self, analysis_mode, tail_size, text_threshold, entropy_threshold):
         """执行隐写分析"""
         try:
             if not self.current_data:
-                self.parent.after(0, lambda: self.result_text.insert(tk.END, "错误: 没有加载文件数据\n", "warning"))
+                self.parent.post_ui(lambda: self.result_text.insert(tk.END, "错误: 没有加载文件数据\n", "warning"))
                 return
             
             self.stego_results = {
@@ -2479,56 +3054,56 @@ class BinaryToolsModule:
             if analysis_mode == "自动检测" or analysis_mode == "提取文本":
                 step += 1
                 progress = int((step / total_steps) * 100)
-                self.parent.after(0, lambda p=progress: self.progress_var.set(p))
+                self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
                 
                 # 提取文本
                 text_data = self.extract_text(self.current_data, text_threshold)
                 self.stego_results["text"] = text_data
                 
                 if text_data:
-                    self.parent.after(0, lambda d=text_data: self.result_text.insert(tk.END, "=== 文本提取结果 ===\n" + d + "\n"))
+                    self.parent.post_ui(lambda d=text_data: self.result_text.insert(tk.END, "=== 文本提取结果 ===\n" + d + "\n"))
             
             if analysis_mode == "自动检测" or analysis_mode == "提取二进制":
                 step += 1
                 progress = int((step / total_steps) * 100)
-                self.parent.after(0, lambda p=progress: self.progress_var.set(p))
+                self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
                 
                 # 提取二进制数据
                 binary_data = self.extract_binary(self.current_data, entropy_threshold)
                 self.stego_results["binary"] = binary_data
                 
                 if binary_data:
-                    self.parent.after(0, lambda: self.result_text.insert(tk.END, "=== 二进制提取结果 ===\n" + binary_data + "\n"))
+                    self.parent.post_ui(lambda: self.result_text.insert(tk.END, "=== 二进制提取结果 ===\n" + binary_data + "\n"))
             
             if analysis_mode == "自动检测" or analysis_mode == "文件尾分析":
                 step += 1
                 progress = int((step / total_steps) * 100)
-                self.parent.after(0, lambda p=progress: self.progress_var.set(p))
+                self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
                 
                 # 分析文件尾
                 tail_data = self.analyze_file_tail(self.current_data, tail_size, text_threshold, entropy_threshold)
                 self.stego_results["tail"] = tail_data
                 
                 if tail_data:
-                    self.parent.after(0, lambda d=tail_data: self.result_text.insert(tk.END, "=== 文件尾分析结果 ===\n" + d + "\n"))
+                    self.parent.post_ui(lambda d=tail_data: self.result_text.insert(tk.END, "=== 文件尾分析结果 ===\n" + d + "\n"))
             
             if analysis_mode == "自动检测":
                 step += 1
                 progress = int((step / total_steps) * 100)
-                self.parent.after(0, lambda p=progress: self.progress_var.set(p))
+                self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
                 
                 # 自动检测最佳结果
                 best_result = self.auto_detect_best_stego()
                 if best_result:
-                    self.parent.after(0, lambda d=best_result: self.result_text.insert(tk.END, "=== 自动检测最佳结果 ===\n" + d + "\n"))
+                    self.parent.post_ui(lambda d=best_result: self.result_text.insert(tk.END, "=== 自动检测最佳结果 ===\n" + d + "\n"))
             
-            self.parent.after(0, lambda: self.progress_bar.pack_forget())
+            self.parent.post_ui(lambda: self.progress_bar.pack_forget())
             self.parent.update_status("隐写分析完成")
             
         except Exception as e:
-            self.parent.after(0, lambda: self.result_text.insert(tk.END, f"分析过程中出错: {str(e)}\n", "warning"))
+            self.parent.post_ui(lambda: self.result_text.insert(tk.END, f"分析过程中出错: {str(e)}\n", "warning"))
         finally:
-            self.parent.after(0, lambda: self.parent.update_status("隐写分析完成"))
+            self.parent.post_ui(lambda: self.parent.update_status("隐写分析完成"))
     
     def extract_text(self, data, threshold):
         """从二进制数据中提取文本"""
@@ -2681,7 +3256,7 @@ class BinaryToolsModule:
         """将二进制数据转换为图片"""
         file_path = self.file_entry.get()
         if not file_path or not os.path.exists(file_path):
-            self.parent.after(0, lambda: messagebox.showwarning("警告", "请选择有效的文件"))
+            self.parent.post_ui(lambda: messagebox.showwarning("警告", "请选择有效的文件"))
             return
         
         try:
@@ -2731,12 +3306,12 @@ class BinaryToolsModule:
             self.save_button.config(state=tk.NORMAL)
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"转换失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"转换失败: {str(e)}"))
     
     def save_image(self):
         """保存生成的图片"""
         if not self.current_data:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "没有可保存的图像"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "没有可保存的图像"))
             return
         
         try:
@@ -2765,10 +3340,10 @@ class BinaryToolsModule:
             self.parent.config["binary_tools"]["mode"] = mode
             self.parent.config["binary_tools"]["reverse_bytes"] = self.reverse_var.get()
             
-            self.parent.after(0, lambda: messagebox.showinfo("成功", f"图片已保存到:\n{file_path}"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", f"图片已保存到:\n{file_path}"))
             
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存图片时出错: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存图片时出错: {str(e)}"))
     
     def clear_results(self):
         """清除结果区域"""
@@ -3023,18 +3598,18 @@ class BinaryEditorModule:
                     
                     # 更新进度
                     progress = (bytes_read / file_size) * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda: self.status_label.config(text=f"{progress:.1f}%"))
+                    self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                    self.parent.post_ui(lambda: self.status_label.config(text=f"{progress:.1f}%"))
             
             if not self.cancel_loading:
                 self.binary_data = b''.join(chunks)
                 self.size_var.set(f"{len(self.binary_data)} 字节")
-                self.parent.after(0, self.display_file_content)
+                self.parent.post_ui(self.display_file_content)
                 self.save_button.config(state=tk.NORMAL)
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
         finally:
-            self.parent.after(0, self.progress_dialog.destroy)
+            self.parent.post_ui(self.progress_dialog.destroy)
             self.is_loading = False
     
     def cancel_file_load(self):
@@ -3189,10 +3764,10 @@ class BinaryEditorModule:
                 f.write(data_to_save)
                 
             self.status_var.set(f"文件保存成功: {os.path.basename(file_path)}")
-            self.parent.after(0, lambda: messagebox.showinfo("成功", "文件已保存"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", "文件已保存"))
         
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
     
     def show_save_options_dialog(self):
         """显示保存选项对话框"""
@@ -3777,18 +4352,18 @@ class BinaryEditorModule:
                     
                     # 更新进度
                     progress = (bytes_read / file_size) * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda: self.status_label.config(text=f"{progress:.1f}%"))
+                    self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                    self.parent.post_ui(lambda: self.status_label.config(text=f"{progress:.1f}%"))
             
             if not self.cancel_loading:
                 self.binary_data = b''.join(chunks)
                 self.size_var.set(f"{len(self.binary_data)} 字节")
-                self.parent.after(0, self.display_file_content)
+                self.parent.post_ui(self.display_file_content)
                 self.save_button.config(state=tk.NORMAL)
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
         finally:
-            self.parent.after(0, self.progress_dialog.destroy)
+            self.parent.post_ui(self.progress_dialog.destroy)
             self.is_loading = False
     
     def cancel_file_load(self):
@@ -3943,10 +4518,10 @@ class BinaryEditorModule:
                 f.write(data_to_save)
                 
             self.status_var.set(f"文件保存成功: {os.path.basename(file_path)}")
-            self.parent.after(0, lambda: messagebox.showinfo("成功", "文件已保存"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", "文件已保存"))
         
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
     
     def show_save_options_dialog(self):
         """显示保存选项对话框"""
@@ -4242,7 +4817,7 @@ class BinaryEditorModule:
     def save_selected_region(self):
         """保存选中区域到文件"""
         if self.selected_start is None or self.selected_end is None:
-            self.parent.after(0, lambda: messagebox.showinfo("提示", "请先选择区域"))
+            self.parent.post_ui(lambda: messagebox.showinfo("提示", "请先选择区域"))
             return
         
         start = min(self.selected_start, self.selected_end)
@@ -4259,7 +4834,7 @@ class BinaryEditorModule:
                     f.write(selected_data)
                 self.status_var.set(f"已保存 {end-start} 字节到 {os.path.basename(file_path)}")
             except Exception as e:
-                self.parent.after(0, lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
+                self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存文件失败: {str(e)}"))
     
     def clear_selection(self):
         """清除选中区域"""
@@ -4473,18 +5048,18 @@ class BinaryEditorModule:
                     
                     # 更新进度
                     progress = (bytes_read / file_size) * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda: self.status_label.config(text=f"{progress:.1f}%"))
+                    self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                    self.parent.post_ui(lambda: self.status_label.config(text=f"{progress:.1f}%"))
             
             if not self.cancel_loading:
                 self.binary_data = b''.join(chunks)
                 self.size_var.set(f"{len(self.binary_data)} 字节")
-                self.parent.after(0, self.display_file_content)
+                self.parent.post_ui(self.display_file_content)
                 self.save_button.config(state=tk.NORMAL)
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"加载文件失败: {str(e)}"))
         finally:
-            self.parent.after(0, self.progress_dialog.destroy)
+            self.parent.post_ui(self.progress_dialog.destroy)
             self.is_loading = False
     
     def cancel_file_load(self):
@@ -5041,8 +5616,8 @@ class BinaryEditorModule:
                     
                     # 更新进度
                     progress = (bytes_read / file_size) * 100
-                    self.parent.after(0, lambda p=progress: self.progress_var.set(p))
-                    self.parent.after(0, lambda: self.status_label.config(text=f"{progress:.1f}%"))
+                    self.parent.post_ui(lambda p=progress: self.progress_var.set(p))
+                    self.parent.post_ui(lambda: self.status_label.config(text=f"{progress:.1f}%"))
                     # 移除 self.parent.update_idletasks() 避免UI问题
                     # self.parent.update_idletasks()  # 强制刷新UI
             
@@ -5050,11 +5625,11 @@ class BinaryEditorModule:
                 binary_data = b''.join(chunks)
                 # 保存二进制数据，然后调用格式化显示方法
                 self.binary_data = binary_data
-                self.parent.after(0, self.update_display)  # 调用不带参数的格式化方法
+                self.parent.post_ui(self.update_display)  # 调用不带参数的格式化方法
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"读取文件失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"读取文件失败: {str(e)}"))
         finally:
-            self.parent.after(0, self.progress_dialog.destroy)
+            self.parent.post_ui(self.progress_dialog.destroy)
             self.reading_file = False
     
     def update_display(self):
@@ -5118,10 +5693,10 @@ class BinaryEditorModule:
     
     def save_file(self):
         if not self.current_file:
-            self.parent.after(0, lambda: messagebox.showwarning("警告", "请先打开文件"))
+            self.parent.post_ui(lambda: messagebox.showwarning("警告", "请先打开文件"))
             return
         if not hasattr(self, 'binary_data') or self.binary_data is None:
-            self.parent.after(0, lambda: messagebox.showwarning("警告", "没有可保存的数据"))
+            self.parent.post_ui(lambda: messagebox.showwarning("警告", "没有可保存的数据"))
             return
             
         try:
@@ -5168,9 +5743,9 @@ class BinaryEditorModule:
             self.binary_data = binary_data
                 
             self.parent.update_status(f"文件保存成功: {self.current_file}")
-            self.parent.after(0, lambda: messagebox.showinfo("成功", "文件已保存"))
+            self.parent.post_ui(lambda: messagebox.showinfo("成功", "文件已保存"))
         except Exception as e:
-            self.parent.after(0, lambda: messagebox.showerror("错误", f"保存失败: {str(e)}"))
+            self.parent.post_ui(lambda: messagebox.showerror("错误", f"保存失败: {str(e)}"))
     
     def update_display(self):
         if not hasattr(self, 'binary_data') or self.binary_data is None:
@@ -5355,6 +5930,48 @@ class SettingsModule:
         self.example_label = ttk.Label(example_frame, text=self.separator_var.get())
         self.example_label.pack(side=tk.LEFT, padx=5)
         
+        # 解码设置
+        decoder_frame = ttk.LabelFrame(scrollable_frame, text="解码设置")
+        decoder_frame.pack(fill=tk.X, padx=10, pady=10, ipadx=10, ipady=10)
+        
+        # 解码后端，当前环境不可用的后端显示为灰色
+        backend_frame = ttk.Frame(decoder_frame)
+        backend_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(backend_frame, text="解码后端:").pack(side=tk.LEFT)
+        
+        available = decoders.available_backends()
+        self.backend_vars = {}
+        for name in decoders.BACKENDS:
+            self.backend_vars[name] = tk.BooleanVar(value=name in self.config["decoder"]["backends"])
+            ttk.Checkbutton(backend_frame, text=name, variable=self.backend_vars[name],
+                           state=tk.NORMAL if name in available else tk.DISABLED,
+                           command=self.update_settings).pack(side=tk.LEFT, padx=5)
+        
+        # 组合策略
+        strategy_frame = ttk.Frame(decoder_frame)
+        strategy_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(strategy_frame, text="组合策略:").pack(side=tk.LEFT)
+        
+        self.strategy_var = tk.StringVar(value=self.config["decoder"]["strategy"])
+        strategy_options = [("最便宜优先", "cheapest"), ("并行竞速", "race"), ("多数一致", "consensus")]
+        for text, value in strategy_options:
+            ttk.Radiobutton(strategy_frame, text=text, variable=self.strategy_var, value=value,
+                            command=self.update_settings).pack(side=tk.LEFT, padx=5)
+        
+        # 命中即停止的码制：单独解码一轮，找到后不再尝试其余码制
+        stop_frame = ttk.Frame(decoder_frame)
+        stop_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(stop_frame, text="命中即停止:").pack(side=tk.LEFT)
+        
+        self.stop_symbol_vars = {}
+        for name, label in decoders.SYMBOLOGIES.items():
+            self.stop_symbol_vars[name] = tk.BooleanVar(value=name in self.config["decoder"]["stop_symbols"])
+            ttk.Checkbutton(stop_frame, text=label, variable=self.stop_symbol_vars[name],
+                           command=self.update_settings).pack(side=tk.LEFT, padx=5)
+        
         # 分析设置
         analysis_frame = ttk.LabelFrame(scrollable_frame, text="分析设置")
         analysis_frame.pack(fill=tk.X, padx=10, pady=10, ipadx=10, ipady=10)
@@ -5503,6 +6120,11 @@ class SettingsModule:
         self.config["batch_scan"]["separator"] = self.separator_var.get()
         self.example_label.config(text=self.separator_var.get())
         
+        # 更新解码设置
+        self.config["decoder"]["backends"] = [name for name, var in self.backend_vars.items() if var.get()] or ["pyzbar"]
+        self.config["decoder"]["strategy"] = self.strategy_var.get()
+        self.config["decoder"]["stop_symbols"] = [name for name, var in self.stop_symbol_vars.items() if var.get()]
+        
         # 更新分析设置
         self.config["analysis"]["auto_wrap"] = self.auto_wrap_var.get()
         
@@ -0,0 +1,89 @@
+"""
+文件预读
+在网络文件系统（NFS/SMB）上逐个扫描时，读文件和解码交替进行：读文件时CPU空闲，解码时磁盘空闲。
+这里用一个小线程池按扫描顺序提前把后面的文件整个读进内存，缓存的总字节数有上限；
+读好的数据用 BytesIO 交给 Pillow（BytesIO 与 bytes 共享同一块内存，不再复制一份）
+"""
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 预读缓存的总字节数上限（不含调用方正在处理的文件）、最多提前的文件数和读取线程数
+MAX_BYTES = 64 * 1024 * 1024
+MAX_FILES = 32
+THREADS = 4
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def open_source(path, data):
+    """预读到数据时返回 BytesIO，否则返回路径，交给 Image.open / scan_engine.scan_file"""
+    return io.BytesIO(data) if data is not None else path
+
+
+def prefetch(items, max_bytes=MAX_BYTES):
+    """把 (序号, 路径) 变为 (序号, 路径, 数据) 的迭代器；max_bytes 为0时不预读，数据都为None"""
+    if not max_bytes:
+        return ((index, path, None) for index, path in items)
+    return iter(ReadAhead(items, max_bytes))
+
+
+class ReadAhead:
+    """
+    按原顺序迭代 (序号, 路径, 数据)，后面的文件在线程池中提前读取
+    数据为 None 表示没有预读（文件超过缓存上限或读取失败），调用方照常按路径打开，错误也在那里报告
+    """
+    def __init__(self, items, max_bytes=MAX_BYTES, max_files=MAX_FILES, threads=THREADS):
+        self.items = iter(items)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.threads = threads
+    
+    def __iter__(self):
+        queue = deque()  # (序号, 路径, 读取任务或None, 占用的字节数)
+        waiting = None  # 缓存已满时暂存的下一项
+        buffered = 0
+        executor = ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            while True:
+                # 在缓存上限内提交后面文件的读取
+                while len(queue) < self.max_files:
+                    if waiting is None:
+                        waiting = next(self.items, None)
+                        if waiting is None:
+                            break
+                    index, path = waiting
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError:
+                        size = None
+                    if size is None or size > self.max_bytes:
+                        queue.append((index, path, None, 0))
+                    elif queue and buffered + size > self.max_bytes:
+                        break
+                    else:
+                        buffered += size
+                        queue.append((index, path, executor.submit(_read, path), size))
+                    waiting = None
+                if not queue:
+                    return
+                
+                index, path, future, size = queue.popleft()
+                data = None
+                if future is not None:
+                    try:
+                        data = future.result()
+                    except OSError:
+                        data = None
+                buffered -= size
+                yield index, path, data
+        finally:
+            # 提前停止时取消还没开始的读取，不等待正在进行的读取
+            for _, _, future, _ in queue:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=False)
@@ -0,0 +1,144 @@
+"""
+扫描结果流式导出（JSONL / CSV）
+批量扫描时每处理完一个文件就写出一条记录，带类型、位置、多边形、质量和耗时，
+下游工具可以在扫描进行中读取结果
+"""
+import os
+import csv
+import json
+import time
+import threading
+
+from scan_engine import make_entry
+from payload_decode import summarize
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+CSV_COLUMNS = [
+    "index", "source", "status", "type", "data", "encoding", "quality", "orientation",
+    "rect_left", "rect_top", "rect_width", "rect_height", "polygon", "decode_ms", "error", "decoded",
+]
+
+
+class _LineBuffer:
+    """csv.writer 的写入目标，把生成的行收集到列表里"""
+    def __init__(self):
+        self.lines = []
+    
+    def write(self, text):
+        self.lines.append(text)
+
+
+class StreamingResultWriter:
+    """
+    边扫描边写出结果
+    缓冲区满（条数或字节数）或距上次写出超过 max_delay 秒时写入文件，
+    fsync=True 时每次写出后落盘，扫描中途崩溃也最多丢失一个缓冲区的内容
+    """
+    def __init__(self, path, fmt=None, buffer_records=256, buffer_bytes=1024 * 1024,
+                 max_delay=2.0, fsync=False, append=False):
+        self.path = path
+        self.format = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        if self.format not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {self.format}")
+        self.buffer_records = buffer_records
+        self.buffer_bytes = buffer_bytes
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.last_flush = time.monotonic()
+        self.records_written = 0
+        self._closed = threading.Event()
+        
+        need_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        # CSV 按 RFC 4180 使用 \r\n，交给 csv 模块处理；JSONL 统一用 \n
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self._csv_buffer = _LineBuffer()
+        self._csv = csv.writer(self._csv_buffer) if self.format == "csv" else None
+        if self._csv and need_header:
+            self._csv.writerow(CSV_COLUMNS)
+            self._take_csv_lines()
+        
+        # 单个文件耗时很长时，缓冲区里已有的记录也要按时写出
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _take_csv_lines(self):
+        text = "".join(self._csv_buffer.lines)
+        self._csv_buffer.lines.clear()
+        self.buffer.append(text)
+        self.buffered_bytes += len(text)
+    
+    def write_entry(self, entry):
+        """写入一条文件记录（make_entry 生成的格式）"""
+        with self.lock:
+            if self._csv:
+                for row in self._csv_rows(entry):
+                    self._csv.writerow(row)
+                self._take_csv_lines()
+            else:
+                text = json.dumps(entry, ensure_ascii=False) + "\n"
+                self.buffer.append(text)
+                self.buffered_bytes += len(text)
+            self.records_written += 1
+            
+            if (len(self.buffer) >= self.buffer_records or self.buffered_bytes >= self.buffer_bytes
+                    or time.monotonic() - self.last_flush >= self.max_delay):
+                self._flush_locked()
+    
+    def write_file(self, index, path, results=None, error=None, elapsed=None):
+        """写入一个文件的扫描结果"""
+        extra = {"decode_ms": round(elapsed * 1000, 2)} if elapsed is not None else None
+        self.write_entry(make_entry(index, path, results, error, extra))
+    
+    def _csv_rows(self, entry):
+        """一个符号一行；没有结果或出错的文件也占一行"""
+        base = [entry["i"], entry["path"]]
+        decode_ms = entry.get("decode_ms", "")
+        if "error" in entry:
+            yield base + ["error"] + [""] * 10 + [decode_ms, entry["error"], ""]
+            return
+        if not entry["results"]:
+            yield base + ["not_found"] + [""] * 10 + [decode_ms, "", ""]
+            return
+        for result in entry["results"]:
+            polygon = ";".join(f"{x} {y}" for x, y in result["polygon"])
+            yield base + ["ok", result["type"], result["data"], result["encoding"],
+                          result.get("quality", ""), result.get("orientation") or ""] + \
+                list(result["rect"]) + [polygon, decode_ms, "", summarize(result.get("decoded", []))]
+    
+    def _flush_locked(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer.clear()
+            self.buffered_bytes = 0
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+    
+    def _flush_periodically(self):
+        while not self._closed.wait(self.max_delay):
+            with self.lock:
+                if self.buffer and time.monotonic() - self.last_flush >= self.max_delay:
+                    self._flush_locked()
+    
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+    
+    def close(self):
+        self._closed.set()
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush_locked()
+            self.file.close()
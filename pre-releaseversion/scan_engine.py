@@ -0,0 +1,1179 @@
+"""
+二维码扫描引擎（无界面）
+图形界面、断点续扫任务和后台工作进程共用这里的解码流程
+"""
+import os
+import sys
+import json
+import time
+import math
+import socket
+import struct
+import datetime
+import threading
+import concurrent.futures
+from PIL import Image, ImageEnhance, ImageOps
+from pyzbar import pyzbar
+import numpy as np
+import natsort
+
+import decoders
+import qr_repair
+import qr_matrix
+import qr_decode
+import qr_transform
+import qr_deblur
+import qr_morph
+import qr_tiles
+import qr_reassemble
+import qr_sequence
+import payload_decode
+import scan_guard
+import read_ahead
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif')
+
+
+def preprocess_image(img):
+    """图像预处理以提高识别率"""
+    # 转换为灰度图
+    img = img.convert("L") if img else None
+    
+    # 增强对比度
+    if img:
+        enhancer = ImageEnhance.Contrast(img)
+        img = enhancer.enhance(2.0)
+        
+        # 增强锐度
+        enhancer = ImageEnhance.Sharpness(img)
+        img = enhancer.enhance(2.0)
+        
+        # 调整大小（如果太小）
+        if img.width < 300 or img.height < 300:
+            img = img.resize((img.width * 2, img.height * 2), Image.LANCZOS)
+    
+    return img
+
+
+def enhance_qr_image(img, level="auto"):
+    """增强二维码图像以提高识别率"""
+    if not img:
+        return None
+    
+    # 设置增强级别
+    if level == "auto":
+        contrast_level = 2.5
+        sharpness_level = 2.5
+    elif level == "medium":
+        contrast_level = 3.0
+        sharpness_level = 3.0
+    else:  # strong
+        contrast_level = 4.0
+        sharpness_level = 4.0
+    
+    # 应用自适应阈值
+    img = ImageOps.autocontrast(img)
+    
+    # 增强对比度
+    enhancer = ImageEnhance.Contrast(img)
+    img = enhancer.enhance(contrast_level)
+    
+    # 增强锐度
+    enhancer = ImageEnhance.Sharpness(img)
+    img = enhancer.enhance(sharpness_level)
+    
+    # 尝试不同阈值方法
+    img = img.point(lambda p: p > 128 and 255)
+    
+    return img
+
+
+def _decode_qr(image):
+    """默认解码方式：pyzbar只识别QR码"""
+    return pyzbar.decode(np.asarray(image), symbols=[pyzbar.ZBarSymbol.QRCODE])
+
+
+def scan_image(img, decoder=None):
+    """扫描图像中的二维码；decoder 为 decoders.DecoderChain，默认只用pyzbar"""
+    if not img:
+        return []
+    decode = decoder.decode if decoder else _decode_qr
+    
+    # 将PIL图像转换为numpy数组供解码器使用
+    img_array = np.array(img)
+    
+    # 尝试扫描二维码
+    decoded_objs = decode(img_array)
+    
+    # 如果未找到二维码，尝试使用更激进的阈值
+    if not decoded_objs:
+        # 应用Otsu's 二值化
+        img = img.convert('L')
+        img_array = np.array(img)
+        thresh = np.percentile(img_array, 35)  # 使用较低的阈值
+        img_array = np.where(img_array > thresh, 255, 0).astype(np.uint8)
+        decoded_objs = decode(img_array)
+    
+    # 如果还没找到，尝试反转图像
+    if not decoded_objs:
+        img = ImageOps.invert(img.convert('RGB'))
+        img_array = np.array(img)
+        decoded_objs = decode(img_array)
+    
+    return decoded_objs
+
+
+def _scan_first(candidates, render, decoder=None, max_workers=None):
+    """
+    并行识别一组候选（render(候选) 在工作线程里生成图像），第一个识别成功的候选即返回，
+    结果坐标用候选的 transform 换算回原图；返回 (结果列表, 候选)，全部失败时返回 ([], None)
+    """
+    found = threading.Event()
+    
+    def attempt(candidate):
+        # 已有候选命中时，还在排队的候选直接跳过
+        if found.is_set():
+            return []
+        results = scan_image(render(candidate), decoder)
+        if results:
+            found.set()
+        return results
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(attempt, candidate): candidate for candidate in candidates}
+        for future in concurrent.futures.as_completed(futures):
+            results = future.result()
+            if results:
+                for other in futures:
+                    other.cancel()
+                candidate = futures[future]
+                return [qr_repair.remap_result(result, candidate.transform) for result in results], candidate
+    return [], None
+
+
+def scan_sheet(img, decoder=None, enhance_level="auto", tile_size=qr_tiles.TILE_SIZE, overlap=qr_tiles.OVERLAP,
+               max_workers=None):
+    """
+    多码页面：切成重叠分块并行识别，结果坐标换算回整图并去除重叠区域的重复结果；
+    仍有大片深色区域未被识别结果覆盖的分块按 enhance_level 增强后重试（"off" 时不重试）
+    """
+    tiles = qr_tiles.tile_grid(img.width, img.height, tile_size, overlap)
+    
+    def attempt(tile, level=None):
+        crop = img.crop(tile.box)
+        if level:
+            crop = enhance_qr_image(crop, level)
+        return [qr_repair.remap_result(result, tile.transform) for result in scan_image(crop, decoder)]
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        found = list(executor.map(attempt, tiles))
+        results = qr_tiles.dedupe([result for tile_results in found for result in tile_results])
+        if enhance_level == "off":
+            return results
+        
+        gray = np.asarray(img.convert("L"))
+        dark = gray <= qr_repair.otsu_threshold(gray)
+        failed = [tile for tile in tiles if qr_tiles.needs_retry(dark, tile, results)]
+        retried = executor.map(lambda tile: attempt(tile, enhance_level), failed)
+        return qr_tiles.dedupe(results + [result for tile_results in retried for result in tile_results])
+
+
+def scan_transformed(img, decoder=None, max_workers=None):
+    """
+    变换搜索：镜像、透视校正、剪切和旋转后的候选图并行识别，第一个识别成功的候选即返回，结果坐标换算回原图
+    返回 (结果列表, qr_transform.Warp)，全部失败时返回 ([], None)
+    """
+    gray = img.convert("L")
+    return _scan_first(qr_transform.candidate_warps(gray), lambda warp: qr_transform.apply_warp(gray, warp),
+                       decoder, max_workers)
+
+
+def scan_morphology(img, decoder=None, max_workers=None):
+    """
+    形态学清理：Otsu阈值化后按几档结构元素做闭运算（和闭运算后再开运算），并行识别，第一个识别成功的即返回
+    返回 (结果列表, qr_morph.MorphCandidate)，全部失败时返回 ([], None)
+    """
+    dark = qr_morph.binarize(img)
+    return _scan_first(qr_morph.morph_candidates(dark), lambda candidate: qr_morph.apply_morph(dark, candidate),
+                       decoder, max_workers)
+
+
+def reassemble(pieces, decoder=None, max_workers=None):
+    """
+    碎片重组：按边缘吻合程度对各种网格形状做贪心拼接和束搜索，代价最低的若干种排列并行识别，第一个识别成功的即返回
+    pieces 为碎片图像列表（顺序任意）；结果坐标为拼接图中的坐标
+    返回 (结果列表, qr_reassemble.Layout)，全部失败时返回 ([], None)
+    """
+    grays, shapes = qr_reassemble.normalize_pieces(pieces)
+    layouts = qr_reassemble.candidate_layouts(grays, shapes)
+    return _scan_first(layouts, lambda layout: qr_reassemble.render_layout(grays, layout), decoder, max_workers)
+
+
+def scan_deblurred(img, decoder=None, method="wiener", size=None, max_workers=None):
+    """
+    去模糊：候选区域按点扩散函数库批量反卷积后并行识别，第一个识别成功的复原图即返回，结果坐标换算回原图
+    img 应为未经对比度拉伸和锐化的原图（反卷积要求灰度与模糊呈线性关系），
+    size 为预处理后的图像尺寸，给出时先缩放到该尺寸，结果坐标与其他识别阶段一致
+    返回 (结果列表, qr_deblur.DeblurCandidate)，全部失败时返回 ([], None)
+    """
+    gray = img.convert("L")
+    if size and gray.size != tuple(size):
+        gray = gray.resize(size, Image.LANCZOS)
+    candidates = qr_deblur.deblur_candidates(gray, method)
+    return _scan_first(candidates, lambda candidate: candidate.image, decoder, max_workers)
+
+
+def scan_repaired(img, decoder=None):
+    """定位图案修复：重绘定位图案、校正图形和静区后再识别，结果坐标换算回原图"""
+    geometries = []
+    for candidate in qr_repair.repair_candidates(img):
+        results = scan_image(candidate.image, decoder)
+        if results:
+            return [qr_repair.remap_result(result, candidate.transform) for result in results]
+        if candidate.geometry not in geometries:
+            geometries.append(candidate.geometry)
+    
+    # 解码器仍然失败时（如格式信息也被破坏），对按网格采样出的模块矩阵穷举格式信息并做RS纠错/纠删
+    dark = qr_matrix.binarize(img)
+    for geometry in geometries:
+        matrix = qr_matrix.matrix_from_geometry(dark, geometry)
+        decoded = qr_decode.decode_matrix(matrix)
+        if decoded:
+            return [decoded.to_decoded(matrix.polygon())]
+    return []
+
+
+def check_hidden(img, records, hidden=True, sequence=False):
+    """
+    对识别出的QR码按多边形采样模块矩阵并完整解码码字流，
+    hidden 为真时把填充码字、终止符之后和纠错码字中发现的隐藏数据写入记录的 hidden 字段，
+    sequence 为真时把结构链接头写入记录的 sequence 字段
+    """
+    dark = None
+    for record in records:
+        if record.type != "QRCODE" or len(record.polygon) < 4:
+            continue
+        if dark is None:
+            dark = qr_matrix.binarize(img)
+        matrix = qr_matrix.extract_matrix(dark, record.polygon)
+        decoded = qr_decode.decode_matrix(matrix) if matrix else None
+        # 采样不准（如模糊图像）时纠删可能纠成别的码字，内容与识别结果不一致的不报告
+        if decoded and decode_data(decoded.data)[0] == record.text:
+            if hidden:
+                record.hidden = tuple(qr_decode.find_hidden_data(decoded))
+            if sequence:
+                record.sequence = qr_decode.structured_append(decoded)
+    return records
+
+
+def scan_loaded(img, enhance_level="auto", decoder=None, repair=False, hidden=False, transforms=False,
+                deblur=False, morph=False, sheet=False, sequence=False, deblur_method="wiener", report=None):
+    """
+    扫描已打开的图片，sheet 为真时按多码页面分块识别；识别失败时再做一次增强，
+    morph 为真时接着做形态学清理，deblur 为真时去模糊，
+    transforms 为真时再做变换搜索，repair 为真时最后尝试定位图案修复，hidden 为真时对识别出的QR码检查隐藏数据，
+    sequence 为真时读出QR码的结构链接头；report(说明) 在各补救手段命中或隐藏数据检查失败时调用
+    """
+    report = report or (lambda message: None)
+    processed_img = preprocess_image(img)
+    if sheet:
+        results = scan_sheet(processed_img, decoder, enhance_level)
+    else:
+        results = scan_image(processed_img, decoder)
+    
+    if not results and enhance_level != "off":
+        results = scan_image(enhance_qr_image(processed_img, level=enhance_level), decoder)
+        if results:
+            report(f"增强处理命中: {enhance_level}")
+    
+    if not results and morph:
+        results, candidate = scan_morphology(processed_img, decoder)
+        if candidate:
+            report(f"形态学清理命中: {candidate.label}")
+    
+    if not results and deblur:
+        # 去模糊用未经对比度拉伸的灰度图
+        results, candidate = scan_deblurred(img.convert("L"), decoder, deblur_method, size=processed_img.size)
+        if candidate:
+            report(f"去模糊命中: {candidate.label}")
+    
+    if not results and transforms:
+        results, warp = scan_transformed(processed_img, decoder)
+        if warp:
+            report(f"变换搜索命中: {warp.label}")
+    
+    if not results and repair:
+        results = scan_repaired(processed_img, decoder)
+    
+    records = to_records(results)
+    if records and (hidden or sequence):
+        try:
+            check_hidden(processed_img, records, hidden, sequence)
+        except Exception as e:
+            # 隐藏数据检查失败不影响识别结果
+            report(f"隐藏数据检查失败: {str(e)}")
+    return records
+
+
+def scan_file(file_path, enhance_level="auto", decoder=None, repair=False, hidden=False, transforms=False,
+              deblur=False, morph=False, sheet=False, sequence=False, limits=None, **options):
+    """
+    打开并扫描单个图片（路径或文件对象），识别流程和其余参数见 scan_loaded；
+    给出 limits（scan_guard.Limits）时先只读文件头检查大小
+    """
+    if limits:
+        scan_guard.check_image(file_path, limits)
+    with Image.open(file_path) as img:
+        return scan_loaded(img, enhance_level, decoder, repair, hidden, transforms, deblur, morph, sheet,
+                           sequence, **options)
+
+
+def decode_data(raw):
+    """将二维码原始字节解码为文本，返回 (文本, 编码)"""
+    try:
+        return raw.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        # latin-1 可以无损还原任意字节
+        return raw.decode('latin-1'), 'latin-1'
+
+
+# 符号类型和方向名称驻留为小整数，记录里只存编号
+SYMBOL_NAMES = []
+_SYMBOL_CODES = {}
+ORIENTATIONS = (None, "UP", "RIGHT", "DOWN", "LEFT")
+_ORIENTATION_CODES = {name: code for code, name in enumerate(ORIENTATIONS)}
+
+
+def symbol_code(name):
+    """返回符号类型名称对应的编号，新类型自动登记"""
+    code = _SYMBOL_CODES.get(name)
+    if code is None:
+        code = _SYMBOL_CODES[name] = len(SYMBOL_NAMES)
+        SYMBOL_NAMES.append(name)
+    return code
+
+
+class ScanRecord:
+    """
+    紧凑的单个解码结果，替代长期持有pyzbar的Decoded对象
+    geometry 把 rect(左,上,宽,高) 和多边形顶点坐标打包成一个 int32 字节串
+    """
+    __slots__ = ("source_id", "symbol", "data", "geometry", "quality", "orientation", "hidden", "sequence")
+    
+    def __init__(self, source_id, symbol, data, geometry, quality=0, orientation=0, hidden=(), sequence=None):
+        self.source_id = source_id
+        self.symbol = symbol
+        self.data = data
+        self.geometry = geometry
+        self.quality = quality
+        self.orientation = orientation
+        # 隐藏数据检查的结果 (qr_decode.HiddenData, ...)
+        self.hidden = hidden
+        # 结构链接头 (序号, 总数, 奇偶校验)
+        self.sequence = sequence
+    
+    @classmethod
+    def from_decoded(cls, obj, source_id=-1):
+        """从pyzbar的Decoded对象（或同结构的namedtuple）创建记录"""
+        coords = [int(v) for v in obj.rect]
+        for point in obj.polygon:
+            coords.append(int(point[0]))
+            coords.append(int(point[1]))
+        return cls(source_id, symbol_code(obj.type), bytes(obj.data),
+                   struct.pack(f"<{len(coords)}i", *coords),
+                   int(getattr(obj, "quality", 0) or 0),
+                   _ORIENTATION_CODES.get(getattr(obj, "orientation", None), 0))
+    
+    @property
+    def type(self):
+        return SYMBOL_NAMES[self.symbol]
+    
+    @property
+    def rect(self):
+        return struct.unpack_from("<4i", self.geometry)
+    
+    @property
+    def polygon(self):
+        coords = struct.unpack(f"<{len(self.geometry) // 4}i", self.geometry)[4:]
+        return list(zip(coords[0::2], coords[1::2]))
+    
+    @property
+    def text(self):
+        """数据的文本形式（utf-8，失败时latin-1）"""
+        return decode_data(self.data)[0]
+    
+    def __reduce__(self):
+        # 符号类型编号只在本进程内有效，跨进程传递（扫描工作进程）时按名称重新登记
+        return _restore_record, (self.source_id, self.type, self.data, self.geometry, self.quality,
+                                 self.orientation, self.hidden, self.sequence)
+    
+    def dedupe_key(self):
+        return (self.symbol, self.data)
+    
+    def to_dict(self, sources=None):
+        """转换为可序列化的字典；给出来源表时附带来源路径"""
+        data, encoding = decode_data(self.data)
+        result = {
+            "type": self.type,
+            "data": data,
+            "encoding": encoding,
+            "rect": list(self.rect),
+            "polygon": [list(point) for point in self.polygon],
+            "quality": self.quality,
+            "orientation": ORIENTATIONS[self.orientation],
+        }
+        if self.hidden:
+            result["hidden"] = [{"kind": kind, "detail": detail, "hex": data.hex()}
+                                for kind, detail, data in self.hidden]
+        if self.sequence:
+            result["sequence"] = dict(zip(("index", "total", "parity"), self.sequence))
+        # base64、hex、压缩等编码的解码结果（按内容缓存，重复的载荷不重复解码）
+        decoded = payload_decode.decode_payload(self.data)
+        if decoded:
+            result["decoded"] = payload_decode.to_dicts(decoded)
+        if sources is not None and self.source_id >= 0:
+            result["source"] = sources[self.source_id]
+        return result
+    
+    def __repr__(self):
+        return f"ScanRecord({self.type}, {self.data!r}, source={self.source_id})"
+
+
+class SourceTable:
+    """来源路径驻留表：相同路径只保存一份，记录中只存整数编号"""
+    def __init__(self):
+        self.paths = []
+        self.ids = {}
+    
+    def intern(self, path):
+        source_id = self.ids.get(path)
+        if source_id is None:
+            source_id = self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        return source_id
+    
+    def __getitem__(self, source_id):
+        return self.paths[source_id]
+    
+    def __len__(self):
+        return len(self.paths)
+
+
+class ScanResults:
+    """批量扫描的结果集合，可保留、排序、去重和导出"""
+    def __init__(self):
+        self.sources = SourceTable()
+        self.records = []
+    
+    def add(self, path, results):
+        """加入一个文件的结果，返回归属到该来源的记录列表"""
+        source_id = self.sources.intern(path)
+        added = []
+        for obj in results:
+            if isinstance(obj, ScanRecord):
+                obj.source_id = source_id
+            else:
+                obj = ScanRecord.from_decoded(obj, source_id)
+            added.append(obj)
+        self.records.extend(added)
+        return added
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def __iter__(self):
+        return iter(self.records)
+    
+    def sorted(self, by="source"):
+        """按来源顺序、类型或数据排序，返回新列表"""
+        if by == "data":
+            key = lambda r: r.data
+        elif by == "type":
+            key = lambda r: (r.symbol, r.source_id)
+        else:
+            key = lambda r: r.source_id
+        return sorted(self.records, key=key)
+    
+    def symbol_counts(self):
+        """按码制统计识别数量，返回 {类型名称: 数量}"""
+        counts = [0] * len(SYMBOL_NAMES)
+        for record in self.records:
+            counts[record.symbol] += 1
+        return {SYMBOL_NAMES[code]: count for code, count in enumerate(counts) if count}
+    
+    def deduplicated(self):
+        """按 (类型, 数据) 去重，保留最先出现的记录"""
+        seen = set()
+        unique = []
+        for record in self.records:
+            key = record.dedupe_key()
+            if key not in seen:
+                seen.add(key)
+                unique.append(record)
+        return unique
+    
+    def iter_dicts(self, records=None):
+        """逐条导出为带来源路径的字典"""
+        for record in (self.records if records is None else records):
+            yield record.to_dict(self.sources)
+
+
+def _restore_record(source_id, symbol, data, geometry, quality, orientation, hidden, sequence):
+    return ScanRecord(source_id, symbol_code(symbol), data, geometry, quality, orientation, hidden, sequence)
+
+
+def to_records(results, source_id=-1):
+    """将pyzbar解码结果列表转换为紧凑记录"""
+    return [obj if isinstance(obj, ScanRecord) else ScanRecord.from_decoded(obj, source_id)
+            for obj in results]
+
+
+def result_to_dict(obj):
+    """将解码结果（ScanRecord或pyzbar的Decoded）转换为可序列化的字典"""
+    # 作为脚本运行时工作进程传回的记录是 scan_engine 模块里的 ScanRecord，按有无 to_dict 判断
+    if not hasattr(obj, "to_dict"):
+        obj = ScanRecord.from_decoded(obj)
+    return obj.to_dict()
+
+
+def make_entry(index, path, results=None, error=None, extra=None):
+    """生成一条文件处理记录（检查点与分片结果共用此格式）"""
+    entry = {"i": index, "path": path}
+    if error is not None:
+        entry["error"] = str(error)
+    else:
+        entry["results"] = [result_to_dict(obj) for obj in (results or [])]
+    if extra:
+        entry.update(extra)
+    return entry
+
+
+def sort_files(file_list, sort_order):
+    """按指定方式排序文件列表"""
+    if sort_order == "none":
+        return file_list
+    
+    try:
+        if sort_order == "numeric":
+            # 自然排序（数字顺序）
+            return natsort.natsorted(file_list, key=lambda x: os.path.basename(x))
+        elif sort_order == "alphabetical":
+            # 字母顺序
+            return sorted(file_list, key=lambda x: os.path.basename(x))
+    except Exception:
+        # 如果排序失败，返回原始列表
+        return file_list
+    
+    return file_list
+
+
+def get_image_files(folder_path):
+    """递归获取文件夹中的所有图片文件"""
+    image_files = []
+    
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                image_files.append(os.path.join(root, file))
+    
+    return image_files
+
+
+class ScanJob:
+    """
+    可断点续扫的批量扫描任务
+    任务目录结构:
+        job.json          任务描述（模式、源路径、排序方式、文件数），创建后不再改写
+        files.txt         排序后的文件列表，每行一个，行号即文件序号
+        checkpoint.jsonl  检查点，每处理完一个文件追加一行，只追加不改写
+    """
+    MANIFEST_NAME = "job.json"
+    FILE_LIST_NAME = "files.txt"
+    CHECKPOINT_NAME = "checkpoint.jsonl"
+    
+    def __init__(self, job_dir, fsync_interval=5.0):
+        self.job_dir = job_dir
+        self.fsync_interval = fsync_interval
+        self.info = {}
+        self.files = []
+        self.completed = bytearray()  # 每个文件一个字节，1表示已处理
+        self.done_count = 0
+        self.failed_count = 0
+        self.finished = False
+        self._checkpoint = None
+        self._last_fsync = time.monotonic()
+    
+    @property
+    def total(self):
+        return len(self.files)
+    
+    @classmethod
+    def create(cls, jobs_root, mode, source, file_list, sort_order="none", options=None):
+        """新建任务目录并写入文件清单"""
+        job_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-") + mode
+        job_dir = os.path.join(jobs_root, job_id)
+        suffix = 1
+        while os.path.exists(job_dir):
+            job_dir = os.path.join(jobs_root, f"{job_id}-{suffix}")
+            suffix += 1
+        os.makedirs(job_dir)
+        
+        job = cls(job_dir)
+        job.files = list(file_list)
+        job.completed = bytearray(len(job.files))
+        job.info = {
+            "id": os.path.basename(job_dir),
+            "mode": mode,
+            "source": source,
+            "sort_order": sort_order,
+            "total": len(job.files),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "options": options or {},
+        }
+        
+        with open(os.path.join(job_dir, cls.FILE_LIST_NAME), "w", encoding="utf-8") as f:
+            for path in job.files:
+                f.write(path + "\n")
+        # 清单最后写入，存在 job.json 即说明文件列表完整
+        with open(os.path.join(job_dir, cls.MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(job.info, f, ensure_ascii=False, indent=2)
+        
+        job._open_checkpoint()
+        return job
+    
+    @classmethod
+    def load(cls, job_dir, readonly=False):
+        """加载已有任务，重放检查点以确定剩余文件；readonly 时只读取清单"""
+        job = cls(job_dir)
+        with open(os.path.join(job_dir, cls.MANIFEST_NAME), "r", encoding="utf-8") as f:
+            job.info = json.load(f)
+        with open(os.path.join(job_dir, cls.FILE_LIST_NAME), "r", encoding="utf-8") as f:
+            job.files = [line.rstrip("\n") for line in f]
+        job.completed = bytearray(len(job.files))
+        
+        checkpoint_path = os.path.join(job_dir, cls.CHECKPOINT_NAME)
+        valid_size = 0
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时最后一行可能只写了一半
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    valid_size += len(line)
+                    job._replay(entry)
+            
+            # 截掉不完整的尾行，保证后续追加的内容仍是合法的JSONL
+            if not readonly and valid_size != os.path.getsize(checkpoint_path):
+                with open(checkpoint_path, "r+b") as f:
+                    f.truncate(valid_size)
+        
+        if not readonly and not job.finished:
+            job._open_checkpoint()
+        return job
+    
+    @staticmethod
+    def list_jobs(jobs_root, include_finished=False):
+        """列出任务根目录下的任务，默认只返回未完成的"""
+        jobs = []
+        if not os.path.isdir(jobs_root):
+            return jobs
+        
+        for name in sorted(os.listdir(jobs_root)):
+            job_dir = os.path.join(jobs_root, name)
+            if not os.path.exists(os.path.join(job_dir, ScanJob.MANIFEST_NAME)):
+                continue
+            try:
+                job = ScanJob.load(job_dir, readonly=True)
+            except Exception:
+                continue
+            if include_finished or not job.finished:
+                jobs.append(job)
+        return jobs
+    
+    def _replay(self, entry):
+        """根据一条检查点记录更新任务状态"""
+        if entry.get("event") == "finished":
+            self.finished = True
+            return
+        
+        index = entry.get("i")
+        if index is None or not 0 <= index < len(self.completed) or self.completed[index]:
+            return
+        self.completed[index] = 1
+        self.done_count += 1
+        if entry.get("error") is not None:
+            self.failed_count += 1
+    
+    def _open_checkpoint(self):
+        self._checkpoint = open(os.path.join(self.job_dir, self.CHECKPOINT_NAME), "a", encoding="utf-8")
+    
+    def pending(self):
+        """按清单顺序迭代尚未处理的 (序号, 文件路径)"""
+        for index, path in enumerate(self.files):
+            if not self.completed[index]:
+                yield index, path
+    
+    def record(self, index, path, results=None, error=None, extra=None):
+        """追加一条文件处理结果到检查点"""
+        entry = make_entry(index, path, results, error, extra)
+        self._checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._checkpoint.flush()
+        self._replay(entry)
+        
+        # 写入只交给操作系统缓存，按时间间隔落盘，避免每个文件一次fsync
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._checkpoint.fileno())
+            self._last_fsync = now
+    
+    def iter_entries(self):
+        """重放检查点中的所有文件记录"""
+        checkpoint_path = os.path.join(self.job_dir, self.CHECKPOINT_NAME)
+        if not os.path.exists(checkpoint_path):
+            return
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if "i" in entry:
+                    yield entry
+    
+    def finish(self):
+        """标记任务全部完成"""
+        if self._checkpoint and not self.finished:
+            self._checkpoint.write(json.dumps({"event": "finished"}) + "\n")
+            self.finished = True
+        self.close()
+    
+    def close(self):
+        """落盘并关闭检查点文件"""
+        if self._checkpoint:
+            self._checkpoint.flush()
+            os.fsync(self._checkpoint.fileno())
+            self._checkpoint.close()
+            self._checkpoint = None
+
+
+class ShardedScan:
+    """
+    多机分片扫描：多台机器挂载同一个任务目录，按租约领取文件块
+    共享目录结构（在 ScanJob 任务目录下）:
+        leases/chunk-00012.lease   租约文件，独占创建即为领取，心跳刷新修改时间
+        shards/chunk-00012.jsonl   已完成文件块的结果，写完后原子改名
+    文件块按 files.txt 的顺序连续划分，按块号拼接即为原排序顺序
+    """
+    LEASE_DIR = "leases"
+    SHARD_DIR = "shards"
+    DEFAULT_CHUNK_SIZE = 200
+    
+    def __init__(self, job_dir, lease_ttl=300.0, worker_id=None, read_ahead_bytes=read_ahead.MAX_BYTES):
+        self.job = ScanJob.load(job_dir, readonly=True)
+        self.job_dir = job_dir
+        self.lease_ttl = lease_ttl
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        # 预读缓存占用本机内存，由各工作进程自己设定，不写入任务
+        self.read_ahead_bytes = read_ahead_bytes
+        options = self.job.info.get("options", {})
+        self.chunk_size = int(options.get("chunk_size", self.DEFAULT_CHUNK_SIZE))
+        self.limits = scan_guard.Limits(options.get("max_pixels", scan_guard.MAX_PIXELS),
+                                        options.get("max_bytes", scan_guard.MAX_BYTES))
+        self.chunk_count = math.ceil(self.job.total / self.chunk_size)
+        os.makedirs(os.path.join(job_dir, self.LEASE_DIR), exist_ok=True)
+        os.makedirs(os.path.join(job_dir, self.SHARD_DIR), exist_ok=True)
+    
+    def lease_path(self, chunk):
+        return os.path.join(self.job_dir, self.LEASE_DIR, f"chunk-{chunk:05d}.lease")
+    
+    def shard_path(self, chunk):
+        return os.path.join(self.job_dir, self.SHARD_DIR, f"chunk-{chunk:05d}.jsonl")
+    
+    def chunk_range(self, chunk):
+        start = chunk * self.chunk_size
+        return start, min(start + self.chunk_size, self.job.total)
+    
+    def is_done(self, chunk):
+        return os.path.exists(self.shard_path(chunk))
+    
+    def lease_expired(self, chunk):
+        """租约心跳超时（持有者已退出或失联）"""
+        try:
+            return time.time() - os.stat(self.lease_path(chunk)).st_mtime > self.lease_ttl
+        except FileNotFoundError:
+            return True
+    
+    def try_claim(self, chunk):
+        """尝试领取文件块，成功返回True"""
+        lease_path = self.lease_path(chunk)
+        if os.path.exists(lease_path):
+            if not self.lease_expired(chunk) or not self.reclaim(chunk):
+                return False
+        
+        # 独占创建是最终裁决：回收后其他进程抢先创建了租约时这里失败
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker_id, "chunk": chunk, "claimed": time.time()}, f)
+        
+        # 领取期间其他进程可能已经完成了这个块
+        if self.is_done(chunk):
+            self.release(chunk)
+            return False
+        return True
+    
+    def reclaim(self, chunk):
+        """
+        回收过期租约，返回是否由本进程回收
+        改名到本次唯一的文件名是原子操作，同一个租约文件只有一个进程能改名成功；
+        改名前租约可能已被刷新或被别的进程回收后重新领取，所以改名后再检查拿到的是否确实过期，
+        拿到有效租约时不覆盖地放回原处并放弃
+        """
+        lease_path = self.lease_path(chunk)
+        stale_path = f"{lease_path}.stale-{self.worker_id}-{os.urandom(4).hex()}"
+        try:
+            os.rename(lease_path, stale_path)
+        except OSError:
+            return False
+        try:
+            if time.time() - os.stat(stale_path).st_mtime > self.lease_ttl:
+                return True
+            try:
+                os.link(stale_path, lease_path)
+            except OSError:
+                # 已有新租约或文件系统不支持硬链接：原持有者在下次心跳时发现租约丢失并放弃该块
+                pass
+            return False
+        finally:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+    
+    def owns(self, chunk):
+        """检查租约是否仍归本进程所有"""
+        try:
+            with open(self.lease_path(chunk), "r", encoding="utf-8") as f:
+                return json.load(f).get("worker") == self.worker_id
+        except (OSError, ValueError):
+            return False
+    
+    def renew(self, chunk):
+        """刷新租约心跳，租约已被回收时返回False"""
+        if not self.owns(chunk):
+            return False
+        try:
+            os.utime(self.lease_path(chunk), None)
+        except OSError:
+            return False
+        return True
+    
+    def release(self, chunk):
+        """释放租约"""
+        if self.owns(chunk):
+            try:
+                os.remove(self.lease_path(chunk))
+            except OSError:
+                pass
+    
+    def process_chunk(self, chunk, enhance_level="auto", stop_event=None, decoder=None, repair=False, hidden=False,
+                      transforms=False, deblur=False, morph=False, sheet=False, sequence=False, guard=None):
+        """
+        扫描一个文件块并提交结果，租约丢失或被停止时放弃
+        给出 guard（scan_guard.GuardedPool）时在可终止的工作进程中扫描，单个文件超时不会卡住整个块
+        """
+        lost = threading.Event()
+        done = threading.Event()
+        
+        def heartbeat():
+            while not done.wait(self.lease_ttl / 3):
+                if not self.renew(chunk):
+                    lost.set()
+                    return
+        
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        
+        start, end = self.chunk_range(chunk)
+        stopped = scan_guard.AnyEvent(lost, stop_event)
+        tasks = ((index, self.job.files[index]) for index in range(start, end))
+        if guard:
+            scanned = ((r.index, r.path, r.results, r.error) for r in guard.imap(tasks, stopped))
+        else:
+            def scan_in_process():
+                for index, path, data in read_ahead.prefetch(tasks, self.read_ahead_bytes):
+                    try:
+                        yield index, path, scan_file(read_ahead.open_source(path, data), enhance_level, decoder,
+                                                     repair, hidden, transforms, deblur, morph, sheet, sequence,
+                                                     self.limits), None
+                    except Exception as e:
+                        yield index, path, None, e
+            scanned = scan_in_process()
+        tmp_path = f"{self.shard_path(chunk)}.tmp-{self.worker_id}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for index, path, results, error in scanned:
+                    if stopped.is_set():
+                        return False
+                    if error is None:
+                        entry = make_entry(index, path, results)
+                    else:
+                        entry = make_entry(index, path, error=error)
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                if stopped.is_set():
+                    return False
+                f.flush()
+                os.fsync(f.fileno())
+            
+            # 改名提交；即使两个进程都完成了同一块，结果内容也相同
+            os.replace(tmp_path, self.shard_path(chunk))
+            return True
+        finally:
+            done.set()
+            heartbeat_thread.join()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.release(chunk)
+    
+    def run(self, stop_event=None, poll_interval=10.0, log=print):
+        """工作进程主循环：不断领取未完成的块，直到所有块都有结果"""
+        options = self.job.info.get("options", {})
+        decoder = decoders.create_chain(options.get("backends", ["pyzbar"]), options.get("strategy", "cheapest"),
+                                        options.get("symbols"), stop_after_first=options.get("stop_after_first", False))
+        guard = None
+        if options.get("timeout"):
+            scan_options = {key: options.get(key, False)
+                            for key in ("repair", "hidden", "transforms", "deblur", "morph", "sheet", "sequence")}
+            scan_options["enhance_level"] = options.get("enhance_level", "auto")
+            guard = scan_guard.GuardedPool(
+                options.get("workers"), options["timeout"], scan_options,
+                {"names": options.get("backends", ["pyzbar"]), "strategy": options.get("strategy", "cheapest"),
+                 "symbols": options.get("symbols"), "stop_after_first": options.get("stop_after_first", False)},
+                self.limits, log=lambda message: log(f"[{self.worker_id}] {message}"),
+                read_ahead=self.read_ahead_bytes)
+        try:
+            return self._run(options.get("enhance_level", "auto"), decoder, options.get("repair", False),
+                             options.get("hidden", False), options.get("transforms", False),
+                             options.get("deblur", False), options.get("morph", False),
+                             options.get("sheet", False), options.get("sequence", False), guard, stop_event,
+                             poll_interval, log)
+        finally:
+            if guard:
+                guard.close()
+                decoder.merge_stats(guard.decoder_stats())
+            if decoder.summary():
+                log(f"[{self.worker_id}] 解码器统计: {decoder.summary()}")
+            decoder.close()
+            payload_decode.clear_cache()
+    
+    def _run(self, enhance_level, decoder, repair, hidden, transforms, deblur, morph, sheet, sequence, guard,
+             stop_event, poll_interval, log):
+        while not (stop_event and stop_event.is_set()):
+            claimed_any = False
+            remaining = 0
+            for chunk in range(self.chunk_count):
+                if stop_event and stop_event.is_set():
+                    break
+                if self.is_done(chunk):
+                    continue
+                remaining += 1
+                if not self.try_claim(chunk):
+                    continue
+                claimed_any = True
+                start, end = self.chunk_range(chunk)
+                log(f"[{self.worker_id}] 领取块 {chunk} ({start}-{end - 1})")
+                if self.process_chunk(chunk, enhance_level, stop_event, decoder, repair, hidden, transforms,
+                                      deblur, morph, sheet, sequence, guard):
+                    remaining -= 1
+                    log(f"[{self.worker_id}] 完成块 {chunk}")
+                else:
+                    log(f"[{self.worker_id}] 放弃块 {chunk}")
+            
+            if remaining == 0:
+                return True
+            if not claimed_any:
+                # 剩余块都被其他机器持有，等待它们完成或租约过期
+                time.sleep(poll_interval)
+        return False
+    
+    def status(self):
+        """统计各文件块状态"""
+        counts = {"done": 0, "leased": 0, "expired": 0, "pending": 0}
+        for chunk in range(self.chunk_count):
+            if self.is_done(chunk):
+                counts["done"] += 1
+            elif not os.path.exists(self.lease_path(chunk)):
+                counts["pending"] += 1
+            elif self.lease_expired(chunk):
+                counts["expired"] += 1
+            else:
+                counts["leased"] += 1
+        return counts
+    
+    def iter_merged(self):
+        """按块号（即原排序顺序）依次读出各分片结果，返回缺失的块号列表"""
+        missing = []
+        for chunk in range(self.chunk_count):
+            if not self.is_done(chunk):
+                missing.append(chunk)
+                continue
+            with open(self.shard_path(chunk), "r", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        return missing
+    
+    def merge(self, output_path):
+        """合并所有分片结果到一个JSONL文件，返回缺失的块号列表"""
+        merged = self.iter_merged()
+        with open(output_path, "w", encoding="utf-8") as f:
+            while True:
+                try:
+                    entry = next(merged)
+                except StopIteration as stop:
+                    return stop.value
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    def assemble(self, file_numbers=False):
+        """
+        按排序顺序读出已完成的分片结果，拼接分片数据，返回 (qr_sequence.SequenceAssembler, 缺失的块号列表)
+        file_numbers=True 时没有序号标记的结果也按文件名编号拼接
+        """
+        assembler = qr_sequence.SequenceAssembler(file_numbers)
+        merged = self.iter_merged()
+        while True:
+            try:
+                entry = next(merged)
+            except StopIteration as stop:
+                return assembler, stop.value
+            for result in entry.get("results", []):
+                raw = result["data"].encode(result.get("encoding", "utf-8"))
+                sequence = result.get("sequence")
+                structured = (sequence["index"], sequence["total"], sequence["parity"]) if sequence else None
+                assembler.add(raw, entry.get("path"), structured)
+
+
+def main(argv=None):
+    """命令行入口：创建共享任务、运行分片工作进程、查看状态、合并结果"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="二维码批量扫描（无界面）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    create_parser = sub.add_parser("create", help="为文件夹创建共享扫描任务")
+    create_parser.add_argument("folder")
+    create_parser.add_argument("--jobs-dir", default="scan_jobs")
+    create_parser.add_argument("--sort", default="numeric", choices=["none", "numeric", "alphabetical"])
+    create_parser.add_argument("--chunk-size", type=int, default=ShardedScan.DEFAULT_CHUNK_SIZE)
+    create_parser.add_argument("--enhance", default="auto", choices=["off", "auto", "medium", "strong"])
+    create_parser.add_argument("--backends", default="pyzbar",
+                               help=f"逗号分隔的解码后端，可选: {','.join(decoders.BACKENDS)}")
+    create_parser.add_argument("--strategy", default="cheapest", choices=decoders.STRATEGIES)
+    create_parser.add_argument("--symbols", default="QRCODE",
+                               help="逗号分隔的码制（按优先级），如 QRCODE,DATAMATRIX,PDF417")
+    create_parser.add_argument("--stop-after-first", action="store_true", help="找到一种码制后不再尝试其余码制")
+    create_parser.add_argument("--sheet", action="store_true", help="多码页面：分块并行识别并去除重复结果")
+    create_parser.add_argument("--morph", action="store_true", help="识别失败时尝试形态学清理（网点、圆点、艺术码）")
+    create_parser.add_argument("--deblur", action="store_true", help="识别失败时尝试FFT反卷积去模糊")
+    create_parser.add_argument("--transforms", action="store_true", help="识别失败时搜索镜像、旋转、剪切和透视变换")
+    create_parser.add_argument("--repair", action="store_true", help="识别失败时尝试定位图案修复")
+    create_parser.add_argument("--hidden", action="store_true", help="检查QR码填充、终止符之后和纠错码字中的隐藏数据")
+    create_parser.add_argument("--sequence", action="store_true", help="读出QR码的结构链接头，供 assemble 拼接分片")
+    create_parser.add_argument("--timeout", type=float, default=0,
+                               help="单个文件的处理时间上限（秒）；大于0时在可终止的工作进程中扫描，超时的进程被杀掉重启")
+    create_parser.add_argument("--workers", type=int, help="工作进程数（配合 --timeout），默认CPU核数减1")
+    create_parser.add_argument("--max-pixels", type=int, default=scan_guard.MAX_PIXELS,
+                               help="像素数上限，只读文件头检查，超过的文件不做完整解码；0为不限制")
+    create_parser.add_argument("--max-mb", type=float, default=scan_guard.MAX_BYTES / 1024 / 1024,
+                               help="文件大小上限（MB）；0为不限制")
+    
+    worker_parser = sub.add_parser("worker", help="领取并处理任务中的文件块")
+    worker_parser.add_argument("job_dir")
+    worker_parser.add_argument("--lease-ttl", type=float, default=300.0)
+    worker_parser.add_argument("--worker-id")
+    worker_parser.add_argument("--read-ahead-mb", type=float, default=read_ahead.MAX_BYTES / 1024 / 1024,
+                               help="预读缓存上限（MB），读文件和解码并行进行，适合网络文件系统；0为不预读")
+    
+    status_parser = sub.add_parser("status", help="查看任务各文件块状态")
+    status_parser.add_argument("job_dir")
+    
+    merge_parser = sub.add_parser("merge", help="按排序顺序合并分片结果")
+    merge_parser.add_argument("job_dir")
+    merge_parser.add_argument("-o", "--output", default="merged.jsonl")
+    
+    assemble_parser = sub.add_parser("assemble", help="按结构链接、序号前缀（或文件编号）拼接分片数据")
+    assemble_parser.add_argument("job_dir")
+    assemble_parser.add_argument("-o", "--output-dir", help="每个序列拼出的数据写入该目录")
+    assemble_parser.add_argument("--file-numbers", action="store_true",
+                                 help="没有序号标记的结果也按文件名编号拼接（不会报告为完整）")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "create":
+        files = sort_files(get_image_files(args.folder), args.sort)
+        job = ScanJob.create(args.jobs_dir, "folder", os.path.abspath(args.folder), files,
+                             sort_order=args.sort,
+                             options={"chunk_size": args.chunk_size, "enhance_level": args.enhance,
+                                      "backends": args.backends.split(","), "strategy": args.strategy,
+                                      "symbols": args.symbols.split(","),
+                                      "stop_after_first": args.stop_after_first, "repair": args.repair,
+                                      "hidden": args.hidden, "transforms": args.transforms,
+                                      "deblur": args.deblur, "morph": args.morph,
+                                      "sheet": args.sheet, "sequence": args.sequence,
+                                      "timeout": args.timeout, "workers": args.workers,
+                                      "max_pixels": args.max_pixels,
+                                      "max_bytes": int(args.max_mb * 1024 * 1024)})
+        job.close()
+        print(job.job_dir)
+    
+    elif args.command == "worker":
+        sharded = ShardedScan(args.job_dir, lease_ttl=args.lease_ttl, worker_id=args.worker_id,
+                              read_ahead_bytes=int(args.read_ahead_mb * 1024 * 1024))
+        sharded.run()
+    
+    elif args.command == "status":
+        sharded = ShardedScan(args.job_dir)
+        counts = sharded.status()
+        print(f"共 {sharded.chunk_count} 块: 完成 {counts['done']}，处理中 {counts['leased']}，"
+              f"租约过期 {counts['expired']}，未领取 {counts['pending']}")
+    
+    elif args.command == "merge":
+        missing = ShardedScan(args.job_dir).merge(args.output)
+        if missing:
+            print(f"缺少 {len(missing)} 个块的结果: {missing[:20]}")
+            return 1
+        print(f"已合并到 {args.output}")
+    
+    elif args.command == "assemble":
+        assembler, missing = ShardedScan(args.job_dir).assemble(args.file_numbers)
+        if missing:
+            print(f"缺少 {len(missing)} 个块的结果，拼接可能不完整: {missing[:20]}")
+        sequences = assembler.sequences()
+        if not sequences:
+            print("没有找到分片序列")
+            return 1
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        for number, group in enumerate(sequences, 1):
+            print(group.report())
+            payload = group.payload()
+            if args.output_dir:
+                path = os.path.join(args.output_dir, f"sequence-{number:03d}.bin")
+                with open(path, "wb") as f:
+                    f.write(payload)
+                print(f"  已写入 {path}")
+            else:
+                text = decode_data(payload[:qr_sequence.PREVIEW_LIMIT])[0]
+                if len(payload) > qr_sequence.PREVIEW_LIMIT:
+                    text += f"…（共 {len(payload)} 字节，完整数据请用 -o 写入文件）"
+                print(f"  {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
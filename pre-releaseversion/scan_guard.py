@@ -0,0 +1,461 @@
+"""
+异常输入防护
+一张损坏的或 20000×20000 的PNG就能让批量扫描卡住几分钟，停止按钮也要等这个文件处理完才生效。
+这里先只读文件头检查文件大小和像素数，超过上限的文件直接拒绝（不做完整解码）；
+批量扫描时每个文件交给独立的工作进程处理，父进程里的看门狗按截止时间等待结果，
+超时或崩溃的工作进程直接杀掉重启并记录出问题的文件，其余工作进程照常处理后面的文件，
+结果仍按输入顺序交出（也可按完成顺序交出，配合 schedule 按估计代价先处理小文件）
+"""
+import os
+import io
+import math
+import time
+import warnings
+import threading
+import collections
+import multiprocessing
+import concurrent.futures
+from multiprocessing.connection import wait
+from collections import namedtuple
+
+from PIL import Image
+
+import read_ahead
+
+try:
+    import resource  # 仅Unix，用于限制工作进程的内存
+except ImportError:
+    resource = None
+
+# 默认上限：像素数、文件字节数、单个文件的处理时间（秒）
+MAX_PIXELS = 100_000_000
+MAX_BYTES = 200 * 1024 * 1024
+FILE_TIMEOUT = 60.0
+
+# 按代价排队时，估计代价相差不到该倍数的文件分在同一档，同档内保持原顺序
+COST_BUCKET = 4
+
+# 按代价排队的滑动窗口：只在后面这么多个文件中挑代价小的，不必等所有文件头读完才开始扫描
+SCHEDULE_WINDOW = 256
+
+# max_pixels / max_bytes 为0表示不限制
+Limits = namedtuple("Limits", ["max_pixels", "max_bytes"])
+DEFAULT_LIMITS = Limits(MAX_PIXELS, MAX_BYTES)
+
+# 每个文件的处理结果；error 为错误信息，timed_out 表示被看门狗终止
+GuardedResult = namedtuple("GuardedResult", ["index", "path", "results", "error", "elapsed", "timed_out"])
+
+
+class ImageRejected(ValueError):
+    """文件超过大小或像素上限、或文件头无法识别，未做完整解码"""
+
+
+class AnyEvent:
+    """任一事件置位即视为置位（None 忽略），用于合并停止请求和租约丢失等多个停止条件"""
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+    
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
+
+
+def _file_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def check_image(source, limits=DEFAULT_LIMITS):
+    """
+    只读文件头检查图片（路径或文件对象），返回 (宽, 高)；超过上限时抛出 ImageRejected
+    像素数由 limits 判断，Pillow 自带的解压炸弹警告忽略，错误也转换为 ImageRejected
+    """
+    size = _file_size(source)
+    if limits.max_bytes and size > limits.max_bytes:
+        raise ImageRejected(f"文件过大: {size / 1024 / 1024:.1f}MB，上限 {limits.max_bytes / 1024 / 1024:.0f}MB")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            with Image.open(source) as img:
+                width, height = img.size
+        except Image.DecompressionBombError as e:
+            raise ImageRejected(f"像素数超过Pillow的解压炸弹上限: {e}") from None
+        except (OSError, SyntaxError) as e:
+            raise ImageRejected(f"无法识别的图片文件: {e}") from None
+        finally:
+            if not isinstance(source, (str, os.PathLike)):
+                source.seek(0)
+    if limits.max_pixels and width * height > limits.max_pixels:
+        raise ImageRejected(f"图片过大: {width}×{height}，超过 {limits.max_pixels / 1e6:.0f} 百万像素上限")
+    return width, height
+
+
+def estimate_cost(path):
+    """估计扫描代价：文件头中的像素数加文件字节数；文件头读不出时只算文件大小（这类文件检查时就会被拒绝）"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+        except Exception:
+            return size
+    return width * height + size
+
+
+def _cost_bucket(cost):
+    return int(math.log(cost, COST_BUCKET)) if cost > 1 else 0
+
+
+def schedule(items, window=SCHEDULE_WINDOW, threads=8):
+    """
+    按估计代价从小到大逐个交出 (序号, 路径)（短作业优先），只在滑动窗口内排序，第一个文件马上就能交出；
+    窗口内的文件头在线程池中并行读取，代价按 COST_BUCKET 倍分档，同档内保持原顺序；
+    在窗口里等过 window 次仍未交出的大文件优先交出，不会一直被推迟到最后
+    """
+    items = iter(items)
+    estimating = collections.deque()  # (位置, 项, 读文件头的任务)
+    ready = []  # (档, 位置, 项, 进入候选时已交出的个数)
+    position = yielded = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            while len(estimating) + len(ready) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                estimating.append((position, item, executor.submit(estimate_cost, item[1])))
+                position += 1
+            # 已读完文件头的移入候选，候选为空时等最前面的一个
+            if estimating and not ready:
+                concurrent.futures.wait([estimating[0][2]])
+            for entry in [entry for entry in estimating if entry[2].done()]:
+                estimating.remove(entry)
+                entry_position, item, future = entry
+                ready.append((_cost_bucket(future.result()), entry_position, item, yielded))
+            if not ready:
+                return
+            oldest = min(ready, key=lambda entry: entry[1])
+            chosen = oldest if yielded - oldest[3] >= window else min(ready, key=lambda entry: entry[:2])
+            ready.remove(chosen)
+            yielded += 1
+            yield chosen[2]
+
+
+def _worker_main(conn, scan_options, decoder_options, limits, memory_limit):
+    """
+    工作进程：逐个接收 (序号, 路径, 预读的数据或None)，检查后扫描，
+    发回 (序号, 结果记录, 错误信息, 耗时, 本进程解码链的累计统计)
+    """
+    import decoders
+    import scan_engine
+    
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    # 文件头检查已经按 limits 拒绝了过大的图片，完整解码时不再重复报警
+    Image.MAX_IMAGE_PIXELS = limits.max_pixels or None
+    decoder = decoders.create_chain(**decoder_options)
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            index, path, data = task
+            started = time.perf_counter()
+            try:
+                # 父进程预读到的数据直接交给Pillow，不再读文件
+                source = read_ahead.open_source(path, data)
+                check_image(source, limits)
+                results = scan_engine.scan_file(source, decoder=decoder, **scan_options)
+                conn.send((index, results, None, time.perf_counter() - started, decoder.snapshot_stats()))
+            except MemoryError:
+                conn.send((index, None, "内存不足（超过工作进程内存上限）", time.perf_counter() - started,
+                           decoder.snapshot_stats()))
+            except Exception as e:
+                conn.send((index, None, str(e), time.perf_counter() - started, decoder.snapshot_stats()))
+    finally:
+        decoder.close()
+
+
+class _Task:
+    """提交给进程池的一个文件，future 的结果为 GuardedResult"""
+    __slots__ = ("index", "path", "data", "future")
+    
+    def __init__(self, index, path, data):
+        self.index = index
+        self.path = path
+        self.data = data
+        self.future = concurrent.futures.Future()
+
+
+class _Worker:
+    """一个工作进程及其管道，记录正在处理的任务和截止时间"""
+    def __init__(self, context, args, serial):
+        self.serial = serial
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,) + args, daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.deadline = None
+        self.started = None
+    
+    def assign(self, task, timeout):
+        self.task = task
+        self.started = time.perf_counter()
+        self.deadline = time.monotonic() + timeout if timeout else None
+        data, task.data = task.data, None  # 发给工作进程后父进程不再保留
+        self.conn.send((task.index, task.path, data))
+    
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+    
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class GuardedPool:
+    """
+    带看门狗的扫描进程池
+    scan_options 为 scan_engine.scan_file 的关键字参数（不含 decoder），
+    decoder_options 为 decoders.create_chain 的关键字参数，各工作进程分别创建自己的解码链；
+    read_ahead 为 imap 预读缓存的字节数上限（0为不预读），预读的数据随任务发给工作进程。
+    工作进程在第一次提交任务时启动，之后一直复用（导入解码库和创建解码链的开销只有一次），
+    用完调用 close() 或用 with 语句；submit 可以在多个线程中同时调用
+    """
+    def __init__(self, workers=None, timeout=FILE_TIMEOUT, scan_options=None, decoder_options=None,
+                 limits=DEFAULT_LIMITS, memory_limit=None, log=print, read_ahead=0):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        # 图形界面和多线程的父进程不能安全地fork，统一用spawn启动
+        self.context = multiprocessing.get_context("spawn")
+        self.args = (scan_options or {}, decoder_options or {}, limits, memory_limit)
+        self.log = log
+        self.read_ahead = read_ahead
+        self.restarts = 0
+        self.timeouts = 0
+        # {工作进程编号: 该进程解码链的累计统计}，进程被杀掉后保留最后一次收到的统计
+        self.stats = {}
+        self.started_workers = 0
+        self.pool = []
+        self.queue = collections.deque()
+        self.cancelled = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        # 提交和取消任务时唤醒调度线程
+        self._wake_recv, self._wake_send = multiprocessing.Pipe(duplex=False)
+        self._woken = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _spawn(self):
+        self.started_workers += 1
+        return _Worker(self.context, self.args, self.started_workers)
+    
+    def _restart(self, worker):
+        worker.kill()
+        self.restarts += 1
+        replacement = self._spawn()
+        self.pool[self.pool.index(worker)] = replacement
+    
+    def _wake(self):
+        # 调用时已持有 self.lock；调度线程取走唤醒消息之前不重复发送，管道不会写满
+        if not self._woken:
+            self._woken = True
+            self._wake_send.send_bytes(b"\0")
+    
+    def decoder_stats(self):
+        """所有工作进程解码链统计的合计，格式同 decoders.DecoderChain.snapshot_stats"""
+        import decoders
+        
+        totals = {}
+        for stats in list(self.stats.values()):
+            for key, other in stats.items():
+                totals.setdefault(key, decoders.BackendStats()).add(other)
+        return totals
+    
+    def start(self):
+        """启动工作进程和调度线程（第一次提交任务时会自动启动）"""
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("扫描进程池已关闭")
+            if self.thread is None:
+                self.pool = [self._spawn() for _ in range(self.workers)]
+                self.thread = threading.Thread(target=self._dispatch, name="scan-guard", daemon=True)
+                self.thread.start()
+    
+    def submit(self, index, path, data=None):
+        """提交一个文件（data 为已读入内存的文件内容，可省略），返回 Future，结果为 GuardedResult"""
+        self.start()
+        task = _Task(index, path, data)
+        with self.lock:
+            self.queue.append(task)
+            self._wake()
+        return task.future
+    
+    def cancel(self, future):
+        """取消一个任务：还在排队的直接取消，正在处理的杀掉其工作进程"""
+        if future.cancel():
+            return
+        with self.lock:
+            if not future.done() and not self.closed:
+                self.cancelled.add(future)
+                self._wake()
+    
+    def _finish(self, worker, results, error, elapsed=None, timed_out=False):
+        task = worker.task
+        worker.task = None
+        if elapsed is None:
+            elapsed = time.perf_counter() - worker.started
+        task.future.set_result(GuardedResult(task.index, task.path, results, error, elapsed, timed_out))
+    
+    def _dispatch(self):
+        """调度线程：把排队的任务分给空闲的工作进程，收取结果，按截止时间杀掉超时的进程"""
+        while True:
+            with self.lock:
+                if self.closed:
+                    return
+                while self._wake_recv.poll():
+                    self._wake_recv.recv_bytes()
+                self._woken = False
+                cancelled, self.cancelled = self.cancelled, set()
+                assignments = []
+                for worker in self.pool:
+                    if worker.task is None:
+                        while self.queue:
+                            task = self.queue.popleft()
+                            if task.future.set_running_or_notify_cancel():
+                                assignments.append((worker, task))
+                                break
+            # 发送可能要等工作进程读走大块数据，不在锁内进行
+            for worker, task in assignments:
+                try:
+                    worker.assign(task, self.timeout)
+                except (OSError, ValueError):
+                    # 空闲时已经退出的工作进程
+                    self.log(f"工作进程已退出，已重启: {task.path}")
+                    self._restart(worker)
+                    self._finish(worker, None, "工作进程崩溃")
+            
+            for worker in [worker for worker in self.pool if worker.task]:
+                if worker.task.future in cancelled:
+                    self._restart(worker)
+                    self._finish(worker, None, "已取消")
+            
+            busy = [worker for worker in self.pool if worker.task]
+            deadlines = [worker.deadline for worker in busy if worker.deadline]
+            wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy]
+                         + [self._wake_recv], timeout=wait_time)
+            
+            for worker in busy:
+                path = worker.task.path
+                if worker.conn in ready:
+                    try:
+                        _, results, error, elapsed, stats = worker.conn.recv()
+                    except (EOFError, OSError):
+                        # 进程在发送结果前崩溃（如被系统因内存不足杀掉）
+                        self.log(f"工作进程崩溃，已重启: {path}")
+                        self._restart(worker)
+                        self._finish(worker, None, "工作进程崩溃")
+                    else:
+                        self.stats[worker.serial] = stats
+                        self._finish(worker, results, error, elapsed)
+                elif worker.process.sentinel in ready and not worker.process.is_alive():
+                    self.log(f"工作进程退出（代码 {worker.process.exitcode}），已重启: {path}")
+                    self._restart(worker)
+                    self._finish(worker, None, "工作进程崩溃")
+                elif worker.deadline and time.monotonic() >= worker.deadline:
+                    self.log(f"处理超过 {self.timeout:g} 秒，已终止并重启工作进程: {path}")
+                    self.timeouts += 1
+                    self._restart(worker)
+                    self._finish(worker, None, f"处理超时（{self.timeout:g}秒）", timed_out=True)
+    
+    def close(self):
+        """停止调度线程和所有工作进程；排队中的任务取消，正在处理的任务以“进程池已关闭”结束"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._wake_send.send_bytes(b"\0")
+        if self.thread:
+            self.thread.join()
+        for task in self.queue:
+            task.future.cancel()
+        self.queue.clear()
+        for worker in self.pool:
+            if worker.task:
+                self._finish(worker, None, "扫描进程池已关闭")
+                worker.kill()
+            else:
+                worker.stop()
+        self.pool = []
+        self._wake_send.close()
+        self._wake_recv.close()
+    
+    def imap(self, items, stop_event=None, ordered=True):
+        """
+        items 为 (序号, 路径) 序列，按输入顺序逐个产生 GuardedResult（ordered=False 时按完成顺序）；
+        同时在处理中的文件数约为工作进程数的两倍，后面的文件按需读取；
+        stop_event 置位后立即取消未完成的文件并杀掉正在处理它们的工作进程，不再等待
+        """
+        tasks = read_ahead.prefetch(items, self.read_ahead)
+        submitted = collections.deque()
+        in_flight = 2 * self.workers
+        exhausted = False
+        
+        def stopped():
+            return stop_event is not None and stop_event.is_set()
+        
+        try:
+            while True:
+                while not exhausted and not stopped() and sum(not f.done() for f in submitted) < in_flight:
+                    try:
+                        index, path, data = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    submitted.append(self.submit(index, path, data))
+                if not submitted or stopped():
+                    return
+                
+                # 等待时间有上限，停止请求能及时生效
+                if ordered:
+                    concurrent.futures.wait([submitted[0]], timeout=0.5)
+                    while submitted and submitted[0].done():
+                        yield submitted.popleft().result()
+                else:
+                    done, _ = concurrent.futures.wait(submitted, timeout=0.5,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in [future for future in submitted if future in done]:
+                        submitted.remove(future)
+                        yield future.result()
+        finally:
+            tasks.close()
+            for future in submitted:
+                self.cancel(future)
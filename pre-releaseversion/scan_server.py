@@ -0,0 +1,412 @@
+"""
+本地HTTP扫描服务
+供其他内部工具调用：上传图片（单张/multipart批量）或提交URL列表，返回JSON结果
+上传的图片先只读文件头检查像素数，解码在常驻的带看门狗的进程池（scan_guard.GuardedPool）中完成，
+解码库只在工作进程启动时导入一次；请求超时时正在解码的工作进程被杀掉重启，不再继续占用处理能力
+"""
+import os
+import sys
+import json
+import time
+import threading
+import collections
+import concurrent.futures
+from io import BytesIO
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import scan_guard
+
+
+class Histogram:
+    """简单的累积直方图（Prometheus 格式）"""
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, value):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+            self.total += 1
+            self.sum += value
+    
+    def render(self, name):
+        with self.lock:
+            lines = [f"# TYPE {name} histogram"]
+            for bound, count in zip(self.buckets, self.counts):
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {self.total}')
+            lines.append(f"{name}_sum {self.sum:.6f}")
+            lines.append(f"{name}_count {self.total}")
+        return lines
+
+
+class ScanMetrics:
+    """服务运行指标：请求数、图片数、拒绝/超时次数、延迟直方图和吞吐量"""
+    LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.request_latency = Histogram(self.LATENCY_BUCKETS)
+        self.decode_latency = Histogram(self.LATENCY_BUCKETS)
+        self.recent_images = collections.deque()  # 最近60秒内完成的图片时间戳
+        self.started = time.time()
+    
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+    
+    def image_done(self, decode_seconds):
+        self.decode_latency.observe(decode_seconds)
+        now = time.monotonic()
+        with self.lock:
+            self.counters["images_total"] += 1
+            self.recent_images.append(now)
+    
+    def throughput(self, window=60.0):
+        """最近 window 秒内每秒完成的图片数"""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent_images and now - self.recent_images[0] > window:
+                self.recent_images.popleft()
+            return len(self.recent_images) / window
+    
+    def render(self, queue_depth, queue_limit):
+        lines = []
+        with self.lock:
+            counters = dict(self.counters)
+        for name in ("requests_total", "images_total", "errors_total", "rejected_total", "timeouts_total"):
+            lines.append(f"# TYPE qrscan_{name} counter")
+            lines.append(f"qrscan_{name} {counters.get(name, 0)}")
+        lines.append("# TYPE qrscan_queue_depth gauge")
+        lines.append(f"qrscan_queue_depth {queue_depth}")
+        lines.append("# TYPE qrscan_queue_limit gauge")
+        lines.append(f"qrscan_queue_limit {queue_limit}")
+        lines.append("# TYPE qrscan_throughput_images_per_second gauge")
+        lines.append(f"qrscan_throughput_images_per_second {self.throughput():.3f}")
+        lines.append("# TYPE qrscan_uptime_seconds gauge")
+        lines.append(f"qrscan_uptime_seconds {time.time() - self.started:.0f}")
+        lines += self.request_latency.render("qrscan_request_seconds")
+        lines += self.decode_latency.render("qrscan_decode_seconds")
+        return "\n".join(lines) + "\n"
+
+
+class ScanService:
+    """扫描服务核心：进程池、排队限额与超时控制"""
+    def __init__(self, workers=None, queue_limit=64, request_timeout=30.0,
+                 max_body=64 * 1024 * 1024, enhance_level="auto", fetch_timeout=10.0,
+                 backends=("pyzbar",), strategy="cheapest", symbols=None, max_pixels=scan_guard.MAX_PIXELS,
+                 fetch_threads=8):
+        self.workers = workers or os.cpu_count() or 2
+        self.queue_limit = queue_limit
+        self.request_timeout = request_timeout
+        self.max_body = max_body
+        self.enhance_level = enhance_level
+        self.fetch_timeout = fetch_timeout
+        self.fetcher = concurrent.futures.ThreadPoolExecutor(max_workers=fetch_threads, thread_name_prefix="fetch")
+        self.metrics = ScanMetrics()
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        self.limits = scan_guard.Limits(max_pixels, max_body)
+        # 单张图片的处理时间上限与请求超时相同，超时的工作进程被杀掉重启
+        self.guard = scan_guard.GuardedPool(
+            self.workers, request_timeout, {"enhance_level": enhance_level},
+            {"names": list(backends), "strategy": strategy, "symbols": symbols}, self.limits,
+            log=lambda message: print(message, file=sys.stderr))
+        # 服务启动时就启动工作进程，导入开销不落在第一个请求上
+        self.guard.start()
+    
+    def reserve(self, count):
+        """为一次请求的所有图片申请排队名额，名额不足时全部退回"""
+        acquired = 0
+        for _ in range(count):
+            if not self.slots.acquire(blocking=False):
+                break
+            acquired += 1
+        if acquired < count:
+            for _ in range(acquired):
+                self.slots.release()
+            return False
+        with self.pending_lock:
+            self.pending += count
+        return True
+    
+    def _release(self, future):
+        with self.pending_lock:
+            self.pending -= 1
+        self.slots.release()
+    
+    def scan_images(self, items, deadline=None):
+        """
+        扫描一组图片 [(名称, 字节)]，到 deadline（time.monotonic 时间，默认为现在起一个请求超时）为止
+        返回 (结果列表, 是否超时)；调用前必须已用 reserve 为每张图片申请名额
+        超时时排队中的图片直接取消，正在解码的图片杀掉其工作进程，名额随之归还
+        """
+        futures = []
+        rejected = {}
+        for i, (name, data) in enumerate(items):
+            # 文件头检查不通过的图片不进进程池
+            try:
+                scan_guard.check_image(BytesIO(data), self.limits)
+            except scan_guard.ImageRejected as e:
+                rejected[i] = str(e)
+                self._release(None)
+                futures.append((name, None))
+                continue
+            future = self.guard.submit(i, name, data)
+            future.add_done_callback(self._release)
+            futures.append((name, future))
+        
+        if deadline is None:
+            deadline = time.monotonic() + self.request_timeout
+        done, not_done = concurrent.futures.wait([f for _, f in futures if f is not None],
+                                                 timeout=max(0.0, deadline - time.monotonic()))
+        for future in not_done:
+            self.guard.cancel(future)
+        
+        results = []
+        for i, (name, future) in enumerate(futures):
+            entry = {"name": name}
+            if future is None:
+                entry["error"] = rejected[i]
+                self.metrics.inc("errors_total")
+            elif future in not_done:
+                entry["error"] = "timeout"
+            else:
+                result = future.result()
+                if result.timed_out:
+                    entry["error"] = "timeout"
+                elif result.error is not None:
+                    entry["error"] = result.error
+                    self.metrics.inc("errors_total")
+                else:
+                    entry["results"] = [record.to_dict() for record in result.results]
+                    entry["elapsed_ms"] = round(result.elapsed * 1000, 2)
+                    self.metrics.image_done(result.elapsed)
+            results.append(entry)
+        
+        if not_done:
+            self.metrics.inc("timeouts_total")
+        return results, bool(not_done)
+    
+    def _fetch(self, url, deadline):
+        """下载一张图片，超过 max_body 字节或到达请求截止时间时放弃"""
+        import requests
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("下载超时")
+        with requests.get(url, timeout=min(self.fetch_timeout, remaining), stream=True) as response:
+            response.raise_for_status()
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_body:
+                raise ValueError(f"图片超过 {self.max_body} 字节")
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self.max_body:
+                    raise ValueError(f"图片超过 {self.max_body} 字节")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("下载超时")
+                chunks.append(chunk)
+        return b"".join(chunks)
+    
+    def fetch_urls(self, urls, deadline):
+        """
+        并行下载URL列表中的图片，整体不超过请求截止时间 deadline（time.monotonic 时间）
+        返回 ([(名称, 字节)], [下载失败的条目])；每个失败的条目归还一个排队名额
+        """
+        import requests
+        
+        futures = [(url, self.fetcher.submit(self._fetch, url, deadline)) for url in urls]
+        concurrent.futures.wait([future for _, future in futures], timeout=max(0.0, deadline - time.monotonic()))
+        items, failures = [], []
+        for url, future in futures:
+            if not future.done():
+                # 还没下载完的由 _fetch 在下一块数据或套接字超时时自行放弃
+                error = "下载超时"
+            else:
+                try:
+                    items.append((url, future.result()))
+                    continue
+                except (requests.exceptions.RequestException, ValueError, TimeoutError) as e:
+                    error = f"下载失败: {str(e)}"
+            failures.append({"name": url, "error": error})
+            self.metrics.inc("errors_total")
+            self._release(None)
+        return items, failures
+    
+    def shutdown(self):
+        self.fetcher.shutdown(wait=False, cancel_futures=True)
+        self.guard.close()
+
+
+class ScanRequestHandler(BaseHTTPRequestHandler):
+    """HTTP接口:
+        POST /scan   image/* 或 application/octet-stream 单张图片
+                     multipart/form-data 多张图片
+                     application/json {"urls": [...]} 网络图片列表
+        GET /metrics Prometheus 格式运行指标
+        GET /health  存活检查
+    """
+    service = None
+    
+    def log_message(self, format, *args):
+        # 默认会把每个请求打到stderr，服务模式下太吵
+        pass
+    
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path == "/metrics":
+            service = self.service
+            body = service.metrics.render(service.pending, service.queue_limit).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok", "workers": self.service.workers})
+        else:
+            self.send_json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        if self.path != "/scan":
+            self.send_json(404, {"error": "not found"})
+            return
+        
+        service = self.service
+        started = time.perf_counter()
+        deadline = time.monotonic() + service.request_timeout
+        service.metrics.inc("requests_total")
+        
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self.send_json(400, {"error": "请求体为空"})
+            return
+        if length > service.max_body:
+            self.send_json(413, {"error": f"请求体超过 {service.max_body} 字节"})
+            return
+        body = self.rfile.read(length)
+        
+        try:
+            items, urls = self.parse_items(body)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        count = len(items) + len(urls)
+        if not count:
+            self.send_json(400, {"error": "请求中没有图片"})
+            return
+        
+        # 超过排队上限的请求永远无法接纳，不能让调用方重试
+        if count > service.queue_limit:
+            service.metrics.inc("rejected_total")
+            self.send_json(413, {"error": f"单次请求最多 {service.queue_limit} 张图片", "limit": service.queue_limit})
+            return
+        # 排队名额不足时直接拒绝，由调用方稍后重试；URL也在下载前申请名额
+        if not service.reserve(count):
+            service.metrics.inc("rejected_total")
+            self.send_json(503, {"error": "扫描队列已满"}, {"Retry-After": "1"})
+            return
+        
+        failures = []
+        if urls:
+            fetched, failures = service.fetch_urls(urls, deadline)
+            items += fetched
+        results, timed_out = service.scan_images(items, deadline)
+        timed_out = timed_out or any(failure["error"] == "下载超时" for failure in failures)
+        elapsed = time.perf_counter() - started
+        service.metrics.request_latency.observe(elapsed)
+        self.send_json(504 if timed_out else 200,
+                       {"results": results + failures, "elapsed_ms": round(elapsed * 1000, 2)})
+    
+    def parse_items(self, body):
+        """按 Content-Type 解析请求体，返回 ([(名称, 字节)], [要下载的URL])"""
+        content_type = self.headers.get("Content-Type", "application/octet-stream")
+        
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=default_policy).parsebytes(
+                b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+            if not message.is_multipart():
+                raise ValueError("multipart 请求体格式错误")
+            items = []
+            for i, part in enumerate(message.iter_parts()):
+                data = part.get_payload(decode=True)
+                if data:
+                    items.append((part.get_filename() or part.get_param("name", header="content-disposition")
+                                  or f"part-{i}", data))
+            return items, []
+        
+        if content_type.startswith("application/json"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise ValueError("JSON 格式错误")
+            urls = payload.get("urls") if isinstance(payload, dict) else payload
+            if not isinstance(urls, list):
+                raise ValueError("需要 {\"urls\": [...]} 格式")
+            return [], [str(u) for u in urls]
+        
+        return [(self.headers.get("X-Filename", "upload"), body)], []
+
+
+def serve(host="127.0.0.1", port=8765, **service_options):
+    """启动扫描服务，阻塞直到 Ctrl+C"""
+    service = ScanService(**service_options)
+    handler = type("BoundScanRequestHandler", (ScanRequestHandler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    print(f"扫描服务已启动: http://{host}:{port} ({service.workers} 个工作进程)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.shutdown()
+
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="二维码扫描HTTP服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--queue", type=int, default=64, help="最多排队的图片数，队列已满时返回503，单次请求超过该数量返回413")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求的超时秒数")
+    parser.add_argument("--max-body", type=int, default=64 * 1024 * 1024, help="请求体最大字节数")
+    parser.add_argument("--max-pixels", type=int, default=scan_guard.MAX_PIXELS,
+                        help="单张图片的像素数上限，只读文件头检查；0为不限制")
+    parser.add_argument("--enhance", default="auto", choices=["off", "auto", "medium", "strong"])
+    parser.add_argument("--backends", default="pyzbar", help="逗号分隔的解码后端，如 pyzbar,opencv,wechat,zxing")
+    parser.add_argument("--strategy", default="cheapest", choices=["cheapest", "race", "consensus"])
+    parser.add_argument("--symbols", default="QRCODE", help="逗号分隔的码制，如 QRCODE,DATAMATRIX,PDF417")
+    args = parser.parse_args(argv)
+    
+    serve(args.host, args.port, workers=args.workers, queue_limit=args.queue,
+          request_timeout=args.timeout, max_body=args.max_body, enhance_level=args.enhance,
+          backends=args.backends.split(","), strategy=args.strategy, symbols=args.symbols.split(","),
+          max_pixels=args.max_pixels)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+载荷自动解码的回归测试：python -m pytest test_payload_decode.py
+"""
+import base64
+import zlib
+
+import payload_decode
+
+
+def forms_by_chain(data):
+    return {form.chain: form for form in payload_decode.decode_payload(data)}
+
+
+def test_text_starting_with_signature_bytes_is_text():
+    # 中间层的 base32 文本以 "MZ" 开头，不能报告为 Windows 可执行文件
+    inner = base64.b32encode(b"flag{hidden_in_layers}")
+    assert inner.startswith(b"MZ")
+    forms = forms_by_chain(base64.b64encode(zlib.compress(inner)))
+    
+    assert forms[("base64", "zlib")].kind == "文本"
+    assert forms[("base64", "zlib", "base32")].data == b"flag{hidden_in_layers}"
+    assert all(form.kind == "文本" for form in forms.values())
+
+
+def test_binary_signature_still_detected():
+    png = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+    forms = forms_by_chain(base64.b64encode(png))
+    assert forms[("base64",)].kind == "PNG图片"
+    
+    exe = b"MZ\x90\x00\x03\x00\x00\x00\x04\x00\x00\x00\xff\xff\x00\x00"
+    forms = forms_by_chain(base64.b64encode(exe))
+    assert forms[("base64",)].kind == "Windows可执行文件"
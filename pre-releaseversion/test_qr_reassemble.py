@@ -0,0 +1,77 @@
+"""
+碎片重组的回归测试：python -m pytest test_qr_reassemble.py
+"""
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("pyzbar.pyzbar")
+import qr_reassemble
+import scan_engine
+
+TEXT = b"flag{0123456789abcdef}"
+
+# 版本2（25×25模块）的QR码，内容为 TEXT
+MATRIX = [
+    "1111111001111000101111111",
+    "1000001000111101001000001",
+    "1011101011100010001011101",
+    "1011101011110111001011101",
+    "1011101010000000101011101",
+    "1000001010110011101000001",
+    "1111111010101010101111111",
+    "0000000010001001000000000",
+    "1011111000100111001111100",
+    "1100110010101000110001000",
+    "0101111011001011111110011",
+    "1001000111100011001000001",
+    "1001101100111110101111110",
+    "1100110000100000010000000",
+    "1001101000011111011010111",
+    "1011010110110001011000000",
+    "1011011000010110111110111",
+    "0000000011001110100011100",
+    "1111111001100010101010111",
+    "1000001010001011100011000",
+    "1011101011101001111110111",
+    "1011101011100000101111011",
+    "1011101011011000010001001",
+    "1000001000110000111101001",
+    "1111111010111001000000111",
+]
+
+
+def render(scale, border):
+    modules = np.array([[cell == "1" for cell in row] for row in MATRIX])
+    modules = np.pad(modules, border)
+    pixels = np.where(modules, 0, 255).astype(np.uint8).repeat(scale, 0).repeat(scale, 1)
+    return Image.fromarray(pixels)
+
+
+def shuffled_grid(img, rows, cols, seed=1):
+    """切成网格并打乱，返回 (碎片列表, 正确排列)"""
+    w, h = img.size
+    pieces = [img.crop((c * w // cols, r * h // rows, (c + 1) * w // cols, (r + 1) * h // rows))
+              for r in range(rows) for c in range(cols)]
+    order = list(range(len(pieces)))
+    random.Random(seed).shuffle(order)
+    return [pieces[i] for i in order], tuple(order.index(i) for i in range(len(pieces)))
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_module_aligned_cuts(seed):
+    # 33个模块（含静区）每模块10像素，切成3×3时每条切口都落在模块边界上
+    pieces, truth = shuffled_grid(render(10, 4), 3, 3, seed)
+    grays, shapes = qr_reassemble.normalize_pieces(pieces)
+    assert truth in [layout.order for layout in qr_reassemble.candidate_layouts(grays, shapes)]
+    
+    results, layout = scan_engine.reassemble(pieces)
+    assert [result.data for result in results] == [TEXT]
+
+
+def test_mid_module_cuts():
+    pieces, _ = shuffled_grid(render(10, 4), 4, 4)
+    results, layout = scan_engine.reassemble(pieces)
+    assert [result.data for result in results] == [TEXT]
@@ -0,0 +1,75 @@
+"""
+后台线程到Tk主线程的界面更新队列
+后台线程 post 一个函数后，用虚拟事件唤醒主线程一次，主线程成批执行队列中的函数；
+队列为空时不占用任何定时器，也就没有轮询延迟和空闲CPU开销
+"""
+import time
+import threading
+import traceback
+import collections
+import tkinter as tk
+
+
+class UIDispatcher:
+    """
+    界面更新调度器
+    每次唤醒最多执行 max_batch 个函数或 max_time 秒，剩余的留到下一次事件，
+    让大量结果涌入时主线程仍能及时处理输入和重绘
+    """
+    EVENT = "<<UIDispatch>>"
+    
+    def __init__(self, root, max_batch=200, max_time=0.02):
+        self.root = root
+        self.max_batch = max_batch
+        self.max_time = max_time
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+        # 已发出唤醒事件但还没有清空队列
+        self.scheduled = False
+        self.main_thread = threading.get_ident()
+        root.bind(self.EVENT, self._drain, add="+")
+    
+    def in_main_thread(self):
+        return threading.get_ident() == self.main_thread
+    
+    def post(self, func):
+        """把函数交给主线程执行，可在任意线程调用"""
+        with self.lock:
+            self.queue.append(func)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self._wake()
+    
+    def _wake(self):
+        try:
+            # when="tail" 排在已有的输入和重绘事件之后
+            self.root.event_generate(self.EVENT, when="tail")
+        except (tk.TclError, RuntimeError):
+            # 窗口已关闭或主循环已退出
+            with self.lock:
+                self.queue.clear()
+                self.scheduled = False
+    
+    def _drain(self, event=None):
+        """主线程中成批执行队列中的函数"""
+        deadline = time.perf_counter() + self.max_time
+        for _ in range(self.max_batch):
+            with self.lock:
+                if not self.queue:
+                    self.scheduled = False
+                    return
+                func = self.queue.popleft()
+            try:
+                func()
+            except Exception:
+                traceback.print_exc()
+            if time.perf_counter() >= deadline:
+                break
+        
+        with self.lock:
+            if not self.queue:
+                self.scheduled = False
+                return
+        # 还有剩余：先让主循环处理其他事件，再继续
+        self._wake()
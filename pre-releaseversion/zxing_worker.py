@@ -0,0 +1,244 @@
+"""
+常驻ZXing解码进程（汉信码等pyzbar不支持的码制）
+只启动一次JVM，图片通过管道在内存中传递，一次往返可解码多张图片，
+不再为每张图片写临时文件、启动新的Java进程
+"""
+import os
+import sys
+import json
+import shutil
+import struct
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+WORKER_CLASS = "ZXingPipeWorker"
+WORKER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), WORKER_CLASS + ".java")
+
+# 预先编译好的解码进程（python zxing_worker.py --build），随程序分发后只装了JRE的机器也能启动
+PREBUILT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zxing-build")
+
+# 与pyzbar的Decoded字段一致，可直接交给 ScanRecord.from_decoded 和 display_results
+ZXingResult = namedtuple("ZXingResult", ["type", "data", "rect", "polygon", "quality", "orientation"])
+
+_ORIENTATIONS = {0: "UP", 90: "RIGHT", 180: "DOWN", 270: "LEFT"}
+
+
+class ZXingWorkerError(RuntimeError):
+    """解码进程无法启动或异常退出"""
+
+
+def find_zxing_jar():
+    """查找ZXing的jar：优先环境变量 ZXING_JAR，其次使用pyzxing自带（下载）的jar"""
+    jar_path = os.environ.get("ZXING_JAR")
+    if jar_path:
+        return jar_path
+    try:
+        from pyzxing import BarCodeReader
+    except ImportError:
+        raise ZXingWorkerError("未找到ZXing：请安装pyzxing或设置环境变量 ZXING_JAR")
+    reader = BarCodeReader()
+    # 新版pyzxing在首次解码时才下载jar
+    if hasattr(reader, "_ensure_jar"):
+        return reader._ensure_jar()
+    return reader.lib_path
+
+
+def is_compiled(class_dir):
+    """class_dir 中已有不早于源文件的 ZXingPipeWorker.class"""
+    class_file = os.path.join(class_dir, WORKER_CLASS + ".class")
+    return os.path.exists(class_file) and os.path.getmtime(class_file) >= os.path.getmtime(WORKER_SOURCE)
+
+
+def compile_worker(jar_path, output_dir, javac=None):
+    """把 ZXingPipeWorker.java 编译到 output_dir，已是最新时跳过"""
+    if is_compiled(output_dir):
+        return
+    javac = javac or shutil.which("javac")
+    if not javac:
+        raise ZXingWorkerError("未找到javac，无法编译ZXing解码进程（可在装有JDK的机器上运行 "
+                               "python zxing_worker.py --build 预先编译）")
+    os.makedirs(output_dir, exist_ok=True)
+    # 先编译到临时目录再替换，避免多个进程同时编译时读到半个class文件
+    build_dir = tempfile.mkdtemp(dir=output_dir)
+    try:
+        subprocess.run([javac, "-encoding", "UTF-8", "-cp", jar_path, "-d", build_dir, WORKER_SOURCE],
+                       check=True, capture_output=True)
+        for name in os.listdir(build_dir):
+            os.replace(os.path.join(build_dir, name), os.path.join(output_dir, name))
+    except subprocess.CalledProcessError as e:
+        raise ZXingWorkerError(f"编译ZXing解码进程失败: {e.stderr.decode(errors='replace')}")
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+class ZXingWorker:
+    """
+    常驻解码进程的客户端，线程安全，多个扫描线程共用同一个JVM
+    进程在首次解码时启动；超时或异常退出后自动重启
+    """
+    def __init__(self, jar_path=None, formats=None, java=None, javac=None, cache_dir=None, timeout=60):
+        self.jar_path = jar_path
+        self.formats = list(formats or [])
+        self.java = java or shutil.which("java")
+        self.javac = javac or shutil.which("javac")
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "qrscanner-zxing-worker")
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.process = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _class_dir(self):
+        """解码进程类文件所在目录：优先使用预先编译好的，否则编译到缓存目录（需要JDK）"""
+        if is_compiled(PREBUILT_DIR):
+            return PREBUILT_DIR
+        compile_worker(self.jar_path, self.cache_dir, self.javac)
+        return self.cache_dir
+    
+    def _start(self):
+        if not self.java:
+            raise ZXingWorkerError("未找到java，无法启动ZXing解码进程")
+        if not self.jar_path:
+            self.jar_path = find_zxing_jar()
+        command = [self.java, "-Djava.awt.headless=true", "-cp", os.pathsep.join([self._class_dir(), self.jar_path]),
+                   WORKER_CLASS]
+        if self.formats:
+            command.append(",".join(self.formats))
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, bufsize=0)
+    
+    def _kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+    
+    def _encode(self, image):
+        """图片统一转为文件字节：bytes 原样发送，PIL图像和numpy数组在内存中编码为PNG"""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return bytes(image)
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+    
+    def _parse(self, line):
+        entry = json.loads(line)
+        if "error" in entry:
+            return [], entry["error"]
+        results = []
+        for item in entry["results"]:
+            points = [tuple(p) for p in item["points"]]
+            if points:
+                xs = [p[0] for p in points]
+                ys = [p[1] for p in points]
+                rect = (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+            else:
+                rect = (0, 0, 0, 0)
+            results.append(ZXingResult(
+                type=item["format"].replace("_", ""),
+                data=item["text"].encode("utf-8"),
+                rect=rect,
+                polygon=points,
+                quality=1,
+                orientation=_ORIENTATIONS.get(item.get("orientation")),
+            ))
+        return results, None
+    
+    def decode_batch(self, images):
+        """
+        一次往返解码多张图片
+        images 中每项可以是图片文件字节、PIL图像或numpy数组，
+        返回与输入顺序一致的 [(results, error), ...]
+        """
+        payloads = [self._encode(image) for image in images]
+        if not payloads:
+            return []
+        message = bytearray(struct.pack(">i", len(payloads)))
+        for payload in payloads:
+            message += struct.pack(">i", len(payload))
+            message += payload
+        
+        with self.lock:
+            # 进程在两次调用之间意外退出时重启并重试一次；超时则不重试
+            for attempt in range(2):
+                if self.process is None or self.process.poll() is not None:
+                    self._start()
+                lines, timed_out = self._round_trip(message, len(payloads))
+                if len(lines) == len(payloads) and all(lines):
+                    return [self._parse(line) for line in lines]
+                self._kill()
+                if timed_out:
+                    raise ZXingWorkerError(f"ZXing解码超时（{self.timeout}秒）")
+            raise ZXingWorkerError("ZXing解码进程异常退出")
+    
+    def _round_trip(self, message, count):
+        """发送一轮请求并读取 count 行结果；超时后结束进程，readline 随即返回空"""
+        process = self.process
+        timed_out = threading.Event()
+        
+        def expire():
+            timed_out.set()
+            process.kill()
+        
+        timer = threading.Timer(self.timeout, expire)
+        timer.start()
+        try:
+            process.stdin.write(message)
+            process.stdin.flush()
+            lines = [process.stdout.readline() for _ in range(count)]
+        except OSError:
+            lines = []
+        finally:
+            timer.cancel()
+        return lines, timed_out.is_set()
+    
+    def decode(self, image):
+        """解码单张图片，返回结果列表；出错时抛出 ZXingWorkerError"""
+        results, error = self.decode_batch([image])[0]
+        if error:
+            raise ZXingWorkerError(error)
+        return results
+    
+    def close(self):
+        """关闭标准输入让进程自行退出"""
+        with self.lock:
+            if self.process is None:
+                return
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self._kill()
+
+
+if __name__ == "__main__":
+    # 用法: python zxing_worker.py 图片1 图片2 ...
+    #       python zxing_worker.py --build   （预先编译解码进程到 zxing-build 目录，需要JDK）
+    if sys.argv[1:] == ["--build"]:
+        compile_worker(find_zxing_jar(), PREBUILT_DIR)
+        print(f"已编译到 {PREBUILT_DIR}")
+        sys.exit(0)
+    with ZXingWorker() as worker:
+        paths = sys.argv[1:]
+        contents = []
+        for path in paths:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        for path, (results, error) in zip(paths, worker.decode_batch(contents)):
+            if error:
+                print(f"{path}: 错误 {error}")
+            for result in results:
+                print(f"{path}: [{result.type}] {result.data.decode('utf-8')}")